@@ -22,6 +22,14 @@
 #    along with this software.  If not, see http://www.gnu.org/licenses/.     #
 #                                                                             #
 ###############################################################################
+#
+# Compiled counterparts of per-row routines of pymice._Columns; see
+# pymice._Columns for documentation (and pure Python implementations).
+#
+
+import numpy as np
+
+from libc.stdint cimport int64_t
 
 def emptyStringToNone(l):
     _emptyStringToNone(l)
@@ -34,4 +42,215 @@ cdef void _emptyStringToNone(list l):
             emptyStringToNone(x)
 
         elif x == '':
-            l[i] = None
\ No newline at end of file
+            l[i] = None
+
+
+def parseInts(cells):
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = len(cells)
+    values = np.zeros(n, dtype=np.int64)
+    missing = np.zeros(n, dtype=np.bool_)
+    cdef int64_t[:] v = values
+    cdef char[:] m = missing.view(np.int8)
+    for i, cell in enumerate(cells):
+        if cell:
+            v[i] = int(cell)
+
+        else:
+            m[i] = 1
+
+    return values, missing
+
+
+def parseFloats(cells):
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = len(cells)
+    values = np.zeros(n, dtype=np.float64)
+    missing = np.zeros(n, dtype=np.bool_)
+    cdef double[:] v = values
+    cdef char[:] m = missing.view(np.int8)
+    for i, cell in enumerate(cells):
+        if cell:
+            # comma as the decimal separator (locale dependent)
+            v[i] = float(cell.replace(',', '.'))
+
+        else:
+            m[i] = 1
+
+    return values, missing
+
+
+def parseTimes(cells):
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = len(cells)
+    values = np.zeros(n, dtype=np.int64)
+    missing = np.zeros(n, dtype=np.bool_)
+    cdef int64_t[:] v = values
+    cdef char[:] m = missing.view(np.int8)
+    for i, cell in enumerate(cells):
+        if cell:
+            if isinstance(cell, bytes):
+                cell = (<bytes>cell).decode('ascii')
+
+            v[i] = _parseTime(cell)
+
+        else:
+            m[i] = 1
+
+    return values, missing
+
+
+cdef inline bint _isSpace(Py_UCS4 c):
+    return c == u' ' or c == u'\t'
+
+cdef inline bint _isDigit(Py_UCS4 c):
+    return u'0' <= c <= u'9'
+
+cdef int64_t _parseNumber(unicode s, Py_ssize_t *i, Py_ssize_t n,
+                          int *digits) except -1:
+    cdef int64_t value = 0
+    cdef Py_ssize_t start = i[0]
+    cdef Py_ssize_t j = start
+    cdef Py_UCS4 c
+    while j < n:
+        c = s[j]
+        if not _isDigit(c):
+            break
+
+        value = value * 10 + (<long>c - <long>ord(u'0'))
+        j += 1
+
+    i[0] = j
+    digits[0] = j - start
+    if digits[0] == 0 or digits[0] > 18:
+        raise ValueError('Malformed timepoint: %r' % s)
+
+    return value
+
+cdef inline void _expect(unicode s, Py_ssize_t *i, Py_ssize_t n,
+                         Py_UCS4 c) except *:
+    cdef Py_ssize_t j = i[0]
+    if j >= n or s[j] != c:
+        raise ValueError('Malformed timepoint: %r' % s)
+
+    i[0] = j + 1
+
+cdef inline bint _isLeap(int64_t year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+cdef int64_t _daysFromCivil(int64_t year, int64_t month, int64_t day):
+    # days since 1970-01-01 of a date in the proleptic Gregorian calendar
+    if month <= 2:
+        year -= 1
+
+    cdef int64_t era = (year if year >= 0 else year - 399) // 400
+    cdef int64_t yoe = year - era * 400
+    cdef int64_t doy = (153 * (month - 3 if month > 2 else month + 9) + 2) // 5 + day - 1
+    cdef int64_t doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+cdef int *_MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+cdef int64_t _parseTime(unicode s) except? -1:
+    # 'YYYY-MM-DD[ hh:mm[:ss[.ffffff]]]' to microseconds since the epoch
+    cdef Py_ssize_t n = len(s)
+    cdef Py_ssize_t i = 0
+    cdef int digits
+    cdef int64_t year, month, day, hour, minute
+    cdef int64_t second = 0
+    cdef int64_t microsecond = 0
+    cdef int monthDays
+
+    while i < n and _isSpace(s[i]):
+        i += 1
+
+    year = _parseNumber(s, &i, n, &digits)
+    _expect(s, &i, n, u'-')
+    month = _parseNumber(s, &i, n, &digits)
+    _expect(s, &i, n, u'-')
+    day = _parseNumber(s, &i, n, &digits)
+
+    while i < n and _isSpace(s[i]):
+        i += 1
+
+    if i < n:
+        if s[i] == u'T':
+            i += 1
+
+        elif not _isSpace(s[i - 1]):
+            raise ValueError('Malformed timepoint: %r' % s)
+
+        hour = _parseNumber(s, &i, n, &digits)
+        _expect(s, &i, n, u':')
+        minute = _parseNumber(s, &i, n, &digits)
+
+        if i < n and s[i] == u':':
+            i += 1
+            second = _parseNumber(s, &i, n, &digits)
+            if i < n and s[i] == u'.':
+                i += 1
+                microsecond = _parseNumber(s, &i, n, &digits)
+                # fractions of microsecond are rounded half up
+                if digits > 6:
+                    while digits > 7:
+                        microsecond //= 10
+                        digits -= 1
+
+                    microsecond = (microsecond + 5) // 10
+                    digits -= 1
+
+                while digits < 6:
+                    microsecond *= 10
+                    digits += 1
+
+        while i < n and _isSpace(s[i]):
+            i += 1
+
+    else:
+        hour = minute = 0
+
+    if i < n:
+        raise ValueError('Malformed timepoint: %r' % s)
+
+    if not 1 <= year <= 9999 or not 1 <= month <= 12:
+        raise ValueError('Date out of range: %r' % s)
+
+    monthDays = _MONTH_DAYS[month - 1] + (month == 2 and _isLeap(year))
+    if not 1 <= day <= monthDays or hour > 23 or minute > 59 or second > 59:
+        raise ValueError('Date out of range: %r' % s)
+
+    return (((_daysFromCivil(year, month, day) * 24 + hour) * 60 + minute) * 60
+            + second) * 1000000 + microsecond
+
+
+def joinRows(keys, foreignKeys):
+    keys = np.ascontiguousarray(keys, dtype=np.int64)
+    order = np.argsort(keys, kind='mergesort').astype(np.intp)
+    sortedKeys = keys[order]
+    foreignKeys = np.ascontiguousarray(foreignKeys, dtype=np.int64)
+    result = np.empty(len(foreignKeys), dtype=np.intp)
+
+    cdef int64_t[:] k = sortedKeys
+    cdef Py_ssize_t[:] rows = order
+    cdef int64_t[:] f = foreignKeys
+    cdef Py_ssize_t[:] r = result
+    cdef Py_ssize_t n = k.shape[0]
+    cdef Py_ssize_t i, low, high, middle
+    cdef int64_t key
+    for i in range(f.shape[0]):
+        key = f[i]
+        # the rightmost key not greater than the foreign key; thanks to the
+        # stable sort it is the last row of duplicated keys
+        low = 0
+        high = n
+        while low < high:
+            middle = (low + high) // 2
+            if k[middle] <= key:
+                low = middle + 1
+
+            else:
+                high = middle
+
+        r[i] = rows[low - 1] if low > 0 and k[low - 1] == key else -1
+
+    return result
@@ -36,17 +36,20 @@ try:
 except ImportError:
   import io
 
-from operator import methodcaller, attrgetter
+from operator import methodcaller
 from collections import Container
 
+import numpy as np
+
 from .ICNodes import Group # XXX: unnecessary dependency
 
-from ._Tools import timeString, toTimestampUTC, warn, isString
-from ._ObjectBase import ObjectBase
+from ._Tools import timeString, warn, isString
+from ._Columns import utcMicroseconds
+from ._ObjectBase import ObjectBase, Range, CATEGORICAL
 
 
 # dependence tracking
-from . import _dependencies, ICNodes, _Tools, _ObjectBase
+from . import _dependencies, ICNodes, _Tools, _ObjectBase, _Columns
 import types
 __dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values()
                                                       if isinstance(x, types.ModuleType)])
@@ -68,8 +71,9 @@ class IntIdentityManager(int):
   def __getitem__(self, x):
     return self.__class__(x)
 
-  def _del_(self):
-    pass
+
+def _newData(cls):
+  return cls.__new__(cls)
 
 
 class Data(object):
@@ -107,13 +111,12 @@ class Data(object):
     # change to
     self.__animalsByName = AnimalManager()
 
-    self.__visits = ObjectBase({
-      'Start': toTimestampUTC,
-      'End': toTimestampUTC})
-
-    self.__log = ObjectBase({'DateTime': toTimestampUTC})
-    self.__environment = ObjectBase({'DateTime': toTimestampUTC})
-    self.__hardware = ObjectBase({'DateTime': toTimestampUTC})
+    # nodes are filtered by timepoints as microseconds since the epoch (UTC);
+    # see L{ICNodes}
+    self.__visits = ObjectBase(types=self.__ATTRIBUTE_TYPES)
+    self.__log = ObjectBase(types=self.__ATTRIBUTE_TYPES)
+    self.__environment = ObjectBase(types=self.__ATTRIBUTE_TYPES)
+    self.__hardware = ObjectBase(types=self.__ATTRIBUTE_TYPES)
     self._initCache()
 
 #    self._setCageManager(CageManager())
@@ -122,20 +125,22 @@ class Data(object):
   def _setCageManager(self, cageManager):
     self._cageManager = cageManager
 
-  def __del__(self):
-    for cache in [self.__visits,
-                  self.__log,
-                  self.__environment,
-                  self.__hardware]:
-      for node in cache.get():
-        if node:
-          node._del_()
+  def __reduce__(self):
+    """
+    Data objects are pickled as their attributes (with visits kept in
+    columns pickled as the columns; see L{ObjectBase.__reduce__}); the cache
+    of cages is built again on unpickling.
+    """
+    state = dict(self.__dict__)
+    del state['_Data__cages'], state['_Data__animal2cage']
+    return (_newData, (self.__class__,), state)
 
-    self._cageManager._del_()
-    #self._sourceManager._del_()
-    #self.__animalsByName._del_()
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._buildCache()
 
-  def getVisits(self, mice=None, start=None, end=None, order=None):
+  def getVisits(self, mice=None, start=None, end=None, order=None,
+                cage=None, corner=None, module=None, group=None, where=None):
     """
     :param mice: mouse (or mice) which visits are requested
     :type mice: str or unicode or :py:class:`Animal` or collection of them or None
@@ -149,6 +154,26 @@ class Data(object):
     :param order: attributes that the returned list is ordered by
     :type order: str or unicode or their sequence or None
 
+    :param cage: cage (or cages) of requested visits
+    :type cage: int or collection of ints or None
+
+    :param corner: corner (or corners) of requested visits
+    :type corner: int or collection of ints or None
+
+    :param module: name (or names) of module of requested visits
+    :type module: str or unicode or collection of them or None
+
+    :param group: name (or names) of group of mice which visits are requested
+                  (in addition to visits of `mice`, like in
+                  :py:class:`pymice.Loader`)
+    :type group: str or unicode or collection of them or None
+
+    :param where: other selectors of nodes: a mapping of attribute names
+                  (possibly dotted) to collections of accepted values or to
+                  functions returning a boolean mask for a NumPy array of
+                  values of the attribute
+    :type where: {str: collection or callable, ...} or None
+
     :return: visits
     :rtype: [:py:class:`Visit`, ...]
 
@@ -163,18 +188,23 @@ class Data(object):
     >>> data.getVisits(mice=mice, order='Start')
     [< Visit of "Minnie" to corner #4 of cage #1 (at 2012-12-18 12:30:02.360) >,
      < Visit of "Mickey" to corner #1 of cage #1 (at 2012-12-18 12:31:00.000) >]
+
+    >>> data.getVisits(cage=1, corner=[1, 2])
+    [< Visit of "Mickey" to corner #1 of cage #1 (at 2012-12-18 12:31:00.000) >]
     """
     selectors = self.__makeTimeSelectors('Start', start, end)
-    if mice is not None:
-      if isString(mice) or not isinstance(mice, Container):
-        mice = [mice]
-
-      selectors['Animal.Name'] = map(unicode, mice)
-
-    visits = self.__visits.get(selectors)
-    return self.__orderBy(visits, order)
-
-  def getLog(self, start=None, end=None, order=None):
+    names = self.__selectAnimalNames(mice, group)
+    if names is not None:
+      selectors['Animal.Name'] = names
+
+    self.__addValueSelectors(selectors, [('Cage', cage, int),
+                                         ('Corner', corner, int),
+                                         ('Module', module, unicode)])
+    self.__addSelectors(selectors, where)
+    return self.__getOrdered(self.__visits, selectors, order)
+
+  def getLog(self, start=None, end=None, order=None, cage=None, corner=None,
+             side=None, where=None):
     """
     :param start: a lower bound of the log entries DateTime attribute
     :type start: datetime.datetime or None
@@ -185,6 +215,21 @@ class Data(object):
     :param order: attributes that the returned list is ordered by
     :type order: str or unicode or their sequence or None
 
+    :param cage: cage (or cages) of requested log entries
+    :type cage: int or collection of ints or None
+
+    :param corner: corner (or corners) of requested log entries
+    :type corner: int or collection of ints or None
+
+    :param side: side (or sides) of requested log entries
+    :type side: int or collection of ints or None
+
+    :param where: other selectors of nodes: a mapping of attribute names
+                  (possibly dotted) to collections of accepted values or to
+                  functions returning a boolean mask for a NumPy array of
+                  values of the attribute
+    :type where: {str: collection or callable, ...} or None
+
     :return: log entries
     :rtype: [:py:class:`LogEntry`, ...]
 
@@ -193,10 +238,14 @@ class Data(object):
      < Log Info, Application (at 2012-12-18 12:20:37.718) >]
     """
     selectors = self.__makeTimeSelectors('DateTime', start, end)
-    log = self.__log.get(selectors)
-    return self.__orderBy(log, order)
-
-  def getEnvironment(self, start=None, end=None, order=None):
+    self.__addValueSelectors(selectors, [('Cage', cage, int),
+                                         ('Corner', corner, int),
+                                         ('Side', side, int)])
+    self.__addSelectors(selectors, where)
+    return self.__getOrdered(self.__log, selectors, order)
+
+  def getEnvironment(self, start=None, end=None, order=None, cage=None,
+                     where=None):
     """
     :param start: a lower bound of the sample DateTime attribute
     :type start: datetime.datetime or None
@@ -207,6 +256,15 @@ class Data(object):
     :param order: attributes that the returned list is ordered by
     :type order: str or unicode or their sequence or None
 
+    :param cage: cage (or cages) of requested samples
+    :type cage: int or collection of ints or None
+
+    :param where: other selectors of nodes: a mapping of attribute names
+                  (possibly dotted) to collections of accepted values or to
+                  functions returning a boolean mask for a NumPy array of
+                  values of the attribute
+    :type where: {str: collection or callable, ...} or None
+
     :return: sampled environment conditions
     :rtype: [:py:class:`EnvironmentalConditions`, ...]
 
@@ -229,10 +287,12 @@ class Data(object):
      < Illumination:   0, Temperature: 23.6 (at 2012-12-18 12:20:02.000) >]
     """
     selectors = self.__makeTimeSelectors('DateTime', start, end)
-    env = self.__environment.get(selectors)
-    return self.__orderBy(env, order)
+    self.__addValueSelectors(selectors, [('Cage', cage, int)])
+    self.__addSelectors(selectors, where)
+    return self.__getOrdered(self.__environment, selectors, order)
 
-  def getHardwareEvents(self, start=None, end=None, order=None):
+  def getHardwareEvents(self, start=None, end=None, order=None, cage=None,
+                        corner=None, side=None, where=None):
     """
     :param start: a lower bound of the event DateTime attribute
     :type start: datetime.datetime or None
@@ -243,12 +303,30 @@ class Data(object):
     :param order: attributes that the returned list is ordered by
     :type order: str or unicode or their sequence or None
 
+    :param cage: cage (or cages) of requested events
+    :type cage: int or collection of ints or None
+
+    :param corner: corner (or corners) of requested events
+    :type corner: int or collection of ints or None
+
+    :param side: side (or sides) of requested events
+    :type side: int or collection of ints or None
+
+    :param where: other selectors of nodes: a mapping of attribute names
+                  (possibly dotted) to collections of accepted values or to
+                  functions returning a boolean mask for a NumPy array of
+                  values of the attribute
+    :type where: {str: collection or callable, ...} or None
+
     :return: hardware events
     :rtype: [:py:class:`HardwareEvent`, ...]
     """
     selectors = self.__makeTimeSelectors('DateTime', start, end)
-    hw = self.__hardware.get(selectors)
-    return self.__orderBy(hw, order)
+    self.__addValueSelectors(selectors, [('Cage', cage, int),
+                                         ('Corner', corner, int),
+                                         ('Side', side, int)])
+    self.__addSelectors(selectors, where)
+    return self.__getOrdered(self.__hardware, selectors, order)
 
   def getCage(self, mouse):
     """
@@ -308,12 +386,9 @@ class Data(object):
     if self.icSessionStart is not None:
       return self.icSessionStart
 
-    times = self.__visits.getAttributes('Start')
-    try:
-      return min(times)
-
-    except ValueError:
-      return None
+    times = self.__visits.getAttributes('_utcStart')
+    if times:
+      return self.__visits.get()[np.argmin(times)].Start
 
   def getEnd(self):
     """
@@ -323,12 +398,9 @@ class Data(object):
     if self.icSessionEnd is not None:
       return self.icSessionEnd
 
-    times = self.__visits.getAttributes('End')
-    try:
-      return max(times)
-
-    except ValueError:
-      return None
+    times = self.__visits.getAttributes('_utcEnd')
+    if times:
+      return self.__visits.get()[np.argmax(times)].End
 
   def getGroup(self, name=None):
     """
@@ -429,6 +501,10 @@ class Data(object):
 
   def freeze(self):
     self.__frozen = True
+    # orders of nodes are cached since now (see L{ObjectBase.get})
+    for objects in [self.__visits, self.__log, self.__environment,
+                    self.__hardware]:
+      objects.freeze()
 
   def _raiseIfFrozen(self):
     if self.__frozen:
@@ -451,6 +527,91 @@ class Data(object):
   def _insertNewVisits(self, visits):
     self.__visits.put(visits)
 
+  def _canShareNodes(self, data):
+    """
+    :return: whether nodes of the data refer to the same cages and sources
+             as nodes of this object would (so they need not be cloned)
+    """
+    return data._cageManager is self._cageManager and \
+           isinstance(data._sourceManager, IdentityManager) and \
+           isinstance(self._sourceManager, IdentityManager)
+
+  def _insertDataOf(self, data, getLog=False, getEnv=False, getHw=False):
+    """
+    Insert visits (and optionally other nodes) of the data.
+
+    Visits kept in tables share columns and nosepokes with the data (only
+    their animals, sources and cages are remapped), other nodes are shared
+    if possible (see L{_canShareNodes}).
+    """
+    self._raiseIfFrozen()
+
+    tables = data.__visits.getTables()
+    if tables is None:
+      self.insertVisits(data.getVisits())
+
+    else:
+      for table in tables:
+        self._insertNewVisits(table.clone(self._sourceManager,
+                                          self._cageManager,
+                                          self.__animalsByName))
+
+    share = self._canShareNodes(data)
+    for flag, get, insert, insertNew in [
+      (getHw, data.getHardwareEvents, self.insertHw, self._insertNewHw),
+      (getEnv, data.getEnvironment, self.insertEnv, self._insertNewEnv),
+      (getLog, data.getLog, self.insertLog, self._insertNewLog),
+      ]:
+      if flag:
+        (insertNew if share else insert)(get())
+
+  def _getEarliestVisitStart(self):
+    """
+    :return: the earliest `Start` of visits in microseconds since the epoch
+             (UTC) or None
+    """
+    return self.__extremum(min, self.__visits, '_utcStart')
+
+  def _getLatestTimepoint(self, getNp=False, getLog=False, getEnv=False,
+                          getHw=False):
+    """
+    :return: the latest `End` of visits (and optionally of nosepokes, the
+             latest `DateTime` of log entries, environment samples and
+             hardware events) in microseconds since the epoch (UTC) or None
+    """
+    timepoints = [self.__extremum(max, self.__visits, '_utcEnd')]
+    if getNp:
+      timepoints.append(self.__getLatestNosepokeEnd())
+
+    for flag, objects in [(getLog, self.__log),
+                          (getEnv, self.__environment),
+                          (getHw, self.__hardware)]:
+      if flag:
+        timepoints.append(self.__extremum(max, objects, '_utcDateTime'))
+
+    timepoints = [t for t in timepoints if t is not None]
+    if timepoints:
+      return max(timepoints)
+
+  def __getLatestNosepokeEnd(self):
+    tables = self.__visits.getTables()
+    if tables is not None:
+      ends = [table.getLatestNosepokeEnd() for table in tables]
+
+    else:
+      ends = [n._utcEnd for v in self.__visits.get() if v.Nosepokes
+              for n in v.Nosepokes]
+
+    ends = [t for t in ends if t is not None]
+    if ends:
+      return max(ends)
+
+  @staticmethod
+  def __extremum(function, objects, attributeName):
+    values = [x for x in objects.getAttributes(attributeName) if x is not None]
+    if values:
+      return function(values)
+
   def _registerGroup(self, Name, Animals=[], **kwargs):
     Animals = [self.getAnimal(animal) for animal in Animals] # XXX sanity
     if Name in self.__name2group:
@@ -481,33 +642,91 @@ class Data(object):
     return animal
 
   @staticmethod
-  def __orderBy(data, order):
+  def __getOrdered(objects, selectors, order):
     if order is None:
-      return list(data)
+      return objects.get(selectors)
+
+    if isString(order):
+      order = [order]
+
+    return objects.get(selectors,
+                       order=[Data.__TIMEPOINTS.get(name, name) for name in order])
 
-    key = attrgetter(order) if isString(order) else attrgetter(*order)
-    return sorted(data, key=key)
+  def _cacheVisitOrder(self, order):
+    """
+    Cache the order of visits by the attribute (see L{ObjectBase.cacheOrder}).
+    """
+    self.__visits.cacheOrder(self.__TIMEPOINTS.get(order, order))
+
+  # types of attributes nodes are filtered by (see L{ObjectBase.MaskManager})
+  __ATTRIBUTE_TYPES = {'Cage': np.int16,
+                       'Corner': np.int8,
+                       'Side': np.int8,
+                       '_utcStart': np.int64,
+                       '_utcEnd': np.int64,
+                       '_utcDateTime': np.int64,
+                       'Animal.Name': CATEGORICAL,
+                       'Module': CATEGORICAL,
+                       }
+
+  # timepoints are compared by their values in microseconds since the epoch (UTC)
+  __TIMEPOINTS = {'Start': '_utcStart',
+                  'End': '_utcEnd',
+                  'DateTime': '_utcDateTime',
+                  }
 
   @staticmethod
   def __makeTimeFilter(start, end):
-    if start is not None:
-      startTimestamp = toTimestampUTC(start)
-      if end is not None:
-        endTimestamp = toTimestampUTC(end)
-        return lambda X: (startTimestamp <= X) * (X < endTimestamp)
+    # ranges are searched in the time order of nodes (see L{ObjectBase.get})
+    return Range(None if start is None else utcMicroseconds(start),
+                 None if end is None else utcMicroseconds(end))
+
+  def __selectAnimalNames(self, mice, groups):
+    """
+    :return: names of mice and of members of any of the groups
+             or None if neither mice nor groups are given
+    """
+    if mice is None and groups is None:
+      return None
 
-      return lambda X: startTimestamp <= X
+    names = set(map(unicode, self.__asCollection(mice))) if mice is not None else set()
+    if groups is not None:
+      names.update(unicode(animal)
+                   for group in self.__asCollection(groups)
+                   for animal in self.getGroup(group).Animals)
+
+    return sorted(names)
+
+  @staticmethod
+  def __addValueSelectors(selectors, parameters):
+    for attributeName, values, convert in parameters:
+      if values is not None:
+        selectors[attributeName] = [convert(x) for x in Data.__asCollection(values)]
+
+  @staticmethod
+  def __addSelectors(selectors, where):
+    if not where:
+      return
+
+    repeated = set(where) & set(selectors)
+    if repeated:
+      raise ValueError('Attributes selected twice: %s' % ', '.join(sorted(repeated)))
+
+    selectors.update(where)
+
+  @staticmethod
+  def __asCollection(values):
+    if isString(values) or not isinstance(values, Container):
+      return [values]
 
-    if end is not None:
-      endTimestamp = toTimestampUTC(end)
-      return lambda X: X < endTimestamp
+    return values
 
   @staticmethod
   def __makeTimeSelectors(attributeName, start, end):
     if start is None and end is None:
       return {}
 
-    return {attributeName: Data.__makeTimeFilter(start, end)}
+    return {'_utc' + attributeName: Data.__makeTimeFilter(start, end)}
 
   class UnableToInsertIntoFrozen(TypeError):
     pass
@@ -24,8 +24,10 @@
 ###############################################################################
 
 import sys
+import weakref
 
-from ._ICNodesBase import DurationAware, getTimeString
+from ._ICNodesBase import (DurationAware, getTimeString,
+                           splitTimepoint, joinTimepoint)
 from ._Tools import toDt, isString
 
 if sys.version_info >= (3, 0):
@@ -79,6 +81,9 @@ class Animal(BaseNode):
                           self.__Sex,
                           self.__Notes)
 
+  def __reduce__(self):
+    return (self.__class__, (self.__Name, self.__Tag, self.__Sex, self.__Notes))
+
   def __gt__(self, other):
     if isString(other):
       return other.__class__(self) > other
@@ -173,14 +178,15 @@ class Nosepoke(BaseNode, SideAware, DurationAware):
                 '_source', '_line',
                 'Visit',
                 )
+  _timepoints = ('Start', 'End')
 
   def __init__(self, Start, End, Side,
                LickNumber, LickContactTime, LickDuration,
                SideCondition, SideError, TimeError, ConditionError,
                AirState, DoorState, LED1State, LED2State, LED3State,
                _source, _line):
-    self.__Start = Start
-    self.__End = End
+    self.__Start, self.___StartTimezone = splitTimepoint(Start)
+    self.__End, self.___EndTimezone = splitTimepoint(End)
     self.__Side = Side
     self.__LickNumber = LickNumber
     self.__LickContactTime = LickContactTime
@@ -200,14 +206,38 @@ class Nosepoke(BaseNode, SideAware, DurationAware):
   def clone(self, sourceManager, sideManager):
     side = sideManager[self.__Side] if self.__Side is not None else None
     source = sourceManager[self.___source]
-    return self.__class__(self.__Start, self.__End, side,
+    return self.__class__(joinTimepoint(self.__Start, self.___StartTimezone),
+                          joinTimepoint(self.__End, self.___EndTimezone),
+                          side,
                           self.__LickNumber, self.__LickContactTime, self.__LickDuration,
                           self.__SideCondition, self.__SideError, self.__TimeError, self.__ConditionError,
                           self.__AirState, self.__DoorState, self.__LED1State, self.__LED2State, self.__LED3State,
                           source, self.___line)
 
+  def __reduce__(self):
+    # the nosepoke is bound again by its visit (if pickled with the visit)
+    return (self.__class__, (joinTimepoint(self.__Start, self.___StartTimezone),
+                             joinTimepoint(self.__End, self.___EndTimezone),
+                             self.__Side,
+                             self.__LickNumber, self.__LickContactTime, self.__LickDuration,
+                             self.__SideCondition, self.__SideError, self.__TimeError, self.__ConditionError,
+                             self.__AirState, self.__DoorState, self.__LED1State, self.__LED2State, self.__LED3State,
+                             self.___source, self.___line))
+
   def _bindToVisit(self, Visit):
-    self.__Visit = Visit
+    # a weak reference does not make a reference cycle with Visit.Nosepokes
+    self.__Visit = weakref.ref(Visit)
+
+  @property
+  def Visit(self):
+    """
+    The visit of the nosepoke or None if the visit has been freed.
+
+    The nosepoke refers to its visit weakly, so it keeps neither the visit
+    nor the data object of the visit alive; keep a reference to the visit
+    (or to the data object) as long as the attribute is needed.
+    """
+    return self.__Visit()
 
   def __repr__(self):
     return '< Nosepoke to %5s door (at %s) >' % \
@@ -218,10 +248,11 @@ class LogEntry(BaseNode, SideAware):
   __slots__ = ('DateTime', 'Category', 'Type',
                 'Cage', 'Corner', 'Side', 'Notes',
                 '_source', '_line')
+  _timepoints = ('DateTime',)
 
   def __init__(self, DateTime, Category, Type,
                      Cage, Corner, Side, Notes, _source, _line):
-    self.__DateTime = DateTime
+    self.__DateTime, self.___DateTimeTimezone = splitTimepoint(DateTime)
     self.__Category = Category
     self.__Type = Type
     self.__Cage = Cage
@@ -242,7 +273,7 @@ class LogEntry(BaseNode, SideAware):
         if self.__Side is not None:
           side = corner[self.__Side]
 
-    return LogEntry(self.__DateTime,
+    return LogEntry(joinTimepoint(self.__DateTime, self.___DateTimeTimezone),
                     self.__Category,
                     self.__Type,
                     cage,
@@ -252,19 +283,26 @@ class LogEntry(BaseNode, SideAware):
                     sourceManager[self.___source],
                     self.___line)
 
+  def __reduce__(self):
+    return (self.__class__, (joinTimepoint(self.__DateTime, self.___DateTimeTimezone),
+                             self.__Category, self.__Type,
+                             self.__Cage, self.__Corner, self.__Side,
+                             self.__Notes, self.___source, self.___line))
+
   def __repr__(self):
     return '< Log %s, %s (at %s) >' % \
            (self.__Category, self.__Type,
-            getTimeString(self.__DateTime))
+            getTimeString(self.DateTime))
 
 
 class EnvironmentalConditions(BaseNode):
   __slots__ = ('DateTime', 'Temperature', 'Illumination', 'Cage',
                 '_source', '_line')
+  _timepoints = ('DateTime',)
 
   def __init__(self, DateTime, Temperature, Illumination, Cage,
                _source, _line):
-    self.__DateTime = DateTime
+    self.__DateTime, self.___DateTimeTimezone = splitTimepoint(DateTime)
     self.__Temperature = Temperature
     self.__Illumination = Illumination
     self.__Cage = Cage
@@ -272,17 +310,22 @@ class EnvironmentalConditions(BaseNode):
     self.___line = _line
 
   def clone(self, sourceManager, cageManager):
-    return self.__class__(self.__DateTime,
+    return self.__class__(joinTimepoint(self.__DateTime, self.___DateTimeTimezone),
                           self.__Temperature,
                           self.__Illumination,
                           cageManager[self.__Cage] if self.__Cage is not None else None,
                           sourceManager[self.___source],
                           self.___line)
 
+  def __reduce__(self):
+    return (self.__class__, (joinTimepoint(self.__DateTime, self.___DateTimeTimezone),
+                             self.__Temperature, self.__Illumination,
+                             self.__Cage, self.___source, self.___line))
+
   def __repr__(self):
     return '< Illumination: %3d, Temperature: %4.1f (at %s) >' % \
            (self.__Illumination, self.__Temperature,
-            getTimeString(self.__DateTime))
+            getTimeString(self.DateTime))
 
 
 class HardwareEvent(BaseNode, SideAware):
@@ -327,9 +370,10 @@ class NamedInt(int):
 class KnownHardwareEvent(HardwareEvent):
   __slots__ = ('DateTime', 'Cage', 'Corner', 'Side', 'State',
                '_source', '_line')
+  _timepoints = ('DateTime',)
 
   def __init__(self, DateTime, Cage, Corner, Side, State, _source, _line):
-    self.__DateTime = DateTime
+    self.__DateTime, self.___DateTimeTimezone = splitTimepoint(DateTime)
     self.__Cage = Cage
     self.__Corner = Corner
     self.__Side = Side
@@ -345,12 +389,17 @@ class KnownHardwareEvent(HardwareEvent):
       if side is not None:
         side = corner[side]
 
-    return self.__class__(self.__DateTime,
+    return self.__class__(joinTimepoint(self.__DateTime, self.___DateTimeTimezone),
                           cage, corner, side,
                           self.__State,
                           sourceManager[self.___source],
                           self.___line)
 
+  def __reduce__(self):
+    return (self.__class__, (joinTimepoint(self.__DateTime, self.___DateTimeTimezone),
+                             self.__Cage, self.__Corner, self.__Side,
+                             self.__State, self.___source, self.___line))
+
 
 class AirHardwareEvent(KnownHardwareEvent):
   Type = NamedInt(0, 'Air')
@@ -382,10 +431,11 @@ class LedHardwareEvent(KnownHardwareEvent):
 class UnknownHardwareEvent(HardwareEvent):
   __slots__ = ('DateTime', 'Type', 'Cage', 'Corner', 'Side', 'State',
                '_source', '_line')
+  _timepoints = ('DateTime',)
 
   def __init__(self, DateTime, Type, Cage, Corner, Side, State,
                _source, _line):
-    self.__DateTime = DateTime
+    self.__DateTime, self.___DateTimeTimezone = splitTimepoint(DateTime)
     self.__Type = Type
     self.__Cage = Cage
     self.__Corner = Corner
@@ -402,13 +452,19 @@ class UnknownHardwareEvent(HardwareEvent):
       if side is not None:
         side = corner[side]
 
-    return UnknownHardwareEvent(self.__DateTime,
+    return UnknownHardwareEvent(joinTimepoint(self.__DateTime, self.___DateTimeTimezone),
                                 self.__Type,
                                 cage, corner, side,
                                 self.__State,
                                 sourceManager[self.___source],
                                 self.___line)
 
+  def __reduce__(self):
+    return (self.__class__, (joinTimepoint(self.__DateTime, self.___DateTimeTimezone),
+                             self.__Type,
+                             self.__Cage, self.__Corner, self.__Side,
+                             self.__State, self.___source, self.___line))
+
   def __repr__(self):
     return '< UnknownHardwareEvent(%d): %d (at %s) >' % \
            (self.Type, self.State, getTimeString(self.DateTime))
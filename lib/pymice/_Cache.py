@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# encoding: utf-8
+###############################################################################
+#                                                                             #
+#    PyMICE library                                                           #
+#                                                                             #
+#    Copyright (C) 2012-2017 Jakub M. Dzik a.k.a. Kowalski, S. Łęski          #
+#    (Laboratory of Neuroinformatics; Nencki Institute of Experimental        #
+#    Biology of Polish Academy of Sciences)                                   #
+#                                                                             #
+#    This software is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This software is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this software.  If not, see http://www.gnu.org/licenses/.     #
+#                                                                             #
+###############################################################################
+
+
+import os
+import sys
+import errno
+import hashlib
+import tempfile
+
+try:
+  import cPickle as pickle
+
+except ImportError:
+  import pickle
+
+from ._Tools import warn
+
+# dependence tracking
+from . import _dependencies, _Version, _Tools
+import types
+__dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values()
+                                                      if isinstance(x, types.ModuleType)])
+
+
+class TablesCache(object):
+  """
+  A directory of tables read from data files (see
+  :py:meth:`Loader._readArchive`).
+
+  Every cache file is stored with a key consisting of the size and the
+  modification time of the data file and of the PyMICE and Python versions;
+  tables are returned only if the key is still valid.
+  """
+  # to be incremented whenever the layout of the tables changes
+  FORMAT = 2
+  # pickles (e.g. of NumPy string arrays) of Python 2 and 3 are not compatible
+  PYTHON = sys.version_info[0]
+
+  def __init__(self, directory):
+    """
+    :param directory: a path to the cache directory; created if necessary.
+    :type directory: basestring
+    """
+    self.__directory = directory
+
+  def path(self, fname, flags={}):
+    """
+    :return: path to the cache file of tables read from fname with flags
+    :rtype: basestring
+    """
+    name = repr((os.path.abspath(fname), sorted(flags.items()), self.PYTHON))
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return os.path.join(self.__directory,
+                        '{}.{}.py{}.pmcache'.format(os.path.basename(os.path.normpath(fname)),
+                                                    digest[:16], self.PYTHON))
+
+  @classmethod
+  def key(cls, fname):
+    """
+    :return: the key a cache file of fname has to match
+    """
+    return (cls.FORMAT, cls.PYTHON, _Version.__version__,
+            cls._fingerprint(fname))
+
+  @staticmethod
+  def _fingerprint(fname):
+    if not os.path.isdir(fname):
+      return _statFile(fname)
+
+    return sorted((os.path.relpath(os.path.join(root, filename), fname),)
+                  + _statFile(os.path.join(root, filename))
+                  for root, _, filenames in os.walk(fname)
+                  for filename in filenames)
+
+  def load(self, fname, flags={}):
+    """
+    :return: cached tables or None if the cache is missing, invalid or
+             outdated; a cache that can not be read or unpickled is
+             reported with a warning
+    :rtype: dict
+    """
+    path = self.path(fname, flags)
+    try:
+      with open(path, 'rb') as fh:
+        key = pickle.load(fh)
+        if key != self.key(fname):
+          return None
+
+        return pickle.load(fh)
+
+    except (pickle.UnpicklingError, EOFError): # corrupted cache file
+      return None
+
+    except (IOError, OSError) as e:
+      if e.errno != errno.ENOENT:
+        warn.warn('Unable to read cache file {}: {}'.format(path, e))
+
+      return None
+
+    except Exception as e: # e.g. a cache file of another Python
+      warn.warn('Unable to unpickle cache file {}: {!r}'.format(path, e))
+      return None
+
+  def store(self, fname, flags, tables):
+    """
+    Write tables to the cache; the cache file is replaced atomically, so
+    concurrent readers never see an incomplete file.
+    """
+    try:
+      os.makedirs(self.__directory)
+
+    except OSError:
+      if not os.path.isdir(self.__directory):
+        raise
+
+    path = self.path(fname, flags)
+    fd, tmpPath = tempfile.mkstemp(dir=self.__directory, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as fh:
+        pickle.dump(self.key(fname), fh, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(tables, fh, pickle.HIGHEST_PROTOCOL)
+
+      _replace(tmpPath, path)
+
+    except:
+      os.remove(tmpPath)
+      raise
+
+
+def _statFile(path):
+  stat = os.stat(path)
+  return (stat.st_size, getattr(stat, 'st_mtime_ns', stat.st_mtime))
+
+
+try:
+  _replace = os.replace
+
+except AttributeError:
+  def _replace(src, dst):
+    if os.name == 'nt' and os.path.exists(dst):
+      os.remove(dst)
+
+    os.rename(src, dst)
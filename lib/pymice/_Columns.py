@@ -0,0 +1,556 @@
+#!/usr/bin/env python
+# encoding: utf-8
+###############################################################################
+#                                                                             #
+#    PyMICE library                                                           #
+#                                                                             #
+#    Copyright (C) 2012-2017 Jakub M. Dzik a.k.a. Kowalski, S. Łęski          #
+#    (Laboratory of Neuroinformatics; Nencki Institute of Experimental        #
+#    Biology of Polish Academy of Sciences)                                   #
+#                                                                             #
+#    This software is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This software is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this software.  If not, see http://www.gnu.org/licenses/.     #
+#                                                                             #
+###############################################################################
+
+import csv
+import warnings
+
+import numpy as np
+
+try:
+  from itertools import izip, islice, repeat
+
+except ImportError:
+  from itertools import islice, repeat
+  izip = zip
+
+from datetime import datetime, timedelta, tzinfo
+from math import modf
+
+# dependence tracking
+from . import _dependencies
+import types
+__dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values()
+                                                      if isinstance(x, types.ModuleType)])
+
+
+class PmCImportWarning(ImportWarning):
+  pass
+
+try:
+  from pymice import _cymice as _compiled
+
+except Exception as e:
+  warnings.warn('%s\t%s' % (type(e), e),
+                PmCImportWarning)
+  _compiled = None
+
+_implementations = {}
+_pythonImplementations = {}
+
+def _accelerated(function):
+  """
+  Replace the pure Python function with its compiled counterpart (from the
+  `_cymice` extension) if available.
+  """
+  name = function.__name__
+  _pythonImplementations[name] = function
+  try:
+    compiled = getattr(_compiled, name)
+
+  except AttributeError:
+    _implementations[name] = 'python'
+    return function
+
+  _implementations[name] = 'cython'
+  return compiled
+
+
+def accelerators():
+  """
+  Report which implementations of the per-row routines of data loading are
+  active.
+
+  :return: a mapping from routine names to either 'cython' (the compiled
+           extension) or 'python' (the pure Python fallback)
+  :rtype: {str: str, ...}
+  """
+  return dict(_implementations)
+
+
+@_accelerated
+def emptyStringToNone(l):
+  for i, x in enumerate(l):
+    if type(x) is list:
+      emptyStringToNone(x)
+
+    elif x == '':
+      l[i] = None
+
+  return l
+
+
+@_accelerated
+def parseInts(cells):
+  """
+  :return: values of the cells (0 for empty cells) and the mask of empty cells
+  :rtype: (numpy.ndarray, numpy.ndarray)
+  """
+  cells = np.array(cells)
+  missing = cells == ''
+  cells[missing] = '0'
+  return cells.astype(np.int64), missing
+
+
+@_accelerated
+def parseFloats(cells):
+  """
+  Like L{parseInts}; comma is accepted as the decimal separator (locale
+  dependent).
+  """
+  cells = np.char.replace(np.array(cells), ',', '.')
+  missing = cells == ''
+  cells[missing] = '0'
+  return cells.astype(np.float64), missing
+
+
+@_accelerated
+def parseTimes(cells):
+  """
+  Like L{parseInts}; values are naive timepoints as microseconds since
+  the epoch.
+  """
+  cells = np.array(cells)
+  missing = cells == ''
+  try:
+    times = cells.astype('datetime64[us]').astype(np.int64)
+
+  except ValueError:
+    cells[missing] = '1970-01-01 00:00'
+    times = np.array([parseTime(x) for x in cells], dtype=np.int64)
+
+  else:
+    # NumPy truncates fractions of microsecond, so timepoints longer than
+    # 'YYYY-MM-DD hh:mm:ss.ffffff' are parsed again to be rounded
+    longer = np.flatnonzero(np.char.str_len(cells) > 26)
+    if len(longer) > 0:
+      times[longer] = [parseTime(x) for x in cells[longer]]
+
+  times[missing] = 0
+  return times, missing
+
+
+@_accelerated
+def joinRows(keys, foreignKeys):
+  """
+  :param keys: int64 keys of rows
+  :param foreignKeys: int64 keys to be looked up
+
+  :return: for every foreign key the row of the key (the last one if
+           duplicated) or -1 if the key is missing
+  :rtype: numpy.ndarray
+
+  >>> joinRows(np.array([4, 2, 4]), np.array([2, 4, 3])).tolist()
+  [1, 2, -1]
+  """
+  keys = np.asarray(keys, dtype=np.int64)
+  foreignKeys = np.asarray(foreignKeys, dtype=np.int64)
+  order = np.argsort(keys, kind='mergesort')
+  sortedKeys = keys[order]
+  # the rightmost key not greater than the foreign key; thanks to the stable
+  # sort it is the last row of duplicated keys
+  positions = np.searchsorted(sortedKeys, foreignKeys, side='right') - 1
+  found = np.flatnonzero(positions >= 0)
+  found = found[sortedKeys[positions[found]] == foreignKeys[found]]
+  rows = np.full(len(foreignKeys), -1, dtype=np.intp)
+  rows[found] = order[positions[found]]
+  return rows
+
+
+def groupRows(rows, n):
+  """
+  Group foreign rows by the rows they refer to (see L{joinRows}).
+
+  :param rows: for every foreign row the row (0 to n - 1) it refers to or -1
+  :param n: number of rows
+
+  :return: foreign rows ordered by the rows they refer to (unmatched first)
+           and offsets of the groups: foreign rows referring to the i-th row
+           are order[offsets[i]:offsets[i + 1]], and offsets[0] is the number
+           of unmatched foreign rows
+  :rtype: (numpy.ndarray, numpy.ndarray)
+
+  >>> order, offsets = groupRows(np.array([1, -1, 0, 1]), 3)
+  >>> order.tolist(), offsets.tolist()
+  ([1, 2, 0, 3], [1, 2, 4, 4])
+  """
+  rows = np.asarray(rows, dtype=np.intp)
+  order = np.argsort(rows, kind='mergesort')
+  offsets = np.cumsum(np.bincount(rows + 1, minlength=n + 1))
+  return order, offsets
+
+
+class TextColumn(object):
+  """
+  A column of strings; empty cells are represented by None.
+
+  >>> TEXT.parse(('a', '', 'b'))
+  array(['a', None, 'b'], dtype=object)
+  """
+  def parse(self, cells):
+    return np.array(emptyStringToNone(list(cells)), dtype=object)
+
+  def empty(self):
+    return np.array([], dtype=object)
+
+  def concatenate(self, chunks):
+    return np.concatenate(chunks)
+
+
+class NumericColumn(TextColumn):
+  """
+  A column of numbers; empty cells are masked.
+
+  >>> INT.parse(('1', '', '-3')).tolist()
+  [1, None, -3]
+
+  >>> FLOAT.parse(('1,5', '2.25', '')).tolist()
+  [1.5, 2.25, None]
+  """
+  def __init__(self, dtype, parser):
+    self.__dtype = dtype
+    self.__parser = parser
+
+  def parse(self, cells):
+    values, missing = self.__parser(cells)
+    if missing.any():
+      return np.ma.array(values, mask=missing)
+
+    return np.ma.array(values)
+
+  def empty(self):
+    return np.ma.array([], dtype=self.__dtype)
+
+  def concatenate(self, chunks):
+    return np.ma.concatenate(chunks)
+
+
+class TimeColumn(NumericColumn):
+  """
+  A column of naive timepoints as microseconds since the epoch; empty cells
+  are masked.
+
+  >>> TIME.parse(('1970-01-01 00:00:01.5', '', '1970-01-02 00:00')).tolist()
+  [1500000, None, 86400000000]
+  """
+  def __init__(self):
+    super(TimeColumn, self).__init__(np.int64, parseTimes)
+
+
+TEXT = TextColumn()
+INT = NumericColumn(np.int64, parseInts)
+FLOAT = NumericColumn(np.float64, parseFloats)
+TIME = TimeColumn()
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def parseTime(tStr):
+  """
+  A fallback for timepoints which are not ISO 8601 compliant.
+
+  :return: microseconds since the epoch
+  :rtype: int
+
+  >>> parseTime('1970-01-01 0:00:01.5')
+  1500000
+
+  >>> parseTime('1970-01-01 0:00:01.0000005')
+  1000001
+  """
+  date, time = tStr.split()
+  tokens = date.split('-') + time.split(':')
+  seconds, _, fraction = tokens[5].partition('.') if len(tokens) > 5 else ('0', '', '')
+  if fraction and not fraction.isdigit():
+    raise ValueError('Malformed timepoint: %r' % tStr)
+
+  timepoint = datetime(*[int(x) for x in tokens[:5]] + [int(seconds)])
+  # fractions of microsecond are rounded half up
+  microseconds = int(fraction[:6].ljust(6, '0')) + (fraction[6:7] >= '5')
+  return toMicroseconds(timepoint) + microseconds
+
+
+def toMicroseconds(timepoint):
+  """
+  :return: naive timepoint as microseconds since the epoch
+  :rtype: int
+  """
+  return timedeltaToMicroseconds(timepoint.replace(tzinfo=None) - EPOCH)
+
+
+def timedeltaToMicroseconds(delta):
+  return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def toDatetimes(column, timezones):
+  """
+  Convert a time column to timezone-aware datetime objects.
+
+  :param column: naive timepoints as microseconds since the epoch
+  :param timezones: a timezone of all timepoints or a sequence of timezones
+                    of each timepoint
+
+  :return: datetime objects (None for missing values)
+  :rtype: list
+  """
+  naive = np.ma.filled(column, 0).astype('datetime64[us]').tolist()
+  if isinstance(timezones, tzinfo):
+    timezones = repeat(timezones)
+
+  result = [dt.replace(tzinfo=tz) for dt, tz in izip(naive, timezones)]
+  missing = np.ma.getmask(column)
+  if missing is not np.ma.nomask:
+    for i in np.flatnonzero(missing):
+      result[i] = None
+
+  return result
+
+
+def encodeTimezones(timezones):
+  """
+  Code timezones by identity (not all timezones are hashable).
+
+  :param timezones: a sequence of timezones
+
+  :return: codes of the timezones and a list of coded timezones
+  :rtype: (numpy.ndarray, list)
+  """
+  timezones = list(timezones)
+  _, first, codes = np.unique(np.array([id(tz) for tz in timezones],
+                                       dtype=np.int64),
+                              return_index=True, return_inverse=True)
+  return codes.astype(np.int8 if len(first) < 128 else np.intp), \
+         [timezones[i] for i in first]
+
+
+def fixedOffsets(timezones):
+  """
+  :return: UTC offsets of the timezones in microseconds (0 for None) or None
+           if any of timezones is not a fixed offset one
+  :rtype: numpy.ndarray or None
+  """
+  offsets = [tz.utcoffset(None) if tz is not None else timedelta(0)
+             for tz in timezones]
+  if None in offsets:
+    return None
+
+  return np.array([timedeltaToMicroseconds(offset) for offset in offsets],
+                  dtype=np.int64)
+
+
+def toTimepoints(column, timezones):
+  """
+  Convert a time column to timepoints to be passed to node constructors
+  (see L{ICNodes}), which create datetime objects on demand.
+
+  :param column: naive timepoints as microseconds since the epoch
+  :param timezones: a timezone of all timepoints or a sequence of timezones
+                    of each timepoint
+
+  :return: (microseconds since the epoch (UTC), timezone) pairs (None for
+           missing values); datetime objects if any of timezones is not
+           a fixed offset one
+  :rtype: list
+  """
+  naive = np.ma.getdata(column)
+  if isinstance(timezones, tzinfo):
+    offsets = fixedOffsets([timezones])
+    if offsets is None:
+      return toDatetimes(column, timezones)
+
+    utc = naive - offsets[0]
+    timezones = repeat(timezones)
+
+  else:
+    codes, known = encodeTimezones(timezones)
+    offsets = fixedOffsets(known)
+    if offsets is None:
+      return toDatetimes(column, timezones)
+
+    utc = naive - offsets[codes]
+
+  result = list(izip(utc.tolist(), timezones))
+  missing = np.ma.getmask(column)
+  if missing is not np.ma.nomask:
+    for i in np.flatnonzero(missing):
+      result[i] = None
+
+  return result
+
+
+def utcMicroseconds(timepoint):
+  """
+  :param timepoint: a datetime object (naive one is assumed to be UTC)
+
+  :return: the timepoint as microseconds since the epoch (UTC)
+  :rtype: int
+
+  >>> utcMicroseconds(datetime(1970, 1, 1, 0, 0, 1))
+  1000000
+  """
+  offset = timepoint.utcoffset()
+  if offset is None:
+    return toMicroseconds(timepoint)
+
+  return toMicroseconds(timepoint) - timedeltaToMicroseconds(offset)
+
+
+def fromUTCMicroseconds(microseconds, timezone):
+  """
+  :param timezone: a fixed offset timezone
+
+  :return: a timezone-aware datetime object
+  :rtype: datetime.datetime
+  """
+  local = microseconds + timedeltaToMicroseconds(timezone.utcoffset(None))
+  return (EPOCH + timedelta(microseconds=local)).replace(tzinfo=timezone)
+
+
+def toUTCMicroseconds(column, timezones):
+  """
+  :param column: naive timepoints as microseconds since the epoch
+  :param timezones: a timezone of all timepoints or a sequence of timezones
+                    of each timepoint
+
+  :return: the timepoints as microseconds since the epoch (UTC); values of
+           missing timepoints are undefined
+  :rtype: numpy.ndarray
+  """
+  naive = np.ma.getdata(column)
+  if isinstance(timezones, tzinfo):
+    offset = timezones.utcoffset(None)
+    if offset is not None: # fixed offset
+      return naive - timedeltaToMicroseconds(offset)
+
+  offsets = [timedeltaToMicroseconds(dt.utcoffset()) if dt is not None else 0
+             for dt in toDatetimes(column, timezones)]
+  return naive - np.array(offsets, dtype=np.int64)
+
+
+def readColumns(fh, columnTypes={}, delimiter='\t', chunkSize=0x10000,
+                timer=None):
+  """
+  Read a delimited text table into a dict of typed columns.
+
+  The table is read in chunks of rows, so that only one chunk of raw cells
+  is kept in memory at any time.
+
+  :param fh: a file-like object
+  :param columnTypes: a mapping from a column label to its type
+                      (L{TEXT} by default)
+
+  :param timer: a function returning a context manager measuring a part
+                of reading ('read') or of parsing ('parse') of the table
+                (see L{Profile.interleavedStages})
+
+  :return: a mapping from column labels to columns or None if there is no
+           header in the table
+  :rtype: dict
+  """
+  if timer is None:
+    timer = _noTimer
+
+  reader = csv.reader(fh, delimiter=delimiter)
+  try:
+    with timer('read'):
+      labels = next(reader)
+
+  except StopIteration:
+    return None
+
+  types = [columnTypes.get(label, TEXT) for label in labels]
+  chunks = [[] for _ in labels]
+  width = len(labels)
+  lines = 1 # lines read so far (the header included)
+  tooWide = [] # lines of rows of more cells than labels
+
+  while True:
+    with timer('read'):
+      rows = list(islice(reader, chunkSize))
+      if not rows: # blank rows are skipped, so only the end stops reading
+        break
+
+      if any(len(row) != width for row in rows):
+        tooWide.extend(lines + i for i, row in enumerate(rows, 1)
+                       if len(row) > width)
+        lines += len(rows)
+        rows = [(row + [''] * width)[:width] for row in rows if row]
+
+      else:
+        lines += len(rows)
+
+    with timer('parse'):
+      for chunk, columnType, cells in izip(chunks, types, izip(*rows)):
+        chunk.append(columnType.parse(cells))
+
+  if tooWide:
+    _warnTooWideRows(tooWide, width)
+
+  with timer('parse'):
+    return dict((label,
+                 columnType.concatenate(chunk) if chunk else columnType.empty())
+                for label, columnType, chunk in izip(labels, types, chunks))
+
+
+def _warnTooWideRows(lines, width, shown=10):
+  """
+  Report rows of more cells than labels with a single warning; their extra
+  cells are ignored.
+
+  :param lines: line numbers of the rows
+  :param shown: the number of lines listed in the warning
+  """
+  listed = ', '.join(str(line) for line in lines[:shown])
+  if len(lines) > shown:
+    listed += ', ...'
+
+  warnings.warn('Rows of more than %d cells (extra cells ignored): %d (line: %s)'
+                % (width, len(lines), listed))
+
+
+class _NoTimer(object):
+  def __enter__(self):
+    return self
+
+  def __exit__(self, excType, excValue, traceback):
+    pass
+
+
+_NO_TIMER = _NoTimer()
+
+def _noTimer(part):
+  return _NO_TIMER
+
+
+def columnValues(column):
+  """
+  :return: values of the column as a list (None for missing values)
+
+  >>> columnValues(INT.parse(('1', '')))
+  [1, None]
+  """
+  if isinstance(column, np.ndarray):
+    return column.tolist()
+
+  return column
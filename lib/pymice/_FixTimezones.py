@@ -24,7 +24,7 @@
 ###############################################################################
 
 import sys
-from datetime import datetime, timedelta
+from datetime import datetime
 try:
   from itertools import izip, islice
 
@@ -35,16 +35,69 @@ except ImportError:
 import numpy as np
 import heapq
 
+from ._Columns import toMicroseconds, timedeltaToMicroseconds
+from ._Profile import NO_PROFILE
+
 # dependence tracking
-from . import _dependencies
+from . import _dependencies, _Columns, _Profile
 import types
 __dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values()
                                                       if isinstance(x, types.ModuleType)])
 
 
 def inferTimezones(timepoints, sessionStart, sessionEnd=None):
+  """
+  :param timepoints: chronologically ordered naive timepoints (either as lists
+                     of datetime fields or as microseconds since the epoch)
+
+  :return: timezones of the timepoints
+  :rtype: list
+  """
   return TimezonesInferrer(sessionStart, sessionEnd).infer(timepoints)
 
+
+def inferSessionsTimezones(timepoints, sessions):
+  """
+  :param timepoints: chronologically ordered naive timepoints as microseconds
+                     since the epoch
+  :param sessions: chronologically ordered (start, end) pairs of sessions
+                   (end is None for an open session); a timezone change is
+                   allowed within every session
+
+  :return: codes of timezones of the timepoints and the timezones
+  :rtype: (numpy.ndarray, list)
+  """
+  timepoints = np.asarray(timepoints, dtype=np.int64)
+  timezones = []
+  def getCode(timezone):
+    for code, known in enumerate(timezones):
+      if known is timezone:
+        return code
+
+    timezones.append(timezone)
+    return len(timezones) - 1
+
+  # timepoints of a session follow its start (given the order of the
+  # timepoints, an earlier naive timepoint may follow only the change
+  # of timezone)
+  reached = np.maximum.accumulate(timepoints) if len(timepoints) > 0 else timepoints
+  bounds = np.searchsorted(reached,
+                           [toMicroseconds(start) for start, _ in sessions[1:]])
+  bounds = [0] + bounds.tolist() + [len(timepoints)]
+
+  codes = np.empty(len(timepoints), dtype=np.intp)
+  for (start, end), first, last in izip(sessions, bounds, bounds[1:]):
+    if first == last: # nothing to assign (nor any change to find)
+      continue
+
+    changed = first + TimezonesInferrer(start, end).findChange(timepoints[first:last])
+    codes[first:changed] = getCode(start.tzinfo)
+    if changed < last:
+      codes[changed:last] = getCode(end.tzinfo)
+
+  return codes, timezones
+
+
 class TimezonesInferrer(object):
   class AmbigousTimezoneChangeError(ValueError):
     pass
@@ -55,48 +108,48 @@ class TimezonesInferrer(object):
   class NoIntervalsBigEnoughForTimeAdvance(AmbigousTimezoneChangeError):
     pass
 
-  zeroTimedelta = timedelta(0)
-
   def __init__(self, sessionStart, sessionEnd):
     self.start = sessionStart
     self.end = sessionEnd
 
   def isTimeAdvanced(self):
-    return self.timeChange > self.zeroTimedelta
+    return self.timeChange > 0
 
   def isTimePreserved(self):
     return self.end is None or self.start.tzinfo == self.end.tzinfo
 
-  def inferWhenTimeAdvances(self):
-    return self.prepareTimezoneList(self.findFirstAdvancedTimePoint())
-
-  def prepareTimezoneList(self, firstChanged):
-    return [self.start.tzinfo] * firstChanged + [self.end.tzinfo] * (
-    self.timepointsNumber - firstChanged)
-
   def findFirstAdvancedTimePoint(self):
     return self.getIndexOfTheOnlyTrueElement(self.intervals > self.timeChange,
                                       self.NoIntervalsBigEnoughForTimeAdvance,
                                       self.TooManyIntervalsBigEnoughForTimeAdvance)
 
   def infer(self, timepoints):
-    self.timepointsNumber = len(timepoints)
+    changed = self.findChange(timepoints)
+    if changed == len(timepoints):
+      return [self.start.tzinfo] * changed
+
+    return [self.start.tzinfo] * changed + \
+           [self.end.tzinfo] * (len(timepoints) - changed)
+
+  def findChange(self, timepoints):
+    """
+    :return: index of the first timepoint of the end timezone (the number
+             of timepoints if the timezone is not changed)
+    :rtype: int
+    """
     if self.isTimePreserved():
-      return [self.start.tzinfo] * self.timepointsNumber
+      return len(timepoints)
 
-    self.timeChange = self.end.utcoffset() - self.start.utcoffset()
+    self.timeChange = timedeltaToMicroseconds(self.end.utcoffset() - self.start.utcoffset())
     self.makeIntervals(timepoints)
     if self.isTimeAdvanced():
-      return self.inferWhenTimeAdvances()
+      return self.findFirstAdvancedTimePoint()
 
-    return self.inferWhenTimeBacks()
-
-  def inferWhenTimeBacks(self):
-    return self.prepareTimezoneList(self.findFirstBackedTimePoint())
+    return self.findFirstBackedTimePoint()
 
   def findFirstBackedTimePoint(self):
     minInterval = self.intervals.min()
-    if minInterval >= self.zeroTimedelta:
+    if minInterval >= 0:
       raise self.AmbigousTimezoneChangeError
 
     if minInterval < self.timeChange:
@@ -120,14 +173,15 @@ class TimezonesInferrer(object):
       raise tooMany
 
   def makeIntervals(self, timepoints):
-    dtTimepoints = self.getBoundedTimepoints(timepoints)
-    self.intervals = np.array([b - a for (a, b) in
-                               izip(dtTimepoints, islice(dtTimepoints, 1, None))])
+    self.intervals = np.diff(self.getBoundedTimepoints(timepoints))
 
   def getBoundedTimepoints(self, timepoints):
-    return [self.start.replace(tzinfo=None)] +\
-           [datetime(*t) for t in timepoints] +\
-           [self.end.replace(tzinfo=None)]
+    if not isinstance(timepoints, np.ndarray):
+      timepoints = [toMicroseconds(datetime(*t)) for t in timepoints]
+
+    return np.concatenate(([toMicroseconds(self.start)],
+                           timepoints,
+                           [toMicroseconds(self.end)])).astype(np.int64)
 
 
 class LatticeOrderer(object):
@@ -202,3 +256,228 @@ class LatticeOrderer(object):
   def makeOrderedSequence(sequence):
     for first, second in izip(sequence, islice(sequence, 1, None)):
       first.markLessThan(second)
+
+
+class ArrayOrderer(object):
+  """
+  An array counterpart of L{LatticeOrderer} for timepoints given as
+  integers (e.g. microseconds since the epoch).
+
+  The order is the one in which L{LatticeOrderer} pulls timepoints (ties
+  broken by indices of the timepoints): whenever a timepoint is pulled,
+  its successors of smaller values follow before any greater timepoint.
+  Such order is found by propagating maximal ranks of timepoints along the
+  constraints.  The propagation is repeated within groups of timepoints
+  of equal ranks as long as the groups are ambiguous; if it is necessary
+  too many times (e.g. the order of constraints is reverse to the order of
+  values) the L{LatticeOrderer} is used instead.
+  """
+  MAX_LEVELS = 16
+
+  def __init__(self, timepoints):
+    self.__timepoints = np.asarray(timepoints, dtype=np.int64)
+    self.__sequences = []
+    self.__couples = []
+
+  def addOrderedSequence(self, indices):
+    """
+    Declare timepoints of given indices to be ordered; the first one of them
+    is pulled (given it has no predecessors).
+    """
+    indices = np.asarray(indices, dtype=np.intp)
+    if len(indices) > 0:
+      self.__sequences.append(indices)
+
+  def coupleSequences(self, earlier, later):
+    """
+    Declare every timepoint of the earlier indices to precede the respective
+    timepoint of the later indices.
+    """
+    n = min(len(earlier), len(later))
+    if n > 0:
+      self.__couples.append((np.asarray(earlier, dtype=np.intp)[:n],
+                             np.asarray(later, dtype=np.intp)[:n]))
+
+  def pullOrdered(self):
+    """
+    :return: indices of pulled timepoints in the order of pulling
+    :rtype: numpy.ndarray
+    """
+    n = len(self.__timepoints)
+    order = np.lexsort((np.arange(n), self.__timepoints))
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = np.arange(n)
+
+    groups = np.zeros(n, dtype=np.int64)
+    values = ranks + 1
+    for _ in range(self.MAX_LEVELS):
+      keys = self.__propagateMaximum(groups * (n + 1) + values) - groups * (n + 1)
+      order = np.lexsort((keys, groups))
+      isNew = np.ones(n, dtype=bool)
+      isNew[1:] = (np.diff(groups[order]) != 0) | (np.diff(keys[order]) != 0)
+      groups[order] = np.cumsum(isNew) - 1
+      leaders = keys == values
+      if leaders.all():
+        return order[self.__pulled()[order]]
+
+      values = np.where(leaders, 0, values) # leaders precede their groups
+
+    return self.__pullLattice()
+
+  def __propagateMaximum(self, values):
+    values = values.copy()
+    changed = True
+    while changed:
+      changed = False
+      for sequence in self.__sequences:
+        old = values[sequence]
+        new = np.maximum.accumulate(old)
+        if (new != old).any():
+          values[sequence] = new
+          changed = True
+
+      for earlier, later in self.__couples:
+        old = values[later]
+        new = np.maximum(old, values[earlier])
+        if (new != old).any():
+          values[later] = new
+          changed = True
+
+    return values
+
+  def __pulled(self):
+    """
+    :return: mask of timepoints pulled at all (i.e. those which follow
+             the first timepoint of a sequence or are such a timepoint)
+    """
+    n = len(self.__timepoints)
+    hasPredecessor = np.zeros(n, dtype=bool)
+    for sequence in self.__sequences:
+      hasPredecessor[sequence[1:]] = True
+
+    for _, later in self.__couples:
+      hasPredecessor[later] = True
+
+    isFirst = np.zeros(n, dtype=bool)
+    for sequence in self.__sequences:
+      isFirst[sequence[0]] = True
+
+    stray = ~(hasPredecessor | isFirst)
+    return self.__propagateMaximum(stray.astype(np.int8)) == 0
+
+  def __pullLattice(self):
+    orderer = LatticeOrderer()
+    nodes = np.empty(len(self.__timepoints), dtype=object)
+    for i, timepoint in enumerate(self.__timepoints.tolist()):
+      node = LatticeOrderer.Node((timepoint,))
+      node._line = i
+      nodes[i] = node
+
+    for earlier, later in self.__couples:
+      orderer.coupleTuples(nodes[earlier], nodes[later])
+
+    for sequence in self.__sequences:
+      orderer.addOrderedSequence(nodes[sequence])
+
+    return np.array([node._line for node in orderer.pullOrdered()],
+                    dtype=np.intp)
+
+
+class Timeline(object):
+  """
+  Naive time columns with known chronological order of some of their
+  timepoints (e.g. visit ends are logged chronologically).
+  """
+  def __init__(self):
+    self.__columns = []
+    self.__constraints = []
+
+  def __len__(self):
+    return len(self.__columns)
+
+  def addColumn(self, column):
+    """
+    :param column: naive timepoints as microseconds since the epoch
+
+    :return: an index of the column
+    :rtype: int
+    """
+    self.__columns.append(np.ma.getdata(column))
+    return len(self.__columns) - 1
+
+  def addSequence(self, column, indices=None):
+    """
+    Declare timepoints of the column (or those of given indices) to be
+    chronologically ordered.
+    """
+    self.__constraints.append(('sequence', column, indices))
+
+  def coupleColumns(self, earlier, later):
+    """
+    Declare every timepoint of the earlier column to precede the respective
+    timepoint of the later column.
+    """
+    self.__constraints.append(('couple', earlier, later))
+
+  def pullOrdered(self):
+    """
+    :return: chronologically ordered timepoints with their column and row
+             indices
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    lengths = [len(column) for column in self.__columns]
+    offsets = np.cumsum([0] + lengths)
+    timepoints = np.concatenate(self.__columns + [np.array([], dtype=np.int64)])
+    orderer = ArrayOrderer(timepoints)
+    for kind, column, other in self.__constraints:
+      indices = np.arange(offsets[column], offsets[column + 1])
+      if kind == 'couple':
+        orderer.coupleSequences(indices,
+                                np.arange(offsets[other], offsets[other + 1]))
+
+      else:
+        orderer.addOrderedSequence(indices if other is None else indices[other])
+
+    ordered = orderer.pullOrdered()
+    columns = np.repeat(np.arange(len(lengths)), lengths)[ordered]
+    return (timepoints[ordered],
+            columns,
+            ordered - offsets[columns])
+
+  def inferTimezones(self, sessionStart, sessionEnd=None, profile=NO_PROFILE):
+    """
+    :param profile: a profile of the ordering and inference stages
+
+    :return: for every column either its timezone or an array of timezones
+             of its timepoints
+    :rtype: list
+    """
+    return self.inferSessionsTimezones([(sessionStart, sessionEnd)], profile)
+
+  def inferSessionsTimezones(self, sessions, profile=NO_PROFILE):
+    """
+    Like L{inferTimezones}, but for timepoints of many sessions (see
+    L{inferSessionsTimezones}).
+    """
+    timezone = sessions[0][0].tzinfo
+    if all(start.tzinfo == timezone and
+           TimezonesInferrer(start, end).isTimePreserved()
+           for start, end in sessions):
+      return [timezone] * len(self.__columns)
+
+    with profile.stage('order timepoints') as stage:
+      timepoints, columns, rows = self.pullOrdered()
+      stage.rows = len(timepoints)
+
+    with profile.stage('infer timezones', len(timepoints)):
+      codes, timezones = inferSessionsTimezones(timepoints, sessions)
+      known = np.empty(len(timezones), dtype=object)
+      known[:] = timezones
+      timezones = known[codes]
+      result = [np.full(len(column), None, dtype=object)
+                for column in self.__columns]
+      for i, columnTimezones in enumerate(result):
+        selected = columns == i
+        columnTimezones[rows[selected]] = timezones[selected]
+
+    return result
@@ -31,8 +31,7 @@ if sys.version_info >= (3, 0):
   unicode = str
 
 import os
-import csv
-import warnings
+import multiprocessing
 
 try:
   import cStringIO as io
@@ -46,7 +45,8 @@ import pytz
 import numpy as np
 from xml.dom import minidom
 
-from operator import methodcaller, attrgetter, itemgetter
+from operator import methodcaller, attrgetter, itemgetter, getitem
+from functools import partial
 try:
   from itertools import izip, repeat, count
 
@@ -54,7 +54,13 @@ except ImportError:
   from itertools import repeat, count
   izip = zip
 
-from datetime import datetime, timedelta, MINYEAR 
+try:
+  from types import MappingProxyType as _frozenMapping
+
+except ImportError: # Python 2
+  _frozenMapping = dict
+
+from datetime import datetime, timedelta, tzinfo
 
 from .Data import Data
 from .ICNodes import (Animal, Visit, Nosepoke, LogEntry,
@@ -62,49 +68,37 @@ from .ICNodes import (Animal, Visit, Nosepoke, LogEntry,
                       DoorHardwareEvent, LedHardwareEvent,
                       UnknownHardwareEvent, Session)
 
-from ._Tools import (timeToList, ArchiveZipFile, DirectoryZipFile, warn, groupBy,
-                     isString, mapAsList)
-from ._FixTimezones import inferTimezones, LatticeOrderer
+from ._Tools import (ArchiveZipFile, DirectoryZipFile, warn, groupBy,
+                     isString, mapAsList, EPOCH_UTC)
+from ._Columns import (readColumns, columnValues, toTimepoints, joinRows,
+                       groupRows,
+                       toUTCMicroseconds, timedeltaToMicroseconds,
+                       PmCImportWarning, INT, FLOAT, TIME)
+from ._FixTimezones import Timeline
+from ._Cache import TablesCache
+from ._Profile import Profile, NO_PROFILE
 from ._Analysis import Aggregator
+from ._VisitTable import (VisitTable, NosepokeTable, CodedValues, IntValues,
+                          DurationValues, TimepointValues)
 
 # dependence tracking
-from . import _dependencies, Data as _Data, ICNodes, _Tools, _FixTimezones, _Analysis
+from . import _dependencies, Data as _Data, ICNodes, _Tools, _FixTimezones, _Analysis, _Columns, _Cache, _Profile, _VisitTable
 import dateutil
 import types
 __dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values()
                                                       if isinstance(x, types.ModuleType)])
 
 
-class PmCImportWarning(ImportWarning):
-  pass
-
-try:
-  from pymice._cpymice import emptyStringToNone
-
-except Exception as e:
-  warnings.warn('%s\t%s' % (type(e), e),
-                PmCImportWarning)
-
-  def emptyStringToNone(l):
-    for i, x in enumerate(l):
-      if type(x) is list:
-        emptyStringToNone(x)
-
-      elif x == '':
-        l[i] = None
-
-    return l
-
-
-convertFloat = methodcaller('replace', ',', '.')
-
+def fixSessions(timeline, sessions=[], profile=NO_PROFILE):
+  """
+  :param sessions: chronologically ordered sessions
 
-def fixSessions(sortedTimepoints, sessions=[]):
-  assert len(sessions) == 1
-  session = sessions[0]
-  sortedTimezones = inferTimezones(sortedTimepoints, session.Start, session.End)
-  for timepoint, timezone in zip(sortedTimepoints, sortedTimezones):
-    timepoint.append(timezone)
+  :return: timezones of columns of the timeline (see
+           L{Timeline.inferSessionsTimezones})
+  """
+  return timeline.inferSessionsTimezones([(session.Start, session.End)
+                                          for session in sessions],
+                                         profile=profile)
 
 
 class Loader(Data):
@@ -128,38 +122,62 @@ class Loader(Data):
                                },
             }
 
-  _convertZip = {'Animals': {#'Tag': int,
-                            },
-                 'Visits': {#'Tag': int,
-                            #'_vid': int,
-                            'Start': timeToList,
-                            'End': timeToList,
-                            'CornerCondition': convertFloat,
-                            'PlaceError': convertFloat,
-                            'AntennaDuration': convertFloat,
-                            'PresenceDuration': convertFloat,
-                            },
-                 'Nosepokes': {#'_vid': int,
-                               'Start': timeToList,
-                               'End': timeToList,
-                               'LickContactTime': convertFloat,
-                               'LickDuration': convertFloat,
-                               'SideCondition': convertFloat,
-                               'SideError': convertFloat,
-                               'TimeError': convertFloat,
-                               'ConditionError': convertFloat,
-                               },
-                 'Log': {'DateTime': timeToList,
-                         },
-                 'Environment': {'DateTime': timeToList,
-                                 'Temperature': convertFloat,
-                                 },
-                 'HardwareEvents': {'DateTime': timeToList,
-                                    },
-                }
+  _columnTypes = {'Visits': {'VisitID': INT,
+                             'ID': INT,
+                             'Start': TIME,
+                             'End': TIME,
+                             'Cage': INT,
+                             'Corner': INT,
+                             'CornerCondition': INT,
+                             'PlaceError': INT,
+                             'AntennaNumber': INT,
+                             'AntennaDuration': FLOAT,
+                             'PresenceNumber': INT,
+                             'PresenceDuration': FLOAT,
+                             'VisitSolution': INT,
+                             },
+                  'Nosepokes': {'VisitID': INT,
+                                'Start': TIME,
+                                'End': TIME,
+                                'Side': INT,
+                                'SideCondition': INT,
+                                'SideError': INT,
+                                'TimeError': INT,
+                                'ConditionError': INT,
+                                'LickNumber': INT,
+                                'LicksNumber': INT,
+                                'LickContactTime': FLOAT,
+                                'LickDuration': FLOAT,
+                                'LicksDuration': FLOAT,
+                                'AirState': INT,
+                                'DoorState': INT,
+                                'LED1State': INT,
+                                'LED2State': INT,
+                                'LED3State': INT,
+                                },
+                  'Log': {'DateTime': TIME,
+                          'Cage': INT,
+                          'Corner': INT,
+                          'Side': INT,
+                          },
+                  'Environment': {'DateTime': TIME,
+                                  'Temperature': FLOAT,
+                                  'Illumination': INT,
+                                  'Cage': INT,
+                                  },
+                  'HardwareEvents': {'DateTime': TIME,
+                                     'HardwareType': INT,
+                                     'Type': INT,
+                                     'Cage': INT,
+                                     'Corner': INT,
+                                     'Side': INT,
+                                     'State': INT,
+                                     },
+                 }
 
   def __init__(self, fname, getNp=True, getLog=False, getEnv=False, getHw=False,
-               verbose=False, **kwargs):
+               verbose=False, cache=None, profile=False, start=None, end=None,
+               mice=None, groups=None, **kwargs):
     """
     :param fname: a path to the data file.
     :type fname: basestring
@@ -178,26 +196,102 @@ class Loader(Data):
 
     :param verbose: whether to output verbose messages
     :type verbose: bool
+
+    :param cache: a path to a directory of cached tables of data files;
+                  if given, the data file is parsed only if its tables are
+                  not cached or the cache is outdated.
+    :type cache: basestring
+
+    :param profile: whether to record wall time, peak memory and row counts
+                    of stages of loading (see :py:meth:`getProfile`).
+    :type profile: bool
+
+    :param start: a lower bound of the visit Start attribute and of the
+                  DateTime attribute of log entries, environmental
+                  conditions and hardware events to be loaded; rows out of
+                  the bounds are dropped before any object is created.
+    :type start: datetime.datetime or None
+
+    :param end: an upper bound of the visit Start attribute and of the
+                DateTime attribute of log entries, environmental conditions
+                and hardware events to be loaded (see `start`).
+    :type end: datetime.datetime or None
+
+    :param mice: names of animals which visits (and nosepokes) are to be
+                 loaded; other animals are neither loaded.
+    :type mice: collection of basestring or None
+
+    :param groups: names of groups which animals are to be loaded (in
+                   addition to those given in `mice`).
+    :type groups: collection of basestring or None
     """
     for key, value in kwargs.items():
       warn.warn("Unknown argument %s given for Loader constructor." % key, stacklevel=2)
 
+    self.__setUp(fname, getNp, getLog, getEnv, getHw, verbose, profile,
+                 start, end, mice, groups)
+    self._appendData(fname, cache=cache)
+    self.__complete()
+
+  def __setUp(self, fname, getNp, getLog, getEnv, getHw, verbose,
+              profile=False, start=None, end=None, mice=None, groups=None):
     Data.__init__(self, getNp=getNp, getLog=getLog, getEnv=getEnv, getHw=getHw)
-    self._setCageManager(ICCageManager())
+    self._setCageManager(TOPOLOGY)
     self.__verbose = verbose
+    self.__profile = Profile() if profile else None
+    self.__start = start
+    self.__end = end
+    self.__mice = mice
+    self.__groups = groups
 
     self._fnames = (fname,)
 
-    self._appendData(fname)
+  def getProfile(self):
+    """
+    >>> print(Loader('demo.zip', profile=True).getProfile())  # doctest: +SKIP
+    stage                          time [s]  peak memory [MiB]       rows
+    read Animals                      0.001              0.002         11
+    ...
+
+    :return: wall time, peak memory and row counts of stages of loading
+             or None if the loader was created without profiling
+    :rtype: :py:class:`pymice._Profile.Profile` or None
+    """
+    return self.__profile
 
+  def _getProfile(self):
+    return self.__profile if self.__profile is not None else NO_PROFILE
+
+  def __complete(self):
     self._setIcSessionAttributes()
     self.freeze()
 
+  @classmethod
+  def _fromTables(cls, fname, tables, getNp=True, getLog=False, getEnv=False,
+                  getHw=False, verbose=False):
+    """
+    Make a loader of tables already read from the data file
+    (see :py:meth:`_readArchive`).
+    """
+    loader = cls.__new__(cls)
+    loader.__setUp(fname, getNp, getLog, getEnv, getHw, verbose)
+    loader._appendTables(fname, tables)
+    loader.__complete()
+    return loader
 
-  def _appendData(self, fname):
+  def _appendData(self, fname, cache=None):
     """
     Process one input file and append data to self.data
     """
+    self._appendTables(fname,
+                       self._readArchive(fname, getNp=self._getNp,
+                                         getLog=self._getLog,
+                                         getEnv=self._getEnv,
+                                         getHw=self._getHw,
+                                         cache=cache,
+                                         profile=self._getProfile()))
+
+  def _appendTables(self, fname, tables):
     if self.__verbose:
       if isinstance(fname, str): #XXX: Python3
         print('loading data from {}'.format(fname))
@@ -205,6 +299,67 @@ class Loader(Data):
       else:
         print('loading data from {}'.format(fname.encode('utf-8')))
 
+    profile = self._getProfile()
+    if tables is not None:
+      # reported here, so cached and parallel loads report them as well
+      if len(tables['UnmatchedNosepokes']) > 0:
+        self._warnUnmatchedNosepokes(tables['UnmatchedNosepokes'])
+
+      if self.__start is not None or self.__end is not None \
+         or self.__mice is not None or self.__groups is not None:
+        with profile.stage('select rows') as stage:
+          tables = self._selectRows(tables, self._combineSelections(
+                     self._selectTimeWindow(tables, self.__start, self.__end),
+                     self._selectAnimals(tables, self.__mice, self.__groups)))
+          stage.rows = len(tables['Visits'][tables['ZipLoader'].VISIT_ID_FIELD])
+
+      self._loadTables(tables, source=fname, profile=profile)
+
+    with profile.stage('build cache') as stage:
+      self._buildCache()
+      if profile is not NO_PROFILE: # lists of all the nodes are not cheap
+        stage.rows = sum(map(len, [self.getVisits(), self.getLog(),
+                                   self.getEnvironment(),
+                                   self.getHardwareEvents()]))
+
+  @classmethod
+  def _readArchive(cls, fname, getNp=True, getLog=False, getEnv=False,
+                   getHw=False, cache=None, profile=NO_PROFILE):
+    """
+    Read tables of the data file; no nodes are created, so the result
+    may be cheaply passed between processes or cached.
+
+    :param cache: a path to a directory of cached tables
+    :type cache: basestring or None
+
+    :param profile: a profile of stages of reading
+
+    :return: tables of the data file or None if the file format is unknown
+    :rtype: dict
+    """
+    flags = {'getNp': getNp,
+             'getLog': getLog,
+             'getEnv': getEnv,
+             'getHw': getHw,
+             }
+    if cache is None:
+      return cls._parseArchive(fname, profile=profile, **flags)
+
+    cache = TablesCache(cache)
+    with profile.stage('read cache'):
+      tables = cache.load(fname, flags)
+
+    if tables is None:
+      tables = cls._parseArchive(fname, profile=profile, **flags)
+      if tables is not None:
+        with profile.stage('write cache'):
+          cache.store(fname, flags, tables)
+
+    return tables
+
+  @classmethod
+  def _parseArchive(cls, fname, getNp=True, getLog=False, getEnv=False,
+                    getHw=False, profile=NO_PROFILE):
     if fname.endswith('.zip') or os.path.isdir(fname):
       if isString(fname) and os.path.isdir(fname):
         zf = DirectoryZipFile(fname)
@@ -212,151 +367,286 @@ class Loader(Data):
       else:
         zf = ArchiveZipFile(fname)
 
-      self._loadZip(zf, source=fname)
+      return cls._readZip(zf, getNp=getNp, getLog=getLog, getEnv=getEnv,
+                          getHw=getHw, profile=profile)
 
-    self._buildCache()
+  @classmethod
+  def _readZip(cls, zf, getNp=True, getLog=False, getEnv=False, getHw=False,
+               profile=NO_PROFILE):
+    ZipLoader = cls._getZipLoader(zf)
+    tables = {'ZipLoader': ZipLoader,
+              'Animals': cls._fromZipCSV(zf, 'Animals', profile)}
+
+    sessions = cls._extractSessions(zf)
+
+    timeline = Timeline()
+    timeFields = []
+
+    def addTimeColumn(name, field):
+      timeFields.append((name, field))
+      return timeline.addColumn(tables[name][field])
+
+    visits = tables['Visits'] = cls._fromZipCSV(zf, 'Visits', profile)
+
+    vids = visits[ZipLoader.VISIT_ID_FIELD]
+    vStarts = addTimeColumn('Visits', 'Start')
+    vEnds = addTimeColumn('Visits', 'End')
+    timeline.coupleColumns(vStarts, vEnds)
+    timeline.addSequence(vEnds)
+    timeline.addSequence(vStarts, np.argsort(vids))
+
+    tables['Nosepokes'] = None
+    tables['NosepokeVisits'] = None
+    # VisitIDs of unmatched nosepokes (reported when the tables are loaded)
+    tables['UnmatchedNosepokes'] = np.array([], dtype=np.int64)
+    if getNp:
+      nosepokes = tables['Nosepokes'] = cls._fromZipCSV(zf, 'Nosepokes',
+                                                        profile)
 
-  def _loadZip(self, zf, source=None):
-    ZipLoader = self._getZipLoader(zf)
-    self._loadAnimals(zf, ZipLoader)
-    tagToAnimal = self._makeTagToAnimalDict()
-    loader = ZipLoader(source, self._cageManager, tagToAnimal)
+      npVids = nosepokes['VisitID']
+      npStarts = addTimeColumn('Nosepokes', 'Start')
+      npEnds = addTimeColumn('Nosepokes', 'End')
 
-    sessions = self._extractSessions(zf)
+      # rows of visits of nosepokes (-1 for unmatched nosepokes)
+      with profile.stage('join nosepokes', len(npVids)):
+        npRows = tables['NosepokeVisits'] = joinRows(cls._joinKeys(vids),
+                                                     cls._joinKeys(npVids))
 
-    timeOrderer = LatticeOrderer()
+      if len(npVids) > 0: # disables annoying warning on comparison of empty array
+        vTags = np.append(visits[ZipLoader.VISIT_TAG_FIELD], None)
 
-    visits = self._fromZipCSV(zf, 'Visits', source=source)
+        timeline.coupleColumns(npStarts, npEnds)
+        timeline.addSequence(npEnds)
 
-    vids = visits[loader.VISIT_ID_FIELD]
+        npTags = vTags[npRows]
+        npSides = np.ma.getdata(nosepokes['Side']) % 2 # no bilocation assumed
 
-    if sessions is not None:
-      # for es, ee, ss, ll in izip(visits['Start'], visits['End'], visits['_source'], visits['_line']):
-      #   ee._type = 'v.End'
-      #   ee._source = ss
-      #   ee._line = ll
-      #   es._type = 'v.Start'
-      #   es._source = ss
-      #   es._line = ll
-      vEnds = visits['End']
-      vStarts = visits['Start']
+        for tag in cls._getTags(ZipLoader, tables['Animals']):
+          for side in (0, 1): # tailpokes correction
+            timeline.addSequence(npStarts,
+                                 np.flatnonzero((npTags == tag) * (npSides == side)))
 
-      timeOrderer.coupleTuples(vStarts, vEnds)
-      timeOrderer.makeOrderedSequence(vEnds)
-      timeOrderer.addOrderedSequence(np.array(vStarts + [None], dtype=object)[np.argsort(mapAsList(int, vids))])
+        tables['UnmatchedNosepokes'] = np.ma.getdata(npVids)[npRows < 0]
 
-    else: #XXX
-      timeToFix = visits['End'] + visits['Start']
+    tables['Log'] = None
+    if getLog:
+      tables['Log'] = cls._fromZipCSV(zf, 'Log', profile)
+      timeline.addSequence(addTimeColumn('Log', 'DateTime'))
 
-    nosepokes = None
-    if self._getNp:
-      nosepokes = self._fromZipCSV(zf, 'Nosepokes', source=source)
+    for name, flag in [('Environment', getEnv),
+                       ('HardwareEvents', getHw)]:
+      tables[name] = None
+      if flag:
+        try:
+          tables[name] = cls._fromZipCSV(zf, name, profile)
 
-      npVids = nosepokes['VisitID']
+        except KeyError:
+          pass
 
-      if len(npVids) > 0: # disables annoying warning on comparison of empty array
-        vid2tag = dict(zip(vids, visits[loader.VISIT_TAG_FIELD]))
-
-        if sessions is not None:
-          # for es, ee, ss, ll in izip(nosepokes['Start'], nosepokes['End'], nosepokes['_source'], nosepokes['_line']):
-          #   ee._type = 'n.End'
-          #   ee._source = ss
-          #   ee._line = ll
-          #   es._type = 'n.Start'
-          #   es._source = ss
-          #   es._line = ll
-
-          npEnds = nosepokes['End']
-          npStarts = nosepokes['Start']
-          timeOrderer.coupleTuples(npStarts, npEnds)
-          timeOrderer.makeOrderedSequence(npEnds)
-
-          npStarts = np.array(npStarts + [None], dtype=object)[:-1] # None is to force a creation of a 1D array of lists instead of a 2D array
-
-          npTags = np.array(mapAsList(vid2tag.__getitem__, npVids))
-          npSides = np.array(mapAsList(int, nosepokes['Side'])) % 2 # no bilocation assumed
-          # XXX                   ^ - ugly... possibly duplicated
-
-          for tag in tagToAnimal:
-            for side in (0, 1): # tailpokes correction
-              timeOrderer.addOrderedSequence(npStarts[(npTags == tag) * (npSides == side)])
-
-        else: #XXX
-          timeToFix.extend(nosepokes['End'])
-          timeToFix.extend(nosepokes['Start'])
-
-        for vid in npVids:
-          if vid not in vid2tag:
-            warn.warn('Unmatched nosepokes: %s' % vid)
-
-    log = None
-    if self._getLog:
-      log = self._fromZipCSV(zf, 'Log', source=source)
-      if sessions is not None:
-        timeOrderer.addOrderedSequence(log['DateTime'])
-
-      else: #XXX
-        timeToFix.extend(log['DateTime'])
-
-    environment = None
-    if self._getEnv:
-      try:
-        environment = self._fromZipCSV(zf, 'Environment', source=source)
+        else:
+          timeline.addSequence(addTimeColumn(name, 'DateTime'))
 
-      except KeyError:
-        pass
+    if sessions:
+      timezones = fixSessions(timeline, sessions, profile)
 
-      else:
-        if sessions is not None:
-          # for ee, ss, ll in izip(environment['DateTime'], environment['_source'], environment['_line']):
-          #   ee._type = 'e.DateTime'
-          #   ee._source = ss
-          #   ee._line = ll
-          timeOrderer.addOrderedSequence(environment['DateTime'])
+    else:
+      timezones = [pytz.utc] * len(timeFields) # UTC assumed
 
-        else:
-          timeToFix.extend(environment['DateTime'])
+    tables['timezones'] = [(name, field, timezone) for (name, field), timezone
+                           in izip(timeFields, timezones)]
+    return tables
 
-    hardware = None
-    if self._getHw:
-      try:
-        hardware = self._fromZipCSV(zf, 'HardwareEvents', source=source)
+  @staticmethod
+  def _warnUnmatchedNosepokes(vids, shown=10):
+    """
+    Report nosepokes of missing visits with a single warning; such
+    nosepokes are not loaded (see L{_assignNosepokesToVisits}).
 
-      except KeyError:
-        pass
+    :param vids: VisitIDs of unmatched nosepokes
+    :param shown: the number of missing VisitIDs listed in the warning
+    """
+    missing = np.unique(vids).tolist()
+    listed = ', '.join(str(vid) for vid in missing[:shown])
+    if len(missing) > shown:
+      listed += ', ...'
 
-      else:
-        if sessions is not None:
-          timeOrderer.addOrderedSequence(hardware['DateTime'])
+    warn.warn('Unmatched nosepokes: %d (VisitID: %s)' % (len(vids), listed))
 
-        else: #XXX
-          timeToFix.extend(hardware['DateTime'])
+  _TIME_WINDOW_FIELDS = [('Visits', 'Start'),
+                         ('Log', 'DateTime'),
+                         ('Environment', 'DateTime'),
+                         ('HardwareEvents', 'DateTime'),
+                         ]
 
-    #XXX important only when timezone changes!
-    if sessions is not None:
-      fixSessions(timeOrderer.pullOrdered(), sessions)
+  @classmethod
+  def _selectTimeWindow(cls, tables, start=None, end=None):
+    """
+    Select visits (with their nosepokes), log entries, environmental
+    conditions and hardware events of start <= time < end.
 
-    else:
-      for t in timeToFix:
-        t.append(pytz.utc) # UTC assumed
+    :return: boolean masks of selected rows of tables (see
+             :py:meth:`_selectRows`)
+    :rtype: dict
+    """
+    selections = {}
+    if start is None and end is None:
+      return selections
+
+    timezones = dict(((name, field), timezone)
+                     for name, field, timezone in tables['timezones'])
+    for name, field in cls._TIME_WINDOW_FIELDS:
+      table = tables[name]
+      if table is None:
+        continue
+
+      times = toUTCMicroseconds(table[field], timezones[name, field])
+      selected = ~np.ma.getmaskarray(table[field])
+      if start is not None:
+        selected &= times >= timedeltaToMicroseconds(start - EPOCH_UTC)
+
+      if end is not None:
+        selected &= times < timedeltaToMicroseconds(end - EPOCH_UTC)
+
+      selections[name] = selected
+
+    return selections
+
+  @staticmethod
+  def _selectAnimals(tables, mice=None, groups=None):
+    """
+    Select animals of given names or groups and their visits (by the animal
+    tag).
+
+    :return: boolean masks of selected rows of tables (see
+             :py:meth:`_selectRows`)
+    :rtype: dict
+    """
+    if mice is None and groups is None or tables['Animals'] is None:
+      return {}
+
+    ZipLoader = tables['ZipLoader']
+    names = set(unicode(mouse) for mouse in mice) if mice is not None else set()
+    if groups is not None:
+      members = ZipLoader.loadGroups(tables['Animals'])
+      for group in groups:
+        if group in members:
+          names.update(members[group])
+
+    animals = ZipLoader.loadAnimals(tables['Animals'])
+    selected = np.array([animal.Name in names for animal in animals],
+                        dtype=bool)
+    tags = set(tag for animal, isSelected in izip(animals, selected)
+               if isSelected for tag in animal.Tag)
+    visitTags = columnValues(tables['Visits'][ZipLoader.VISIT_TAG_FIELD])
+    return {'Animals': selected,
+            'Visits': np.array([tag in tags for tag in visitTags],
+                               dtype=bool),
+            }
+
+  @staticmethod
+  def _combineSelections(*selections):
+    result = {}
+    for selection in selections:
+      for name, selected in selection.items():
+        result[name] = result[name] & selected if name in result else selected
+
+    return result
+
+  @staticmethod
+  def _selectRows(tables, selections):
+    """
+    :param selections: boolean masks of selected rows of tables; nosepokes
+                       are selected with their visits (unmatched nosepokes
+                       are always selected, but they are not loaded)
+    :type selections: {str: numpy.ndarray, ...}
+
+    :return: tables of the selected rows with original line numbers (the
+             '_line' column)
+    :rtype: dict
+    """
+    selections = dict(selections)
+    result = dict(tables)
+    if 'Visits' in selections and tables['Nosepokes'] is not None:
+      visitSelection = selections['Visits']
+      npRows = tables['NosepokeVisits']
+      selections['Nosepokes'] = np.append(visitSelection, True)[npRows]
+      newRows = np.append(np.cumsum(visitSelection) - 1, -1)
+      result['NosepokeVisits'] = newRows[npRows[selections['Nosepokes']]]
+
+    for name, selected in selections.items():
+      table = tables[name]
+      if '_line' not in table:
+        table = dict(table, _line=np.arange(1, len(selected) + 1))
+
+      result[name] = dict((label, column[selected])
+                          for label, column in table.items())
+
+    result['timezones'] = []
+    for name, field, timezone in tables['timezones']:
+      if name in selections and isinstance(timezone, np.ndarray):
+        timezone = timezone[selections[name]]
 
-    self.__convertNecessaryFieldsToDatetime(visits, nosepokes,
-                                            log, environment, hardware)
+      result['timezones'].append((name, field, timezone))
 
+    return result
 
-    self._insertNewVisits(loader.loadVisits(visits, nosepokes))
-    if log is not None:
-      self._insertNewLog(loader.loadLog(log))
+  @staticmethod
+  def _joinKeys(column):
+    # missing keys match each other
+    return np.ma.filled(column, np.iinfo(np.int64).min)
+
+  @staticmethod
+  def _getTags(ZipLoader, animalData):
+    return [tag for animal in ZipLoader.loadAnimals(animalData)
+            for tag in animal.Tag]
 
-    if environment is not None:
-      self._insertNewEnv(loader.loadEnv(environment))
+  def _loadTables(self, tables, source=None, profile=NO_PROFILE):
+    ZipLoader = tables['ZipLoader']
+    self._loadAnimals(ZipLoader, tables['Animals'])
+    tagToAnimal = self._makeTagToAnimalDict()
+    loader = ZipLoader(source, self._cageManager, tagToAnimal)
 
-    if hardware is not None:
-      self._insertNewHw(loader.loadHw(hardware))
+    nosepokeTimezones = {}
+    visitTimezones = {}
+    with profile.stage('convert datetimes') as stage:
+      converted = []
+      for name, field, timezone in tables['timezones']:
+        table = tables[name]
+        if name == 'Nosepokes': # converted on the first access to nosepokes
+          nosepokeTimezones[field] = timezone
+          continue
+
+        if name == 'Visits': # kept in the visit table
+          visitTimezones[field] = timezone
+          continue
+
+        table[field] = toTimepoints(table[field], timezone)
+        converted.append(len(table[field]))
+
+      stage.rows = sum(converted)
+
+    with profile.stage('load visits') as stage:
+      visits = loader.loadVisitTable(tables['Visits'],
+                                     tables['Nosepokes'],
+                                     tables['NosepokeVisits'],
+                                     nosepokeTimezones,
+                                     visitTimezones)
+      self._insertNewVisits(visits)
+      stage.rows = len(visits)
+
+    for name, load, insert in [('Log', loader.loadLog, self._insertNewLog),
+                               ('Environment', loader.loadEnv, self._insertNewEnv),
+                               ('HardwareEvents', loader.loadHw, self._insertNewHw)]:
+      if tables[name] is not None:
+        with profile.stage('load ' + name) as stage:
+          nodes = load(tables[name])
+          insert(nodes)
+          stage.rows = len(nodes)
 
-  def _extractSessions(self, zf):
+  @classmethod
+  def _extractSessions(cls, zf):
     try:
-      with self._findAndOpenZipFile(zf, 'Sessions.xml') as fh:
+      with cls._findAndOpenZipFile(zf, 'Sessions.xml') as fh:
         dom = minidom.parse(fh)
 
       aos = dom.getElementsByTagName('ArrayOfSession')[0]
@@ -383,7 +673,8 @@ class Loader(Data):
         if end is not None and start.tzinfo != end.tzinfo:
           warn.warn(UserWarning('Timezone changed!'))
 
-        for sessionStart, sessionEnd in sessions:
+        for other in sessions:
+          sessionStart, sessionEnd = other.Start, other.End
           if sessionEnd is None:
             continue
 
@@ -402,29 +693,15 @@ class Loader(Data):
       pass
     return sessions
 
-  def __convertNecessaryFieldsToDatetime(self, visits, nosepokes,
-                                         log, environment, hardware):
-    self.__convertTimeBoundsToDatetime(visits)
-    if nosepokes is not None:
-      self.__convertTimeBoundsToDatetime(nosepokes)
-    for table in [log, environment, hardware]:
-      if table is not None:
-        self.__convertFieldToDatetime('DateTime', table)
-
-  def __convertTimeBoundsToDatetime(self, visits):
-    self.__convertFieldToDatetime('Start', visits)
-    self.__convertFieldToDatetime('End', visits)
-
-  def __convertFieldToDatetime(self, field, table):
-    table[field] = [datetime(*x) for x in table[field]]
-
-  def _getZipLoader(self, zf):
-    version = self._checkVersion(zf)
+  @classmethod
+  def _getZipLoader(cls, zf):
+    version = cls._checkVersion(zf)
     return ZipLoader_v_Version1 if version == 'version1' else ZipLoader_v_IntelliCage_Plus_3
 
 
-  def _checkVersion(self, zf):
-    with self._findAndOpenZipFile(zf, 'DataDescriptor.xml') as fh:
+  @classmethod
+  def _checkVersion(cls, zf):
+    with cls._findAndOpenZipFile(zf, 'DataDescriptor.xml') as fh:
       dom = minidom.parse(fh)
 
     dd = dom.getElementsByTagName('DataDescriptor')[0]
@@ -433,12 +710,22 @@ class Loader(Data):
     assert versionStr.nodeType == versionStr.TEXT_NODE
     return versionStr.nodeValue.strip().lower()
 
-  def _fromZipCSV(self, zf, path, source=None, oldLabels=None):
-    with self._findAndOpenZipFile(zf, path + '.txt') as fh:
-      return self._fromCSV(fh,
-                           source=source,
-                           convert=self._convertZip.get(path),
-                           oldLabels=oldLabels)
+  @classmethod
+  def _fromZipCSV(cls, zf, path, profile=NO_PROFILE):
+    columnTypes = cls._columnTypes.get(path, {})
+    with cls._findAndOpenZipFile(zf, path + '.txt') as fh:
+      if profile is NO_PROFILE:
+        return cls._fromCSV(fh, columnTypes)
+
+      # chunks of the file are read and parsed alternately
+      stages = ['read ' + path, 'parse ' + path]
+      with profile.interleavedStages(*stages) as recorder:
+        columns = cls._fromCSV(fh, columnTypes,
+                               timer=lambda part: recorder.part(part + ' ' + path))
+        rows = len(next(iter(columns.values()))) if columns else 0
+        recorder.rows = dict.fromkeys(stages, rows)
+
+    return columns
 
   @staticmethod
   def _findAndOpenZipFile(zf, path):
@@ -448,51 +735,9 @@ class Loader(Data):
     except KeyError:
       return zf.open('IntelliCage/' + path)
 
-  def _fromCSV(self, fh, source=None, convert=None, oldLabels=None):
-    return self.__fromCSV(list(csv.reader(fh, delimiter='\t')),
-                          source,
-                          convert,
-                          oldLabels)
-
-  def __fromCSV(self, data, source, convert, oldLabels):
-    if len(data) == 0:
-      return None
-
-    labels = data.pop(0)
-    if isinstance(oldLabels, set):
-      oldLabels.clear()
-      oldLabels.update(labels)
-
-    n = len(data)
-    if n == 0:
-      return dict((l, []) for l in labels)
-
-    emptyStringToNone(data)
-    return self.__DictOfColumns(labels, data, source, convert)
-
-  class __DictOfColumns(dict):
-    def __init__(self, labels, rows, source, conversions):
-      dict.__init__(self, zip(labels, zip(*rows)))
-      self.__rowCount = len(rows)
-
-      if source is not None:
-        self.__appendDebugInformation(source)
-
-      if conversions is not None:
-        self.__convertCollumns(conversions)
-
-    def __appendDebugInformation(self, source):
-      assert '_source' not in self
-      self['_source'] = [source] * self.__rowCount
-
-      assert '_line' not in self
-      self['_line'] = range(1, self.__rowCount + 1)
-
-    def __convertCollumns(self, conversions):
-      for label, f in conversions.items():
-        if label in self:
-          self[label] = mapAsList(f, self[label])
-
+  @staticmethod
+  def _fromCSV(fh, columnTypes={}, timer=None):
+    return readColumns(fh, columnTypes, timer=timer)
 
   def _setIcSessionAttributes(self):
     for log in self.getLog():
@@ -516,9 +761,7 @@ class Loader(Data):
                self._fnames.__str__()
     return mystring
 
-  def _loadAnimals(self, zf, loader):
-    animalData = self._fromZipCSV(zf, 'Animals')
-
+  def _loadAnimals(self, loader, animalData):
     animals = loader.loadAnimals(animalData)
 
     for animal in animals:
@@ -608,11 +851,12 @@ class Merger(Data):
                 stacklevel=2)
 
     Data.__init__(self, getNp=getNp, getLog=getLog, getEnv=getEnv, getHw=getHw)
-    self._setCageManager(ICCageManager())
+    self._setCageManager(TOPOLOGY)
 
-    self._dataSources = map(str, dataSources)
+    self._dataSources = mapAsList(str, dataSources)
 
-    self.__topTime = datetime(MINYEAR, 1, 1, tzinfo=pytz.timezone('Etc/GMT-14'))
+    # the latest timepoint (in microseconds since the epoch, UTC) of merged data
+    self.__topTime = None
 
     for dataSource in self._sortDataSources(dataSources):
       try:
@@ -622,6 +866,9 @@ class Merger(Data):
         print("ERROR processing {}".format(dataSource))
         raise
 
+    # visits of every source are (almost) ordered by Start, so their orders
+    # are merged instead of sorting all the visits on every query
+    self._cacheVisitOrder('Start')
     self.freeze()
 
 
@@ -696,181 +943,245 @@ class Merger(Data):
       gData = dataSource.getGroup(group)
       self._registerGroup(**gData)
 
-    visits = dataSource.getVisits()
+    start = dataSource._getEarliestVisitStart()
+    if start is not None and self.__topTime is not None \
+       and start < self.__topTime:
+      print("Possible temporal overlap of visits")
 
-    if visits != None:
-      try:
-        minStart = min(v.Start for v in visits)
+    self._insertDataOf(dataSource, getLog=self._getLog, getEnv=self._getEnv,
+                       getHw=self._getHw)
 
-      except ValueError:
-        pass
+    end = dataSource._getLatestTimepoint(getNp=self._getNp,
+                                         getLog=self._getLog,
+                                         getEnv=self._getEnv,
+                                         getHw=self._getHw)
+    if end is not None:
+      self.__topTime = end if self.__topTime is None else max(self.__topTime, end)
 
-      else:
-        if minStart < self.__topTime:
-          print("Possible temporal overlap of visits")
+    self._buildCache()
 
-      self.insertVisits(visits)
 
-    if self._getHw:
-      hardware = dataSource.getHardwareEvents()
-      if hardware is not None:
-        self.insertHw(hardware)
+def loadMany(paths, workers=None, getNp=True, getLog=False, getEnv=False,
+             getHw=False, ignoreMiceDifferences=False, verbose=False,
+             cache=None):
+  """
+  Load data files in a pool of processes and merge them.
 
-    if self._getEnv:
-      env = dataSource.getEnvironment()
-      if env is not None:
-        self.insertEnv(env)
+  Usage: loadMany(paths, [workers, parameters])
 
-    if self._getLog:
-      log = dataSource.getLog()
-      if log is not None:
-        self.insertLog(log)
+  :param paths: paths to the data files.
+  :type paths: [basestring, ...]
 
-    ## XXX more data loading here
+  :param workers: number of processes reading the files (defaults to the
+                  number of CPUs); if 1, the files are read in the calling
+                  process.
+  :type workers: int
 
-    if visits != None:
-      maxEnd = [self.__topTime]
-      maxEnd.extend(v.End for v in visits)
-      if self._getNp:
-        maxEnd.extend(n.End for v in visits if v.Nosepokes for n in v.Nosepokes)
+  :param getNp: whether to load nosepoke data.
+  :type getNp: bool
 
-      self.__topTime = max(maxEnd)
+  :param getLog: whether to load log.
+  :type getLog: bool
 
-    if self._getHw and hardware:
-      self.__topTime = max(self.__topTime, max(hw.DateTime for hw in hardware))
+  :param getEnv: whether to load environmental data.
+  :type getEnv: bool
 
-    if self._getEnv and env:
-      self.__topTime = max(self.__topTime, max(en.DateTime for en in env))
+  :param getHw: whether to load hardware data.
+  :type getHw: bool
 
-    if self._getLog and log:
-      self.__topTime = max(self.__topTime, max(l.DateTime for l in log))
+  :param ignoreMiceDifferences: whether to ignore encountered differences
+                                in animal description (e.g. sex)
+  :type ignoreMiceDifferences: bool
 
-    self._buildCache()
+  :param verbose: whether to output verbose messages
+  :type verbose: bool
 
+  :param cache: a path to a directory of cached tables of data files
+                (see :py:class:`Loader`).
+  :type cache: basestring
 
-class ICSide(int):
-  #__slots__ = ('__Corner',)
-  def __setattr__(self, key, value):
-    if key == '_ICSide__Corner':
-      self.__dict__[key] = value
+  :return: merged data
+  :rtype: :py:class:`Merger`
+  """
+  paths = list(paths)
+  flags = {'getNp': getNp,
+           'getLog': getLog,
+           'getEnv': getEnv,
+           'getHw': getHw,
+           }
+  if workers is None:
+    workers = multiprocessing.cpu_count()
+
+  workers = min(workers, len(paths))
+  if workers > 1:
+    pool = multiprocessing.Pool(workers)
+    try:
+      loaders = _loadTables(paths,
+                            pool.imap(partial(_readArchive, cache=cache,
+                                              **flags),
+                                      paths),
+                            verbose, flags)
+
+    except:
+      pool.terminate()
+      raise
 
     else:
-      raise AttributeError(key)
+      pool.close()
 
-  def __new__(cls, value, corner):
-    obj = int.__new__(cls, value)
-    obj.__Corner = corner
-    return obj
+    finally:
+      pool.join()
 
-  def _del_(self):
-    del self.__Corner
+  else:
+    loaders = _loadTables(paths,
+                          (_readArchive(path, cache=cache, **flags)
+                           for path in paths),
+                          verbose, flags)
 
-  @property
-  def Corner(self):
-    return self.__Corner
+  return Merger(*loaders,
+                ignoreMiceDifferences=ignoreMiceDifferences,
+                **flags)
 
+def _readArchive(path, **flags):
+  return Loader._readArchive(path, **flags)
 
-class ICCorner(int):
-  class NoSideError(KeyError):
-    pass
+def _loadTables(paths, tables, verbose, flags):
+  return [Loader._fromTables(path, pathTables, verbose=verbose, **flags)
+          for path, pathTables in izip(paths, tables)]
 
-  #__slots__ = ('__Cage', '__sides', '__sideMapping')
-  def __setattr__(self, key, value):
-    if key in ('_ICCorner__Cage', '_ICCorner__sides', '_ICCorner__sideMapping'):
-      self.__dict__[key] = value
 
-    else:
-      raise AttributeError(key)
+def _topologyNode(cls, value, **links):
+  # The links to related nodes are attributes of a (slotted) class of the
+  # node's own, so topology nodes need neither instance attributes
+  # (impossible for int subclasses) nor registries keyed by id().
+  links['__slots__'] = ()
+  return int.__new__(type(cls.__name__, (cls,), links), value)
 
-  def __new__(cls, value, cage):
-    obj = int.__new__(cls, value)
-    obj.__Cage = cage
 
-    obj.__sides = []
-    obj.__sideMapping = {}
+class ICSide(int):
+  """
+  A side of a corner (see L{ICCage}).
+
+  ``ICSide(side, corner)`` is ``corner[side]``.
+  """
+  __slots__ = ()
+  Corner = None # set for the class of every side of the topology
+
+  def __new__(cls, value, corner):
+    return corner[value]
+
+  def __reduce__(self):
+    # sides are looked up in the topology on unpickling
+    return (getitem, (self.Corner, int(self)))
 
-    for i, s in enumerate(['left', 'right'], obj * 2 - 1):
-      side = ICSide(i, obj)
-      obj.__sides.append(side)
-      obj.__sideMapping[i] = side
-      obj.__sideMapping[str(i)] = side
-      obj.__sideMapping[s] = side
 
-    return obj
+class ICCorner(int):
+  """
+  A corner of a cage (see L{ICCage}).
+
+  ``ICCorner(corner, cage)`` is ``cage[corner]``.
+  """
+  class NoSideError(KeyError):
+    pass
+
+  __slots__ = ()
+  Cage = None # set for the class of every corner of the topology
+  _sides = _frozenMapping({}) # side keys -> sides
+
+  def __new__(cls, value, cage):
+    return cage[value]
 
   def __getitem__(self, side):
     try:
-      return self.__sideMapping[side]
+      return self._sides[side]
 
     except KeyError:
       raise self.NoSideError(side)
 
-  def _del_(self):
-    for side in self.__sides:
-      side._del_()
-
-    del self.__Cage
-
-  @property
-  def Cage(self):
-    return self.__Cage
+  def __reduce__(self):
+    # corners are looked up in the topology on unpickling
+    return (getitem, (self.Cage, int(self)))
 
   Left = property(itemgetter('left'))
   Right = property(itemgetter('right'))
 
 
 class ICCage(int):
+  """
+  A cage of the process-wide, immutable topology of cages, corners and
+  sides shared by all data objects (``ICCage(1) is ICCage(1)``).
+
+  A cage is built once, together with its corners and sides, which are
+  never created again.  The topology objects have no instance attributes;
+  links between them are attributes of per-node classes, so there is no
+  reference cycle among the nodes and the only registry is the one of
+  cages by their numbers.
+  """
   class NoCornerError(KeyError):
     pass
 
-  #__slots__ = ('__corners', '__cornerMapping')
-  def __setattr__(self, key, value):
-    if key in ('_ICCage__corners', '_ICCage__cornerMapping'):
-      self.__dict__[key] = value
+  __slots__ = ()
+  __cages = {} # number -> cage
+  _corners = _frozenMapping({}) # corner keys -> corners
 
-    else:
-      raise AttributeError(key)
+  def __new__(cls, value):
+    value = int(value)
+    try:
+      return ICCage.__cages[value]
+
+    except KeyError:
+      return ICCage.__cages.setdefault(value, ICCage.__build(value))
 
-  def __init__(self, _):
-    self.__corners = [ICCorner(i, self) for i in range(1, 5)]
-    self.__cornerMapping = {}
-    for corner in self.__corners:
-      self.__cornerMapping[corner] = corner
-      self.__cornerMapping[str(corner)] = corner
+  @staticmethod
+  def __build(value):
+    corners = {}
+    cage = _topologyNode(ICCage, value, _corners=_frozenMapping(corners))
+    for i in range(1, 5):
+      sides = {}
+      corner = _topologyNode(ICCorner, i, Cage=cage,
+                             _sides=_frozenMapping(sides))
+      for j, s in enumerate(['left', 'right'], i * 2 - 1):
+        sides[j] = sides[str(j)] = sides[s] = _topologyNode(ICSide, j,
+                                                            Corner=corner)
+
+      corners[i] = corners[str(i)] = corner
+
+    return cage
 
   def __getitem__(self, corner):
     try:
-      return self.__cornerMapping[corner]
+      return self._corners[corner]
 
     except KeyError:
       raise self.NoCornerError(corner)
 
-  def _del_(self):
-    for corner in self.__corners:
-      corner._del_()
+  def __reduce__(self):
+    return (ICCage, (int(self),))
 
 
 class ICCageManager(object):
-  __slots__ = ('__cageMapping', '__cages')
-
-  def __init__(self):
-    self.__cageMapping = {}
-    self.__cages = []
+  """
+  A stateless mapping of cage numbers (or their string representations)
+  to cages of the shared topology (see L{ICCage}).
+  """
+  __slots__ = ()
 
   def __getitem__(self, cage):
-    try:
-      return self.__cageMapping[cage]
+    if isinstance(cage, ICCage): # already resolved (e.g. when cloning)
+      return cage
+
+    return ICCage(cage)
+
+  def __reduce__(self):
+    # the shared manager is unpickled as itself (see L{TOPOLOGY})
+    if self is TOPOLOGY:
+      return 'TOPOLOGY'
+
+    return (ICCageManager, ())
 
-    except KeyError:
-      item = ICCage(cage)
-      self.__cages.append(item)
-      self.__cageMapping[int(cage)] = item
-      self.__cageMapping[str(cage)] = item
-      return item
 
-  def _del_(self):
-    for cage in self.__cages:
-      cage._del_()
+# the cage manager shared by all data objects
+TOPOLOGY = ICCageManager()
 
 
 class ZipLoader_v_IntelliCage_Plus_3(object):
@@ -879,32 +1190,6 @@ class ZipLoader_v_IntelliCage_Plus_3(object):
     self._cageManager = cageManager
     self._source = source
 
-  def _makeVisit(self, Cage, Corner, AnimalTag, Start, End, ModuleName,
-                 CornerCondition, PlaceError,
-                 AntennaNumber, AntennaDuration, PresenceNumber, PresenceDuration,
-                 VisitSolution, _line, nosepokeRows):
-    animal = self.__animalManager[AnimalTag]
-    cage = self._cageManager[Cage]
-    corner = cage[Corner]
-
-    Nosepokes = None
-    if nosepokeRows is not None:
-      Nosepokes = tuple(self._makeNosepoke(corner, row)\
-                        for row in sorted(nosepokeRows))
-
-    return Visit(Start, corner, animal, End,
-                 unicode(ModuleName) if ModuleName is not None else None,
-                 cage,
-                 int(CornerCondition) if CornerCondition is not None else None,
-                 int(PlaceError) if PlaceError is not None else None,
-                 int(AntennaNumber) if AntennaNumber is not None else None,
-                 timedelta(seconds=float(AntennaDuration)) if AntennaDuration is not None else None,
-                 int(PresenceNumber) if PresenceNumber is not None else None,
-                 timedelta(seconds=float(PresenceDuration)) if PresenceDuration is not None else None,
-                 int(VisitSolution) if VisitSolution is not None else None,
-                 self._source, _line,
-                 Nosepokes)
-
   def _makeNosepoke(self, sideManager, nosepokeTuple):
     (Start, End, Side,
      SideCondition, SideError, TimeError, ConditionError,
@@ -935,20 +1220,74 @@ class ZipLoader_v_IntelliCage_Plus_3(object):
                   'VisitSolution',]
   VISIT_ID_FIELD = 'VisitID'
   VISIT_TAG_FIELD = 'AnimalTag'
-  def loadVisits(self, visitsCollumns, nosepokesCollumns=None):
+  def loadVisits(self, visitsCollumns, nosepokesCollumns=None,
+                 nosepokeVisits=None, nosepokeTimezones={}, timezones={}):
+    """
+    :return: visits (see L{loadVisitTable})
+    :rtype: [VisitProxy, ...]
+    """
+    return list(self.loadVisitTable(visitsCollumns, nosepokesCollumns,
+                                    nosepokeVisits, nosepokeTimezones,
+                                    timezones))
+
+  def loadVisitTable(self, visitsCollumns, nosepokesCollumns=None,
+                     nosepokeVisits=None, nosepokeTimezones={}, timezones={}):
+    """
+    :param nosepokeTimezones: timezones of time columns of nosepokes which
+                              are given as naive microseconds since the epoch
+                              (see L{toTimepoints})
+    :param timezones: timezones of time columns of visits which are given
+                      as naive microseconds since the epoch
+
+    :return: visits kept in columns
+    :rtype: L{VisitTable}
+    """
+    vIDs = visitsCollumns[self.VISIT_ID_FIELD]
+    n = len(vIDs)
+    nosepokes = None
     if nosepokesCollumns is not None:
-      vNosepokes = self._assignNosepokesToVisits(nosepokesCollumns,
-                                                 visitsCollumns[self.VISIT_ID_FIELD])
+      nosepokes = self._assignNosepokesToVisits(nosepokesCollumns,
+                                                columnValues(vIDs),
+                                                nosepokeVisits,
+                                                nosepokeTimezones)
+
+    (Cage, Corner, AnimalTag, Start, End, ModuleName,
+     CornerCondition, PlaceError,
+     AntennaNumber, AntennaDuration, PresenceNumber, PresenceDuration,
+     VisitSolution) = [visitsCollumns.get(x) for x in self.VISIT_FIELDS]
+
+    cages = columnValues(Cage)
+    cageManager = self._cageManager
+    columns = {'Animal': CodedValues.fromValues(columnValues(AnimalTag),
+                                                self.__animalManager.__getitem__),
+               'Cage': CodedValues.fromValues(cages, cageManager.__getitem__),
+               'Corner': CodedValues.fromValues(izip(cages, columnValues(Corner)),
+                                                lambda key: cageManager[key[0]][key[1]]),
+               'Module': CodedValues.fromValues(columnValues(ModuleName) if ModuleName is not None else repeat(None, n),
+                                                lambda x: unicode(x) if x is not None else None),
+               '_source': CodedValues(np.zeros(n, dtype=np.int8), [self._source]),
+               '_line': IntValues.fromColumn(visitsCollumns.get('_line',
+                                                                np.arange(1, n + 1)),
+                                             n),
+               'Start': TimepointValues.fromColumn(Start, n, timezones.get('Start')),
+               'End': TimepointValues.fromColumn(End, n, timezones.get('End')),
+               }
+    for name, column in [('CornerCondition', CornerCondition),
+                         ('PlaceError', PlaceError),
+                         ('AntennaNumber', AntennaNumber),
+                         ('PresenceNumber', PresenceNumber),
+                         ('VisitSolution', VisitSolution)]:
+      columns[name] = IntValues.fromColumn(column, n)
+
+    for name, column in [('AntennaDuration', AntennaDuration),
+                         ('PresenceDuration', PresenceDuration)]:
+      columns[name] = DurationValues.fromColumn(column, n)
 
-    else:
-      vNosepokes = repeat(None)
+    if nosepokes is not None:
+      table, offsets = nosepokes
+      columns.update(table.aggregate(offsets))
 
-    vColValues = [visitsCollumns.get(x, repeat(None)) \
-                  for x in self.VISIT_FIELDS]
-    vLines = count(1)
-    vColValues.append(vLines)
-    vColValues.append(vNosepokes)
-    return mapAsList(self._makeVisit, *vColValues)
+    return VisitTable(columns, nosepokes)
 
   NOSEPOKE_FIELDS = ['Start', 'End', 'Side',
                      'SideCondition', 'SideError',
@@ -958,21 +1297,28 @@ class ZipLoader_v_IntelliCage_Plus_3(object):
                      'AirState', 'DoorState',
                      'LED1State', 'LED2State',
                      'LED3State']
-  def _assignNosepokesToVisits(self, nosepokesCollumns, vIDs):
-    vNosepokes = [[] for _ in vIDs]
-    vidToNosepokes = dict((vId, nps) for vId, nps in izip(vIDs, vNosepokes))
-
-    nColValues = [nosepokesCollumns.get(x, repeat(None)) \
-                  for x in self.NOSEPOKE_FIELDS]
-    nIDs = nosepokesCollumns['VisitID']
-    nRows = len(nIDs)
-    nLines = range(1, 1 + nRows)
-    nColValues.append(nLines)
-
-    for vId, row in izip(nIDs, izip(*nColValues)):
-      vidToNosepokes[vId].append(row)
+  def _assignNosepokesToVisits(self, nosepokesCollumns, vIDs,
+                               nosepokeVisits=None, timezones={}):
+    """
+    :param nosepokeVisits: rows of visits of nosepokes (-1 if unmatched);
+                           found by VisitID if not given.
+
+    :return: a table of nosepokes and offsets of rows of nosepokes of every
+             visit in the table (see L{VisitTable}); unmatched nosepokes
+             (reported while reading, see L{Loader._warnUnmatchedNosepokes})
+             are dropped
+    :rtype: (NosepokeTable, numpy.ndarray)
+    """
+    if nosepokeVisits is None:
+      vidToRow = dict(izip(vIDs, count()))
+      nosepokeVisits = np.array([vidToRow.get(vId, -1) for vId
+                                 in columnValues(nosepokesCollumns['VisitID'])],
+                                dtype=np.intp)
 
-    return vNosepokes
+    order, offsets = groupRows(nosepokeVisits, len(vIDs))
+    unmatched = offsets[0]
+    return (NosepokeTable(self, nosepokesCollumns, order[unmatched:], timezones),
+            offsets - unmatched)
 
   def _makeLog(self, DateTime, Category, Type,
                Cage, Corner, Side, Notes, _line):
@@ -1017,16 +1363,16 @@ class ZipLoader_v_IntelliCage_Plus_3(object):
     colValues = cls._getColumnValues(columnNames, columns)
     return mapAsList(objectFactory, *colValues)
 
-  _hwClass = {'0': AirHardwareEvent,
-              '1': DoorHardwareEvent,
-              '2': LedHardwareEvent,
+  _hwClass = {0: AirHardwareEvent,
+              1: DoorHardwareEvent,
+              2: LedHardwareEvent,
               }
 
   def _makeHw(self, DateTime, Type, Cage, Corner, Side, State, _line):
     cage, corner, side = self._getHwCageCornerSide(Cage, Corner, Side)
 
     try:
-      return self._hwClass[Type](DateTime, cage, corner, side,
+      return self._hwClass[int(Type)](DateTime, cage, corner, side,
                                  int(State), self._source, _line)
 
     except KeyError:
@@ -1060,9 +1406,20 @@ class ZipLoader_v_IntelliCage_Plus_3(object):
                                    'State'],
                                   self._makeHw)
 
+  @classmethod
+  def _getColumnValues(cls, columnNames, columns):
+    return [columnValues(columns.get(c)) for c in columnNames] + [cls._getLines(columns)]
+
   @staticmethod
-  def _getColumnValues(columnNames, columns):
-    return [columns.get(c) for c in columnNames] + [count(1)]
+  def _getLines(columns):
+    """
+    :return: line numbers of rows (given in the '_line' column if the rows
+             are a selection of lines)
+    """
+    if '_line' in columns:
+      return columnValues(columns['_line'])
+
+    return count(1)
 
   @classmethod
   def loadAnimals(cls, columns):
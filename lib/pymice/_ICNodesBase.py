@@ -34,9 +34,10 @@ else:
 from operator import attrgetter
 
 from ._Tools import isString
+from ._Columns import utcMicroseconds, fromUTCMicroseconds
 
 # dependence tracking
-from . import _dependencies, _Tools
+from . import _dependencies, _Tools, _Columns
 import types
 __dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values()
                                                       if isinstance(x, types.ModuleType)])
@@ -44,16 +45,95 @@ __dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().value
 
 def makePrivateSlots(attributes, name):
   prefix = '_%s__' % name
-  return tuple(prefix + s for s in attributes)
+  return tuple(s if isSpecial(s) else prefix + s for s in attributes)
+
+
+def isSpecial(attribute):
+  """
+  >>> isSpecial('__weakref__'), isSpecial('_line')
+  (True, False)
+  """
+  return attribute.startswith('__') and attribute.endswith('__')
+
+
+def splitTimepoint(timepoint):
+  """
+  :param timepoint: a datetime object (or None) or a (microseconds since
+                    the epoch (UTC), timezone) pair (see L{toTimepoints})
+
+  :return: a value to be stored in a timepoint slot and a value to be stored
+           in its timezone slot (see L{makeTimepointProperties})
+  :rtype: tuple
+  """
+  if isinstance(timepoint, tuple):
+    return timepoint
+
+  return timepoint, None
+
+
+def joinTimepoint(timepoint, timezone):
+  """
+  Reverse of L{splitTimepoint}.
+  """
+  if timezone is None:
+    return timepoint
+
+  return timepoint, timezone
+
+
+def makeTimepointProperties(slot, timezoneSlot):
+  """
+  If the timezone slot is not None, the timepoint slot contains microseconds
+  since the epoch (UTC) to be converted to a datetime object on the first
+  access to the timepoint.
+
+  :return: a property of the timepoint and a property of the timepoint as
+           microseconds since the epoch (UTC)
+  :rtype: (property, property)
+  """
+  def getTimepoint(self):
+    timezone = getattr(self, timezoneSlot)
+    if timezone is None:
+      return getattr(self, slot)
+
+    timepoint = fromUTCMicroseconds(getattr(self, slot), timezone)
+    setattr(self, slot, timepoint)
+    setattr(self, timezoneSlot, None)
+    return timepoint
+
+  def getMicroseconds(self):
+    timepoint = getattr(self, slot)
+    if timepoint is None or getattr(self, timezoneSlot) is not None:
+      return timepoint
+
+    return utcMicroseconds(timepoint)
+
+  return property(getTimepoint), property(getMicroseconds)
 
 
 class BaseNodeMetaclass(type):
+  """
+  Attributes listed in `_timepoints` are datetime objects created on demand
+  (see L{makeTimepointProperties}); for every such attribute (e.g. `Start`)
+  a property of its value in microseconds since the epoch (UTC) is available
+  (e.g. `_utcStart`).
+  """
   def __new__(mcl, name, bases, attrs):
     attributes = attrs['__slots__']
+    timepoints = attrs.pop('_timepoints', ())
     slots = makePrivateSlots(attributes, name)
-    attrs['__slots__'] = slots
-    attrs.update(zip(attributes,
-                     (property(attrgetter(s)) for s in slots)))
+    timezoneSlots = makePrivateSlots(['_%sTimezone' % t for t in timepoints],
+                                     name)
+    attrs['__slots__'] = slots + timezoneSlots
+    for attribute, timezoneSlot in zip(timepoints, timezoneSlots):
+      slot = slots[attributes.index(attribute)]
+      attrs[attribute], attrs['_utc' + attribute] = makeTimepointProperties(slot,
+                                                                            timezoneSlot)
+
+    attrs.update((attribute, property(attrgetter(s)))
+                 for attribute, s in zip(attributes, slots)
+                 if attribute not in attrs # explicit properties take priority
+                 and not isSpecial(attribute))
 
     return type.__new__(mcl, name, bases, attrs)
 
@@ -83,8 +163,9 @@ class VisitMetaclass(BaseNodeMetaclass):
 
   @classmethod
   def __addNosepokeSummaryPropertiesToDict(cls, dict):
-    dict.update(cls.__makeNosepokeSummaryPropertyPair(*propertyAttr) \
-                for propertyAttr in cls.__npSummaryProperties)
+    dict.update(pair for pair in (cls.__makeNosepokeSummaryPropertyPair(*propertyAttr) \
+                                  for propertyAttr in cls.__npSummaryProperties)
+                if pair[0] not in dict) # explicit properties take priority
 
   @classmethod
   def __makeNosepokeSummaryPropertyPair(cls, arg, start):
@@ -95,13 +176,47 @@ class VisitMetaclass(BaseNodeMetaclass):
   def __makeNosepokeAggregativeProperty(attr, start):
     npAttrGetter = attrgetter(attr)
     def propertyGetter(self):
-      nosepokes = self._Visit__Nosepokes
+      nosepokes = self.Nosepokes
       if nosepokes is not None:
         return sum(imap(npAttrGetter, nosepokes), start)
 
     return property(propertyGetter)
 
 
+class LazyNosepokes(object):
+  """
+  Nosepokes of a visit to be created on the first access to its
+  `Nosepokes` property.
+  """
+  __slots__ = ()
+
+  def materialize(self):
+    """
+    :return: new nosepoke objects (not bound to any visit)
+    :rtype: tuple
+    """
+    raise NotImplementedError
+
+  def clone(self, sourceManager, sideManager):
+    return ClonedNosepokes(self, sourceManager, sideManager)
+
+
+class ClonedNosepokes(LazyNosepokes):
+  __slots__ = ('__nosepokes', '__sourceManager', '__sideManager')
+
+  def __init__(self, nosepokes, sourceManager, sideManager):
+    self.__nosepokes = nosepokes
+    self.__sourceManager = sourceManager
+    self.__sideManager = sideManager
+
+  def __len__(self):
+    return len(self.__nosepokes)
+
+  def materialize(self):
+    return tuple(n.clone(self.__sourceManager, self.__sideManager)
+                 for n in self.__nosepokes.materialize())
+
+
 class DurationAware(object):
   class DurationCannotBeCalculatedError(AttributeError):
     pass
@@ -110,7 +225,7 @@ class DurationAware(object):
   @property
   def Duration(self):
     try:
-      return self.End - self.Start
+      return timedelta(microseconds=self._utcEnd - self._utcStart)
 
     except TypeError:
       raise self.DurationCannotBeCalculatedError
@@ -26,6 +26,7 @@
 import numpy as np
 from operator import attrgetter
 from collections import Sequence
+from numbers import Real
 
 # dependence tracking
 from . import _dependencies
@@ -33,6 +34,240 @@ import types
 __dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values() if isinstance(x, types.ModuleType)])
 
 
+def mergeOrders(values, runs):
+  """
+  K-way merge of orders of runs of values.
+
+  :param values: the values
+  :type values: numpy.ndarray
+
+  :param runs: indices of values, every run ordered by the values
+  :type runs: [numpy.ndarray, ...]
+
+  :return: indices of all the values (stably) ordered by the values;
+           ties are ordered as the runs are
+  :rtype: numpy.ndarray
+
+  >>> values = np.array([5, 1, 3, 2, 2, 4])
+  >>> mergeOrders(values, [np.array([1, 2, 0]), np.array([3, 4]),
+  ...                      np.array([5])]).tolist()
+  [1, 3, 4, 2, 5, 0]
+
+  >>> mergeOrders(values, []).tolist()
+  []
+  """
+  runs = [(values[run], run) for run in runs]
+  while len(runs) > 1:
+    runs = [_mergeTwoRuns(runs[i], runs[i + 1]) if i + 1 < len(runs) else runs[i]
+            for i in range(0, len(runs), 2)]
+
+  return runs[0][1] if runs else np.array([], dtype=np.intp)
+
+
+def _mergeTwoRuns(first, second):
+  firstValues, firstIndices = first
+  secondValues, secondIndices = second
+  n = len(firstValues) + len(secondValues)
+  positions = np.searchsorted(firstValues, secondValues, side='right') \
+              + np.arange(len(secondValues))
+  isFirst = np.ones(n, dtype=bool)
+  isFirst[positions] = False
+  values = np.empty(n, dtype=np.result_type(firstValues, secondValues))
+  values[positions] = secondValues
+  values[isFirst] = firstValues
+  indices = np.empty(n, dtype=np.intp)
+  indices[positions] = secondIndices
+  indices[isFirst] = firstIndices
+  return values, indices
+
+
+def _restoreObjectBase(converters, types, runs, orders, frozen=False):
+  objectBase = ObjectBase(converters, types)
+  for objects in runs:
+    objectBase.put(objects)
+
+  for key in orders:
+    objectBase.cacheOrder(*(key if isinstance(key, tuple) else (key,)))
+
+  if frozen:
+    objectBase.freeze()
+
+  return objectBase
+
+
+def numericArray(values):
+  """
+  :return: values as an array of numbers or None if they are not numbers
+  :rtype: numpy.ndarray or None
+
+  >>> numericArray([1, 2.5]).tolist()
+  [1.0, 2.5]
+
+  >>> numericArray([1, None]) is None
+  True
+  """
+  if not isinstance(values, np.ndarray):
+    if not all(isinstance(value, Real) for value in values):
+      return None
+
+    values = np.asarray(values)
+
+  return values if values.dtype.kind in 'iuf' else None
+
+
+# values to be kept as codes of categories (see L{ObjectBase.MaskManager})
+CATEGORICAL = 'categorical'
+
+
+def typedArray(values, dtype):
+  """
+  :return: values as an array of the (integer) dtype or None if they do not
+           fit it (e.g. some are missing)
+  :rtype: numpy.ndarray or None
+
+  >>> typedArray([1, 2], np.int8).dtype == np.int8
+  True
+
+  >>> typedArray([1, None], np.int8) is None
+  True
+
+  >>> typedArray([1, 200], np.int8) is None
+  True
+  """
+  dtype = np.dtype(dtype)
+  values = np.asarray(values)
+  if len(values) == 0:
+    return np.empty(0, dtype=dtype)
+
+  if values.dtype == object:
+    values = np.array(values.tolist())
+
+  if values.dtype.kind not in 'iu' or dtype.kind not in 'iu':
+    return None
+
+  limits = np.iinfo(dtype)
+  if values.min() < limits.min or values.max() > limits.max:
+    return None
+
+  return values.astype(dtype)
+
+
+class Range(object):
+  """
+  A selector of values in a half-open range [lower, upper) (a bound of None
+  is not imposed); see L{ObjectBase.get}.
+
+  >>> Range(1, 3)(np.array([0, 1, 2, 3])).tolist()
+  [False, True, True, False]
+
+  >>> Range(upper=3).search(np.array([0, 1, 2, 3]))
+  (0, 3)
+  """
+  def __init__(self, lower=None, upper=None):
+    self.__lower = lower
+    self.__upper = upper
+
+  def __call__(self, values):
+    if self.__lower is None:
+      return values < self.__upper
+
+    if self.__upper is None:
+      return self.__lower <= values
+
+    return (self.__lower <= values) * (values < self.__upper)
+
+  def search(self, values):
+    """
+    :param values: sorted values
+
+    :return: bounds of the slice of values in the range
+    :rtype: (int, int)
+    """
+    start = 0 if self.__lower is None else \
+            int(np.searchsorted(values, self.__lower, side='left'))
+    stop = len(values) if self.__upper is None else \
+           int(np.searchsorted(values, self.__upper, side='left'))
+    return start, max(start, stop)
+
+
+class ArrayBuffer(object):
+  """
+  A one-dimensional array of amortized O(1) appends: its capacity is doubled
+  whenever exceeded (and its dtype promoted if appended values require).
+
+  >>> buffer = ArrayBuffer([1, 2])
+  >>> buffer.extend([3])
+  >>> buffer.get().tolist()
+  [1, 2, 3]
+
+  >>> len(buffer)
+  3
+
+  >>> buffer.extend([u'abcd'])
+  >>> buffer.get().tolist()
+  ['1', '2', '3', 'abcd']
+
+  >>> buffer = ArrayBuffer(dtype=object)
+  >>> buffer.extend([1, None])
+  >>> buffer.get().tolist()
+  [1, None]
+  """
+  def __init__(self, values=(), dtype=None):
+    self.__dtype = dtype
+    # the buffer owns its array (values may be a read-only view)
+    self.__array = np.array(values, dtype=dtype)
+    self.__size = len(self.__array)
+
+  def __asArray(self, values):
+    return np.asarray(values, dtype=self.__dtype)
+
+  def __len__(self):
+    return self.__size
+
+  def extend(self, values):
+    values = self.__asArray(values)
+    size = self.__size + len(values)
+    # the dtype of an empty buffer is of no importance
+    dtype = np.result_type(self.__array, values) if self.__size else values.dtype
+    if size > len(self.__array) or dtype != self.__array.dtype:
+      array = np.empty(max(size, 2 * len(self.__array)), dtype=dtype)
+      array[:self.__size] = self.__array[:self.__size]
+      self.__array = array
+
+    self.__array[self.__size:size] = values
+    self.__size = size
+
+  def get(self):
+    """
+    :return: the values (a view of the buffer)
+    :rtype: numpy.ndarray
+    """
+    return self.__array[:self.__size]
+
+
+class ObjectTable(object):
+  """
+  A base class for tables of objects which keep (some) attributes of the
+  objects in columns (see L{ObjectBase.put}).
+  """
+  def __len__(self):
+    raise NotImplementedError
+
+  def __iter__(self):
+    """
+    :return: the objects of the table in the order of rows
+    """
+    raise NotImplementedError
+
+  def getColumn(self, attributeName):
+    """
+    :return: values of the attribute of all objects (in the order of rows)
+             or None if the attribute is not kept in a column
+    :rtype: numpy.ndarray or None
+    """
+    return None
+
+
 class ObjectBase(object):
   """
   A base class for efficient object filtering.
@@ -146,12 +381,110 @@ class ObjectBase(object):
   [0, 1, 4, 9]
   """
   class MaskManager(object):
-    def __init__(self, values):
-      self.__values = np.array(values)
+    """
+    Values of an attribute are kept in an array of their type (if given and
+    all the values fit it), so masks are made by NumPy native comparisons.
+
+    >>> mm = ObjectBase.MaskManager([3, 1, 3], np.int8)
+    >>> mm.getMask([3]).tolist()
+    [True, False, True]
+
+    >>> mm.extend([None])
+    >>> mm.getMask([3]).tolist()
+    [True, False, True, False]
+
+    >>> mm.getMask([None]).tolist()
+    [False, False, False, True]
+
+    >>> mm = ObjectBase.MaskManager([None, None], np.int8)
+    >>> mm.getMask([None]).tolist()
+    [True, True]
+
+    >>> mm = ObjectBase.MaskManager([u'a', None, u'b'], CATEGORICAL)
+    >>> mm.extend([u'b', u'c'])
+    >>> mm.getMask([u'b', None]).tolist()
+    [False, True, True, True, False]
+
+    >>> mm.getMask([u'd']).tolist()
+    [False, False, False, False, False]
+
+    >>> mm.getMask(lambda x: x == u'c').tolist()
+    [False, False, False, False, True]
+    """
+    def __init__(self, values, dtype=None):
+      """
+      :param dtype: a NumPy dtype of values or L{CATEGORICAL} if values
+                    are to be kept as codes of categories
+      """
+      self.__dtype = dtype
+      self.__categories = {} if dtype == CATEGORICAL else None
+      self.__values = ArrayBuffer()
+      # encoding may replace the buffer with an untyped one
+      values = self.__encode(values)
+      self.__values.extend(values)
       self.__cachedMasks = {}
 
-    def getMask(self, selector):
+    def __encode(self, values):
+      if self.__categories is not None:
+        if isinstance(values, np.ndarray) and values.dtype != object:
+          values = values.tolist()
+
+        # values are mostly references to a few objects, so only the first
+        # occurrence of every object is looked up in categories
+        ids = np.fromiter(map(id, values), dtype=np.int64, count=len(values))
+        _, first, inverse = np.unique(ids, return_index=True,
+                                      return_inverse=True)
+        categories = self.__categories
+        codes = np.array([categories.setdefault(values[i], len(categories))
+                          for i in first], dtype=np.int32)
+        return codes[inverse.reshape(-1)]
+
+      values = np.asarray(values)
+      if self.__dtype is not None:
+        typed = typedArray(values, self.__dtype)
+        if typed is not None:
+          return typed
+
+        # values of other types (e.g. missing ones) are kept as they are
+        self.__dtype = None
+        self.__values = ArrayBuffer(self.__values.get().astype(object))
+
+      return values
+
+    def __decode(self, values):
+      if self.__categories is None:
+        return values
+
+      categories = [None] * len(self.__categories)
+      for value, code in self.__categories.items():
+        categories[code] = value
+
+      return np.array(categories)[values]
+
+    def extend(self, values):
+      """
+      Append values of new objects; cached masks are extended with masks
+      of the new values only.
+
+      >>> mm = ObjectBase.MaskManager([1, 2])
+      >>> mm.getMask([2]).tolist()
+      [False, True]
+
+      >>> mm.extend([2, 3])
+      >>> mm.getMask([2]).tolist()
+      [False, True, True, False]
+
+      >>> mm.getMask(lambda x: x > 2).tolist()
+      [False, False, False, True]
       """
+      values = self.__encode(values)
+      self.__values.extend(values)
+      for value, mask in self.__cachedMasks.items():
+        mask.extend(self.__matchValue(values, value))
+
+    def getMask(self, selector, indices=None):
+      """
+      :param indices: indices of values the mask is limited to
       >>> mm = ObjectBase.MaskManager([])
       >>> list(mm.getMask(lambda x: x != 0))
       []
@@ -184,18 +517,28 @@ class ObjectBase(object):
       >>> mm = ObjectBase.MaskManager([u'a', u'a', u'b'])
       >>> list(mm.getMask(['b']))
       [False, False, True]
+
+      >>> mm.getMask(['a'], np.array([2, 0])).tolist()
+      [False, True]
+
+      >>> mm.getMask(lambda x: x == u'b', np.array([2])).tolist()
+      [True]
       """
       if hasattr(selector, '__call__'):
-        return selector(self.__values)
+        values = self.__values.get()
+        return selector(self.__decode(values if indices is None else values[indices]))
 
-      return self.__combineMasks(selector)
+      # XXX: Python3 fix
+      masks = list(map(self.__getMasksMatchingValue, selector))
+      if indices is not None:
+        # cached masks are limited to the indices before they are combined
+        masks = [mask[indices] for mask in masks]
 
-    def __combineMasks(self, acceptedValues):
-      if not acceptedValues:
-        return np.zeros_like(self.__values, dtype=bool)
+      if not masks:
+        return np.zeros(len(self.__values) if indices is None else len(indices),
+                        dtype=bool)
 
-      # XXX: Python3 fix
-      return self.__sumMasks(list(map(self.__getMasksMatchingValue, acceptedValues)))
+      return self.__sumMasks(masks)
 
     def __sumMasks(self, masks):
       if len(masks) == 1:
@@ -205,67 +548,427 @@ class ObjectBase(object):
 
     def __getMasksMatchingValue(self, value):
       try:
-        return self.__cachedMasks[value]
+        return self.__cachedMasks[value].get()
 
       except KeyError:
         return self.__makeAndCacheMask(value)
 
     def __makeAndCacheMask(self, value):
-      mask = self.__values == value
+      mask = ArrayBuffer(self.__matchValue(self.__values.get(), value))
       self.__cachedMasks[value] = mask
-      return mask
+      return mask.get()
 
+    def __matchValue(self, values, value):
+      if self.__categories is not None:
+        try:
+          value = self.__categories.get(value, -1)
 
-  def __init__(self, converters={}):
+        except TypeError: # unhashable values are no category
+          value = -1
+
+      return np.broadcast_to(values == value, values.shape)
+
+
+  def __init__(self, converters={}, types={}):
     """
+    :param converters: functions converting values of attributes before
+                       they are filtered
+
+    :param types: types of (converted) values of attributes (see
+                  L{MaskManager})
     """
-    self.__objects = np.array([], dtype=object)
+    self.__objects = ArrayBuffer(dtype=object)
+    # boundaries of runs of objects put at once and their tables (if any)
+    self.__runs = [0]
+    self.__tables = []
     self.__cachedMaskManagers = {}
+    self.__orders = {}
+    self.__ranks = {}
+    self.__frozen = False
     self.__converters = dict(converters)
+    self.__types = dict(types)
 
   def __len__(self):
     return len(self.__objects)
 
   def put(self, objects):
-    self.__objects = np.append(self.__objects,
-                               objects if isinstance(objects, Sequence) else list(objects))
-    self.__cachedMaskManagers.clear()
+    """
+    :param objects: objects to be added; if given as an L{ObjectTable},
+                    attributes kept in the columns of the table are not
+                    extracted from the objects
+    """
+    if isinstance(objects, ObjectTable):
+      table = objects
+      objects = list(objects)
+
+    else:
+      table = None
+      if not isinstance(objects, Sequence):
+        objects = list(objects)
+
+    self.__tables.append(table)
+    self.__objects.extend(objects)
+    self.__runs.append(len(self.__objects))
+    # masks are extended rather than built again for all the objects
+    for attributeName, maskManager in self.__cachedMaskManagers.items():
+      maskManager.extend(self.__getConvertedRunValues(attributeName,
+                                                      objects, table))
+
+    self.__orders.clear()
+    self.__ranks.clear()
+
+  def get(self, filters=None, order=None):
+    """
+    Objects selected by a L{Range} of values of a numeric attribute are
+    found with binary search in the order of the attribute (see
+    L{cacheOrder}; it is cached on demand), so other selectors are applied
+    only to the objects in the range, and neither the whole order nor any
+    mask of all the objects is scanned (the selected objects are sorted
+    back into the order they were put in unless an order is requested).
+
+    :param order: name (or names) of the attribute the returned objects are
+                  (stably) ordered by; the order is a cached permutation of
+                  all the objects (see L{cacheOrder}; it is cached on demand
+                  if the base is frozen, see L{freeze}) limited to the
+                  selected ones, otherwise the selected objects are sorted
+
+    >>> ob = ObjectBase()
+    >>> ob.put([ClassA(3, 1), ClassA(1, 2)])
+    >>> ob.put([ClassA(2, 3), ClassA(1, 4)])
+    >>> ob.cacheOrder('a')
+    >>> ob.get(order='a')
+    [ClassA(a=1, b=2), ClassA(a=1, b=4), ClassA(a=2, b=3), ClassA(a=3, b=1)]
+
+    >>> ob.get({'b': lambda x: x > 1}, order='a')
+    [ClassA(a=1, b=2), ClassA(a=1, b=4), ClassA(a=2, b=3)]
+
+    >>> ob.get({'a': Range(1, 3)})
+    [ClassA(a=1, b=2), ClassA(a=2, b=3), ClassA(a=1, b=4)]
+
+    >>> ob.get({'a': Range(1, 3), 'b': [2, 3]}, order='a')
+    [ClassA(a=1, b=2), ClassA(a=2, b=3)]
+
+    >>> ob.get({'b': Range(upper=3)}, order='a')
+    [ClassA(a=1, b=2), ClassA(a=3, b=1)]
 
-  def get(self, filters=None):
-    return list(self.__getFilteredObjects(filters))
+    Functions are called only for objects accepted by other selectors.
+
+    >>> called = []
+    >>> ob.get({'a': [1], 'b': lambda x: called.append(x.tolist()) or x > 2})
+    [ClassA(a=1, b=4)]
+
+    >>> called
+    [[2, 4]]
+
+    >>> ob.get({'a': [1, 2]}, order=('b',))
+    [ClassA(a=1, b=2), ClassA(a=2, b=3), ClassA(a=1, b=4)]
+
+    >>> ob.freeze()
+    >>> ob.get({'b': Range(2)}, order=('a', 'b'))
+    [ClassA(a=1, b=2), ClassA(a=1, b=4), ClassA(a=2, b=3)]
+
+    >>> ob.hasOrder('a', 'b')
+    True
+    """
+    filters = dict(filters) if filters else {}
+    indices, attributeName = self.__findInRange(filters)
+    key = self.__getOrderKey(order)
+    if key == attributeName: # also if neither a range nor an order is given
+      ordered = True
+
+    elif indices is None:
+      indices = self.__getPermutation(key)
+      ordered = indices is not None
+
+    else:
+      ordered = False
 
-  def __getFilteredObjects(self, filters):
     if filters:
-      return self.__objects[self.__getProductOfMasks(filters)]
+      indices = self.__select(filters, indices)
+
+    objects = self.__objects.get()
+    if not ordered:
+      if indices is None:
+        indices = np.arange(len(objects))
+
+      indices = np.sort(indices) if key is None else \
+                indices[self.__sortIndices(key, indices)]
+
+    return list(objects if indices is None else objects[indices])
+
+  @staticmethod
+  def __getOrderKey(order):
+    """
+    :return: name of the attribute, tuple of names of attributes or None
+    """
+    if not isinstance(order, (tuple, list)):
+      return order
+
+    return order[0] if len(order) == 1 else tuple(order)
+
+  def __getPermutation(self, key):
+    """
+    :return: the cached permutation ordering all the objects or None
+    """
+    if key is None:
+      return None
+
+    if key not in self.__orders and self.__frozen:
+      self.cacheOrder(*(key if isinstance(key, tuple) else (key,)))
 
-    return self.__objects
-      
-  def __getProductOfMasks(self, selectors):
-    mask = True
-    for attributeName, selector in selectors.items():
-      mask = mask * self.__getMask(attributeName, selector)
+    index = self.__orders.get(key)
+    return index[1] if index is not None else None
 
-    return mask
+  def __sortIndices(self, key, indices):
+    """
+    :return: permutation (stably) ordering the indexed objects
+    """
+    ranks = self.__getRanks(key)
+    if ranks is not None:
+      return np.argsort(ranks[indices])
+
+    objects = self.__objects.get()[indices]
+    names = key if isinstance(key, tuple) else (key,)
+    columns = [self.__getConvertedRunValues(name, objects, None)
+               for name in names]
+    values = columns[0] if len(columns) == 1 else list(zip(*columns))
+    return np.array(sorted(range(len(values)), key=values.__getitem__),
+                    dtype=np.intp)
+
+  def __getRanks(self, key):
+    """
+    :return: positions of the objects in the cached order (the inverse of
+             its permutation) or None if the order is not cached
+    """
+    try:
+      return self.__ranks[key]
+
+    except KeyError:
+      permutation = self.__getPermutation(key)
+      if permutation is None:
+        return None
+
+      ranks = np.empty_like(permutation)
+      ranks[permutation] = np.arange(len(permutation))
+      self.__ranks[key] = ranks
+      return ranks
+
+  def __findInRange(self, filters):
+    """
+    Find objects selected by a L{Range} selector (removed from the filters)
+    with binary search.
+
+    :return: indices of the objects in the order of the attribute and name
+             of the attribute or (None, None) if no range can be searched
+    """
+    for attributeName, selector in filters.items():
+      if not isinstance(selector, Range):
+        continue
 
-  def __getMask(self, attributeName, selector):
-    return self.__getMaskManager(attributeName).getMask(selector)
+      if attributeName not in self.__orders:
+        self.cacheOrder(attributeName)
+
+      index = self.__orders[attributeName]
+      if index is not None and index[0] is not None:
+        del filters[attributeName]
+        values, permutation = index
+        return permutation[slice(*selector.search(values))], attributeName
+
+    return None, None
+
+  def cacheOrder(self, *attributeNames):
+    """
+    Cache the (stable) order of objects by (converted) values of the
+    attributes.
+
+    For a numeric attribute every run of objects put at once is ordered
+    separately, then the runs are merged, so it is cheap for runs of objects
+    already (almost) ordered; its values are kept ordered for binary search
+    (see L{get}). No order is cached if the objects can not be ordered.
+
+    >>> ob = ObjectBase()
+    >>> ob.put([ClassA(1j, 1), ClassA(2j, 2)])
+    >>> ob.cacheOrder('a')
+    >>> ob.hasOrder('a')
+    False
+
+    >>> ob.cacheOrder('b', 'a')
+    >>> ob.hasOrder('b', 'a')
+    True
+
+    >>> ob = ObjectBase()
+    >>> ob.put([ClassA(1, 1)])
+    >>> ob.cacheOrder('a')
+    >>> ob.hasOrder('a')
+    True
+
+    >>> ob.put([ClassA(0, 2)])
+    >>> ob.hasOrder('a')
+    False
+    """
+    key = self.__getOrderKey(attributeNames)
+    self.__ranks.pop(key, None)
+    try:
+      columns = [self.__getConvertedAttributeValues(name)
+                 for name in attributeNames]
+
+    except AttributeError: # some objects have no such attribute
+      self.__orders[key] = None
+      return
+
+    numeric = [numericArray(values) for values in columns]
+    if len(numeric) == 1 and numeric[0] is not None:
+      values = numeric[0]
+      runs = [np.arange(start, end)[np.argsort(values[start:end], kind='mergesort')]
+              for start, end in zip(self.__runs[:-1], self.__runs[1:])]
+      permutation = mergeOrders(values, runs)
+      self.__orders[key] = (values[permutation], permutation)
+      return
+
+    if all(values is not None for values in numeric):
+      # the last key of the lexsort is the primary one
+      self.__orders[key] = (None, np.lexsort(numeric[::-1]))
+      return
+
+    columns = [values.tolist() if isinstance(values, np.ndarray) else values
+               for values in columns]
+    values = columns[0] if len(columns) == 1 else list(zip(*columns))
+    try:
+      permutation = sorted(range(len(values)), key=values.__getitem__)
+
+    except TypeError: # the values are not comparable (e.g. some are missing)
+      self.__orders[key] = None
+      return
+
+    self.__orders[key] = (None, np.array(permutation, dtype=np.intp))
+
+  def hasOrder(self, *attributeNames):
+    return self.__orders.get(self.__getOrderKey(attributeNames)) is not None
+
+  def freeze(self):
+    """
+    Declare no more objects are to be put; orders requested since then are
+    cached (see L{get}).
+    """
+    self.__frozen = True
+
+  def getTables(self):
+    """
+    :return: tables of all the objects (in order) or None if some objects
+             were not put as an L{ObjectTable}
+    :rtype: [L{ObjectTable}, ...] or None
+    """
+    tables = [table for table in self.__tables if table is not None]
+    if sum(map(len, tables)) != len(self.__objects):
+      return None
+
+    return tables
+
+  def __reduce__(self):
+    """
+    The object base is pickled as the runs of objects put into it (tables
+    as themselves, not as their objects); masks are not pickled, orders are
+    cached again on unpickling.
+
+    >>> import pickle
+    >>> ob = ObjectBase()
+    >>> ob.put([ClassA(3, 1), ClassA(1, 2)])
+    >>> ob.cacheOrder('a')
+    >>> ob = pickle.loads(pickle.dumps(ob))
+    >>> ob.get(order='a')
+    [ClassA(a=1, b=2), ClassA(a=3, b=1)]
+    """
+    objects = self.__objects.get()
+    runs = [table if table is not None else objects[start:end].tolist()
+            for table, start, end in zip(self.__tables, self.__runs[:-1],
+                                         self.__runs[1:])]
+    return (_restoreObjectBase, (self.__converters, self.__types, runs,
+                                 list(self.__orders), self.__frozen))
+
+  def __select(self, selectors, indices=None):
+    """
+    Selectors are applied one by one, every one only to the objects accepted
+    by the previous ones: collections of accepted values first (their masks
+    are cached), then ranges and then other functions.
+
+    :param indices: indices of objects the selection is limited to (all the
+                    objects if None)
+
+    :return: indices of the selected objects (in the order of indices)
+    :rtype: numpy.ndarray
+    """
+    for attributeName, selector in sorted(selectors.items(),
+                                          key=self.__selectorPriority):
+      selected = np.flatnonzero(self.__getMask(attributeName, selector,
+                                               indices))
+      indices = selected if indices is None else indices[selected]
+      if len(indices) == 0:
+        break
+
+    return indices
+
+  @staticmethod
+  def __selectorPriority(item):
+    selector = item[1]
+    return (hasattr(selector, '__call__'), not isinstance(selector, Range))
+
+  def __getMask(self, attributeName, selector, indices=None):
+    return self.__getMaskManager(attributeName).getMask(selector, indices)
 
   def __getMaskManager(self, attributeName):
     try:
       return self.__cachedMaskManagers[attributeName]
 
     except KeyError:
-      maskManager = self.MaskManager(self.__getConvertedAttributeValues(attributeName))
+      maskManager = self.MaskManager(self.__getConvertedAttributeValues(attributeName),
+                                     self.__types.get(attributeName))
       self.__cachedMaskManagers[attributeName] = maskManager
       return maskManager
 
   def __getConvertedAttributeValues(self, attributeName):
-    attributeValues = self.getAttributes(attributeName)
     if attributeName in self.__converters:
       # XXX: Python3 fix - makes NumPy array working
-      return list(map(self.__converters[attributeName], attributeValues))
+      return list(map(self.__converters[attributeName],
+                      self.getAttributes(attributeName)))
 
-    return attributeValues
+    column = self.__getColumn(attributeName)
+    if column is not None:
+      return column
+
+    return self.getAttributes(attributeName)
+
+  def __getConvertedRunValues(self, attributeName, objects, table):
+    """
+    :return: values of the attribute of objects put at once (see L{put})
+    """
+    column = table.getColumn(attributeName) if table is not None else None
+    if attributeName in self.__converters:
+      values = column.tolist() if column is not None else \
+               list(map(attrgetter(attributeName), objects))
+      return list(map(self.__converters[attributeName], values))
+
+    if column is not None:
+      return column
+
+    return list(map(attrgetter(attributeName), objects))
+
+  def __getColumn(self, attributeName):
+    """
+    :return: values of the attribute if all objects are in tables keeping
+             the attribute in a column, None otherwise
+    """
+    tables = self.getTables()
+    if not tables:
+      return None
+
+    columns = [table.getColumn(attributeName) for table in tables]
+    if any(column is None for column in columns):
+      return None
+
+    if len(columns) == 1:
+      return columns[0]
+
+    return np.concatenate(columns)
 
   def getAttributes(self, *attributeNames):
     """
@@ -293,8 +996,15 @@ class ObjectBase(object):
     >>> ob.getAttributes('a')
     [ClassB(c=1, d=2)]
     """
+    columns = [self.__getColumn(name) for name in attributeNames]
+    if all(column is not None for column in columns):
+      if len(columns) == 1:
+        return columns[0].tolist()
+
+      return list(zip(*[column.tolist() for column in columns]))
+
     # XXX: Python3 fix
-    return list(map(attrgetter(*attributeNames), self.__objects))
+    return list(map(attrgetter(*attributeNames), self.__objects.get()))
 
 
 if __name__ == '__main__':
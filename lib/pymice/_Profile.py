@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# encoding: utf-8
+###############################################################################
+#                                                                             #
+#    PyMICE library                                                           #
+#                                                                             #
+#    Copyright (C) 2012-2017 Jakub M. Dzik a.k.a. Kowalski, S. Łęski          #
+#    (Laboratory of Neuroinformatics; Nencki Institute of Experimental        #
+#    Biology of Polish Academy of Sciences)                                   #
+#                                                                             #
+#    This software is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This software is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this software.  If not, see http://www.gnu.org/licenses/.     #
+#                                                                             #
+###############################################################################
+
+import time
+
+from collections import namedtuple
+
+try:
+  import tracemalloc
+
+except ImportError: # Python 2
+  tracemalloc = None
+
+# dependence tracking
+from . import _dependencies
+import types
+__dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values()
+                                                      if isinstance(x, types.ModuleType)])
+
+
+Stage = namedtuple('Stage', ['name', 'time', 'memory', 'rows'])
+
+
+class Profile(object):
+  """
+  Wall time, peak memory and row counts of stages of data loading.
+
+  >>> ml = Loader('demo.zip', profile=True)
+  >>> profile = ml.getProfile()
+  >>> print(profile)  # doctest: +SKIP
+  stage                          time [s]  peak memory [MiB]       rows
+  read Animals                      0.001              0.002         11
+  ...
+
+  Peak memory is measured with the tracemalloc module (not available
+  in Python 2), which slows down the loading.
+  """
+  def __init__(self):
+    self.__stages = []
+
+  def stage(self, name, rows=None):
+    """
+    :param name: name of the stage
+    :type name: str
+
+    :param rows: number of rows processed in the stage (may be also set as
+                 the `rows` attribute of the returned object)
+    :type rows: int
+
+    :return: a context manager measuring the stage
+    """
+    return _StageRecorder(self.__stages, name, rows)
+
+  def interleavedStages(self, *names):
+    """
+    Measure stages done in parts interleaved with each other (e.g. reading
+    and parsing of chunks of a file).
+
+    >>> with profile.interleavedStages('read', 'parse') as stages:
+    ...   for chunk in chunks:
+    ...     with stages.part('read'):
+    ...       rows = read(chunk)
+    ...     with stages.part('parse'):
+    ...       parse(rows)
+    ...   stages.rows = {'read': len(chunks), 'parse': len(chunks)}
+
+    :param names: names of the stages
+    :type names: str
+
+    :return: a context manager recording the total wall time of parts of
+             every stage and the peak memory of the largest part
+    """
+    return _InterleavedStagesRecorder(self.__stages, names)
+
+  def getStages(self):
+    """
+    :return: stages in order of their completion
+    :rtype: [Stage(name, time, memory, rows), ...]
+    """
+    return list(self.__stages)
+
+  def getStage(self, name):
+    """
+    :return: stages of given name
+    :rtype: [Stage(name, time, memory, rows), ...]
+    """
+    return [stage for stage in self.__stages if stage.name == name]
+
+  def getTime(self):
+    """
+    :return: total wall time [s] of all stages
+    :rtype: float
+    """
+    return sum(stage.time for stage in self.__stages)
+
+  def __str__(self):
+    lines = ['{:<28} {:>10} {:>18} {:>10}'.format('stage', 'time [s]',
+                                                   'peak memory [MiB]',
+                                                   'rows')]
+    for name, duration, memory, rows in self.__stages:
+      lines.append('{:<28} {:>10.3f} {:>18} {:>10}'.format(
+                     name, duration,
+                     '{:.3f}'.format(memory / 1048576.) if memory is not None else '-',
+                     rows if rows is not None else '-'))
+
+    return '\n'.join(lines)
+
+  def __repr__(self):
+    return '<Profile of {} stages ({:.3f} s)>'.format(len(self.__stages),
+                                                      self.getTime())
+
+
+class _StageRecorder(object):
+  def __init__(self, stages, name, rows):
+    self.__stages = stages
+    self.name = name
+    self.rows = rows
+
+  def __enter__(self):
+    self.__memory = _startMemoryTracking()
+    self.__start = time.time()
+    return self
+
+  def __exit__(self, excType, excValue, traceback):
+    duration = time.time() - self.__start
+    if excType is None:
+      self.__stages.append(Stage(self.name, duration,
+                                 _stopMemoryTracking(self.__memory),
+                                 self.rows))
+
+    else:
+      _stopMemoryTracking(self.__memory)
+
+
+class _InterleavedStagesRecorder(object):
+  def __init__(self, stages, names):
+    self.__stages = stages
+    self.__names = names
+    self.__times = dict.fromkeys(names, 0.)
+    self.__memory = dict.fromkeys(names)
+    self.rows = dict.fromkeys(names)
+
+  def __enter__(self):
+    self.__tracking = _startMemoryTracking()
+    return self
+
+  def part(self, name):
+    return _PartRecorder(self, name)
+
+  def _addPart(self, name, duration, memory):
+    self.__times[name] += duration
+    if memory is not None:
+      self.__memory[name] = max(memory, self.__memory[name] or 0)
+
+  def __exit__(self, excType, excValue, traceback):
+    _stopMemoryTracking(self.__tracking)
+    if excType is None:
+      for name in self.__names:
+        self.__stages.append(Stage(name, self.__times[name],
+                                   self.__memory[name], self.rows[name]))
+
+
+class _PartRecorder(object):
+  def __init__(self, recorder, name):
+    self.__recorder = recorder
+    self.__name = name
+
+  def __enter__(self):
+    self.__memory = _startMemoryTracking()
+    self.__start = time.time()
+    return self
+
+  def __exit__(self, excType, excValue, traceback):
+    duration = time.time() - self.__start
+    self.__recorder._addPart(self.__name, duration,
+                             _stopMemoryTracking(self.__memory))
+
+
+def _startMemoryTracking():
+  if tracemalloc is None:
+    return None
+
+  started = not tracemalloc.is_tracing()
+  if started:
+    tracemalloc.start()
+
+  elif hasattr(tracemalloc, 'reset_peak'):
+    tracemalloc.reset_peak()
+
+  else:
+    tracemalloc.clear_traces()
+
+  return started, tracemalloc.get_traced_memory()[0]
+
+
+def _stopMemoryTracking(memory):
+  if memory is None:
+    return None
+
+  started, base = memory
+  peak = tracemalloc.get_traced_memory()[1] - base
+  if started:
+    tracemalloc.stop()
+
+  return peak
+
+
+class NoProfile(object):
+  """
+  A profile ignoring all stages.
+  """
+  def stage(self, name, rows=None):
+    return _NO_STAGE
+
+  def interleavedStages(self, *names):
+    return _NO_STAGE
+
+
+class _NoStage(object):
+  def __enter__(self):
+    return self
+
+  def part(self, name):
+    return self
+
+  def __exit__(self, excType, excValue, traceback):
+    pass
+
+  def __setattr__(self, name, value):
+    pass
+
+
+_NO_STAGE = _NoStage()
+NO_PROFILE = NoProfile()
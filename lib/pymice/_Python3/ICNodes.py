@@ -24,7 +24,8 @@
 ###############################################################################
 
 from .._ICNodesBase import (BaseNodeMetaclass, BaseNode_del_, \
-                            VisitMetaclass, DurationAware, getTimeString)
+                            VisitMetaclass, DurationAware, getTimeString,
+                            LazyNosepokes, splitTimepoint, joinTimepoint)
 
 # dependence tracking
 from .. import _ICNodesBase, _dependencies
@@ -44,7 +45,9 @@ class Visit(BaseNode, DurationAware, metaclass=VisitMetaclass):
                'PresenceNumber', 'PresenceDuration',
                'VisitSolution',
                '_source', '_line',
-               'Nosepokes')
+               'Nosepokes',
+               '__weakref__') # nosepokes refer to their visit weakly
+  _timepoints = ('Start', 'End')
 
 
   def __init__(self, Start, Corner, Animal, End, Module, Cage,
@@ -53,10 +56,10 @@ class Visit(BaseNode, DurationAware, metaclass=VisitMetaclass):
                VisitSolution,
                _source, _line,
                Nosepokes):
-    self.__Start = Start
+    self.__Start, self.___StartTimezone = splitTimepoint(Start)
     self.__Corner = Corner
     self.__Animal = Animal
-    self.__End = End
+    self.__End, self.___EndTimezone = splitTimepoint(End)
     self.__Module = Module
     self.__Cage = Cage
     self.__CornerCondition = CornerCondition
@@ -69,26 +72,56 @@ class Visit(BaseNode, DurationAware, metaclass=VisitMetaclass):
     self.___source = _source
     self.___line = _line
     self.__Nosepokes = Nosepokes
-    if Nosepokes is not None:
+    if Nosepokes is not None and not isinstance(Nosepokes, LazyNosepokes):
       for nosepoke in Nosepokes:
         nosepoke._bindToVisit(self)
 
+  @property
+  def Nosepokes(self):
+    nosepokes = self.__Nosepokes
+    if isinstance(nosepokes, LazyNosepokes):
+      nosepokes = self.__Nosepokes = nosepokes.materialize()
+      for nosepoke in nosepokes:
+        nosepoke._bindToVisit(self)
+
+    return nosepokes
+
   def clone(self, sourceManager, cageManager, animalManager):
     source = sourceManager[self.___source]
     animal = animalManager[self.__Animal]
     cage = cageManager[self.__Cage]
     corner = cage[self.__Corner]
-    nosepokes = tuple(n.clone(sourceManager, corner) for n in self.__Nosepokes) if self.__Nosepokes is not None else None
-    return self.__class__(self.__Start, corner, animal,
-                          self.__End, self.__Module, cage,
+    nosepokes = self.__Nosepokes
+    if isinstance(nosepokes, LazyNosepokes):
+      nosepokes = nosepokes.clone(sourceManager, corner)
+
+    elif nosepokes is not None:
+      nosepokes = tuple(n.clone(sourceManager, corner) for n in nosepokes)
+
+    return self.__class__(joinTimepoint(self.__Start, self.___StartTimezone),
+                          corner, animal,
+                          joinTimepoint(self.__End, self.___EndTimezone),
+                          self.__Module, cage,
                           self.__CornerCondition, self.__PlaceError,
                           self.__AntennaNumber, self.__AntennaDuration,
                           self.__PresenceNumber, self.__PresenceDuration,
                           self.__VisitSolution, source,
                           self.___line, nosepokes)
 
+  def __reduce__(self):
+    # lazy nosepokes are created to be pickled
+    return (self.__class__, (joinTimepoint(self.__Start, self.___StartTimezone),
+                             self.__Corner, self.__Animal,
+                             joinTimepoint(self.__End, self.___EndTimezone),
+                             self.__Module, self.__Cage,
+                             self.__CornerCondition, self.__PlaceError,
+                             self.__AntennaNumber, self.__AntennaDuration,
+                             self.__PresenceNumber, self.__PresenceDuration,
+                             self.__VisitSolution, self.___source,
+                             self.___line, self.Nosepokes))
+
   def _del_(self):
-    if self.__Nosepokes:
+    if self.__Nosepokes and not isinstance(self.__Nosepokes, LazyNosepokes):
       for nosepoke in self.__Nosepokes:
         nosepoke._del_()
 
@@ -103,4 +136,4 @@ class Visit(BaseNode, DurationAware, metaclass=VisitMetaclass):
   def __repr__(self):
     return '< Visit of "%s" to corner #%d of cage #%d (at %s) >' % \
            (self.__Animal, self.__Corner, self.__Cage,
-            getTimeString(self.__Start))
\ No newline at end of file
+            getTimeString(self.Start))
\ No newline at end of file
@@ -0,0 +1,725 @@
+#!/usr/bin/env python
+# encoding: utf-8
+###############################################################################
+#                                                                             #
+#    PyMICE library                                                           #
+#                                                                             #
+#    Copyright (C) 2012-2017 Jakub M. Dzik a.k.a. Kowalski, S. Łęski          #
+#    (Laboratory of Neuroinformatics; Nencki Institute of Experimental        #
+#    Biology of Polish Academy of Sciences)                                   #
+#                                                                             #
+#    This software is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This software is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this software.  If not, see http://www.gnu.org/licenses/.     #
+#                                                                             #
+###############################################################################
+
+try:
+  from itertools import izip, repeat
+
+except ImportError:
+  from itertools import repeat
+  izip = zip
+
+from datetime import timedelta, tzinfo
+from operator import attrgetter
+
+import numpy as np
+
+from .ICNodes import BaseNode, Visit
+from ._ICNodesBase import (VisitMetaclass, DurationAware, LazyNosepokes,
+                           getTimeString)
+from ._Columns import (columnValues, toDatetimes, toTimepoints,
+                       encodeTimezones, fixedOffsets,
+                       utcMicroseconds, fromUTCMicroseconds)
+from ._ObjectBase import ObjectTable
+
+# dependence tracking
+from . import _dependencies, ICNodes, _ICNodesBase, _Columns, _ObjectBase
+import types
+__dependencies__ = _dependencies.moduleDependencies(*[x for x in globals().values()
+                                                      if isinstance(x, types.ModuleType)])
+
+
+def objectArray(values):
+  """
+  :return: a one-dimensional array of the values (even if they are sequences)
+  :rtype: numpy.ndarray
+  """
+  values = list(values)
+  array = np.empty(len(values), dtype=object)
+  for i, value in enumerate(values):
+    array[i] = value
+
+  return array
+
+
+class CodedValues(object):
+  """
+  Values shared by many rows (e.g. cages or animals) kept as codes of rows
+  and a list of the values.
+  """
+  def __init__(self, codes, categories):
+    self.__codes = codes
+    self.__categories = categories
+
+  @classmethod
+  def fromValues(cls, values, convert):
+    """
+    :param values: hashable keys of values
+    :param convert: a function mapping a key to the value; called once
+                    for every key (in the order of the first occurrence)
+    """
+    index = {}
+    codes = np.array([index.setdefault(key, len(index)) for key in values],
+                     dtype=np.int32)
+    return cls(codes, [convert(key) for key in sorted(index, key=index.get)])
+
+  def __getitem__(self, row):
+    return self.__categories[self.__codes[row]]
+
+  def map(self, convert):
+    """
+    :return: values sharing the codes with converted categories
+    :rtype: L{CodedValues}
+    """
+    return self.__class__(self.__codes, [convert(x) for x in self.__categories])
+
+  def getValues(self):
+    return objectArray(self.__categories)[self.__codes]
+
+  def getAttribute(self, path):
+    """
+    :param path: an attribute of the values (possibly dotted)
+    """
+    return objectArray(map(attrgetter(path), self.__categories))[self.__codes]
+
+
+class IntValues(object):
+  """
+  Integer values; missing values are masked.
+  """
+  dtype = np.int64
+
+  def __init__(self, values, missing):
+    self._values = values
+    self._missing = missing
+
+  @classmethod
+  def fromColumn(cls, column, n):
+    """
+    :param column: a column (L{INT}/L{FLOAT} or a list of values, None for
+                   missing ones) or None if all values are missing
+    """
+    if column is None:
+      return cls(np.zeros(n, dtype=cls.dtype), np.ones(n, dtype=bool))
+
+    if isinstance(column, np.ndarray) and column.dtype.kind in 'iuf':
+      return cls(np.ma.getdata(column).astype(cls.dtype),
+                 np.ma.getmaskarray(column))
+
+    values = [cls.parse(x) if x is not None else None
+              for x in columnValues(column)]
+    return cls(np.array([0 if x is None else x for x in values],
+                        dtype=cls.dtype),
+               np.array([x is None for x in values], dtype=bool))
+
+  parse = int
+  convert = int
+
+  def __getitem__(self, row):
+    if self._missing[row]:
+      return None
+
+    return self.convert(self._values[row])
+
+  def getMasked(self):
+    """
+    :return: values (arbitrary for missing ones) and the mask of missing ones
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    return self._values, self._missing
+
+  def getValues(self):
+    if not self._missing.any():
+      return self._values
+
+    values = self._values.astype(object)
+    values[self._missing] = None
+    return values
+
+
+class DurationValues(IntValues):
+  """
+  Durations kept as seconds; missing values are masked.
+  """
+  dtype = np.float64
+  parse = float
+
+  @staticmethod
+  def convert(seconds):
+    return timedelta(seconds=float(seconds))
+
+  def getValues(self):
+    return objectArray(self[row] for row in range(len(self._values)))
+
+  def getMasked(self):
+    """
+    :return: durations in microseconds (rounded as by timedelta)
+    """
+    return np.round(self._values * 1e6).astype(np.int64), self._missing
+
+
+class MicrosecondValues(DurationValues):
+  """
+  Durations kept as microseconds; missing values are masked.
+  """
+  dtype = np.int64
+  parse = int
+
+  @staticmethod
+  def convert(microseconds):
+    return timedelta(microseconds=int(microseconds))
+
+  def getMasked(self):
+    return self._values, self._missing
+
+
+class TimepointValues(object):
+  """
+  Timepoints kept as microseconds since the epoch (UTC) and codes of their
+  (fixed offset) timezones; missing values are masked.
+  """
+  def __init__(self, utc, missing, codes, timezones):
+    self.__utc = utc
+    self.__missing = missing
+    self.__codes = codes
+    self.__timezones = timezones
+
+  @classmethod
+  def fromColumn(cls, column, n, timezones=None):
+    """
+    :param column: naive timepoints as microseconds since the epoch (if the
+                   timezones are given) or a list of timepoints (see
+                   L{toTimepoints}); None if all values are missing
+    :param timezones: a timezone of all timepoints or a sequence of timezones
+                      of each timepoint
+
+    :return: values of the column; L{DatetimeValues} if the timepoints
+             can not be kept as UTC microseconds
+    """
+    if column is None:
+      return cls(np.zeros(n, dtype=np.int64), np.ones(n, dtype=bool),
+                 np.zeros(n, dtype=np.int8), [None])
+
+    if timezones is not None:
+      if isinstance(timezones, tzinfo):
+        codes, known = np.zeros(n, dtype=np.int8), [timezones]
+
+      else:
+        codes, known = encodeTimezones(timezones)
+
+      offsets = fixedOffsets(known)
+      if offsets is None:
+        return DatetimeValues(objectArray(toDatetimes(column, timezones)))
+
+      return cls(np.ma.getdata(column) - offsets[codes],
+                 np.ma.getmaskarray(column), codes, known)
+
+    values = list(column)
+    missing = np.array([x is None for x in values], dtype=bool)
+    pairs = [x if isinstance(x, tuple) or x is None else
+             (utcMicroseconds(x), x.tzinfo) for x in values]
+    codes, known = encodeTimezones(x[1] if x is not None else None
+                                   for x in pairs)
+    naive = np.array([tz is None for tz in known], dtype=bool)[codes]
+    if fixedOffsets(known) is None or (naive & ~missing).any():
+      return DatetimeValues(objectArray(x if not isinstance(x, tuple) else
+                                        fromUTCMicroseconds(*x)
+                                        for x in values))
+
+    return cls(np.array([x[0] if x is not None else 0 for x in pairs],
+                        dtype=np.int64),
+               missing, codes, known)
+
+  def __getitem__(self, row):
+    if self.__missing[row]:
+      return None
+
+    return fromUTCMicroseconds(int(self.__utc[row]),
+                               self.__timezones[self.__codes[row]])
+
+  def getTimepoint(self, row):
+    """
+    :return: the timepoint to be passed to a node constructor
+             (see L{toTimepoints})
+    """
+    if self.__missing[row]:
+      return None
+
+    return int(self.__utc[row]), self.__timezones[self.__codes[row]]
+
+  def getUTCValue(self, row):
+    if self.__missing[row]:
+      return None
+
+    return int(self.__utc[row])
+
+  def getUTC(self):
+    """
+    :return: the timepoints as microseconds since the epoch (UTC)
+    """
+    if not self.__missing.any():
+      return self.__utc
+
+    values = self.__utc.astype(object)
+    values[self.__missing] = None
+    return values
+
+  def getValues(self):
+    return objectArray(self[row] for row in range(len(self.__utc)))
+
+  def getMasked(self):
+    """
+    :return: the timepoints as microseconds since the epoch (UTC) and
+             the mask of missing ones
+    """
+    return self.__utc, self.__missing
+
+
+class DatetimeValues(object):
+  """
+  Timepoints kept as datetime objects.
+  """
+  def __init__(self, values):
+    self.__values = values
+
+  def __getitem__(self, row):
+    return self.__values[row]
+
+  getTimepoint = __getitem__
+
+  def getUTCValue(self, row):
+    value = self.__values[row]
+    if value is not None:
+      return utcMicroseconds(value)
+
+  def getUTC(self):
+    return objectArray(self.getUTCValue(row)
+                       for row in range(len(self.__values)))
+
+  def getValues(self):
+    return self.__values
+
+  def getMasked(self):
+    utc = [self.getUTCValue(row) for row in range(len(self.__values))]
+    return (np.array([0 if x is None else x for x in utc], dtype=np.int64),
+            np.array([x is None for x in utc], dtype=bool))
+
+
+def sumSegments(values, missing, offsets):
+  """
+  :param offsets: boundaries of segments (the i-th segment is
+                  values[offsets[i]:offsets[i + 1]])
+
+  :return: sums of segments and a mask of segments with any value missing
+  :rtype: (numpy.ndarray, numpy.ndarray)
+
+  >>> sums, missing = sumSegments(np.array([1, 2, 4, 8]),
+  ...                             np.array([False, False, True, False]),
+  ...                             np.array([0, 2, 2, 4]))
+  >>> sums.tolist(), missing.tolist()
+  ([3, 0, 8], [False, False, True])
+  """
+  sums = np.concatenate(([0], np.cumsum(np.where(missing, 0, values))))
+  gaps = np.concatenate(([0], np.cumsum(missing)))
+  return (sums[offsets[1:]] - sums[offsets[:-1]],
+          gaps[offsets[1:]] > gaps[offsets[:-1]])
+
+
+class NosepokeTable(object):
+  """
+  Nosepokes kept in columns with rows grouped by visits; nosepoke objects
+  are created on demand by the loader.
+  """
+  def __init__(self, loader, columns, order, timezones={}):
+    """
+    :param loader: a ZipLoader
+    :param columns: columns of nosepokes
+    :param order: rows of the nosepokes in the order of their visits
+    :param timezones: timezones of time columns given as naive microseconds
+                      since the epoch (a timezone or timezones of every row)
+    """
+    self.__loader = loader
+    self.__columns = []
+    for field in loader.NOSEPOKE_FIELDS:
+      column = self.__permute(columns.get(field), order)
+      timezone = timezones.get(field)
+      if timezone is not None and not isinstance(timezone, tzinfo):
+        timezone = self.__permute(timezone, order)
+
+      self.__columns.append((column, timezone))
+
+    self.__lines = np.asarray(columns['_line'])[order] if '_line' in columns else order + 1
+
+  @staticmethod
+  def __permute(column, order):
+    if column is None:
+      return None
+
+    if not isinstance(column, np.ndarray):
+      column = objectArray(column)
+
+    return column[order]
+
+  def __len__(self):
+    return len(self.__lines)
+
+  def aggregate(self, offsets):
+    """
+    Sum attributes of nosepokes of every visit (see L{VisitMetaclass}).
+
+    :param offsets: offsets of rows of nosepokes of visits (see L{VisitTable})
+
+    :return: `LickNumber`, `LickContactTime`, `LickDuration` and
+             `NosepokeDuration` of visits (missing if any of summed values
+             is missing)
+    :rtype: {str: L{IntValues}, ...}
+    """
+    n = len(self)
+    ((start, startTimezone), (end, endTimezone),
+     _, _, _, _, _,
+     (lickNumber, _), (lickContactTime, _), (lickDuration, _),
+     _, _, _, _, _) = self.__columns
+    starts, startsMissing = TimepointValues.fromColumn(start, n,
+                                                       startTimezone).getMasked()
+    ends, endsMissing = TimepointValues.fromColumn(end, n,
+                                                   endTimezone).getMasked()
+    aggregates = {}
+    for name, Values, (values, missing) in [
+      ('LickNumber', IntValues, IntValues.fromColumn(lickNumber, n).getMasked()),
+      ('LickContactTime', MicrosecondValues, DurationValues.fromColumn(lickContactTime, n).getMasked()),
+      ('LickDuration', MicrosecondValues, DurationValues.fromColumn(lickDuration, n).getMasked()),
+      ('NosepokeDuration', MicrosecondValues, (ends - starts, startsMissing | endsMissing)),
+      ]:
+      aggregates[name] = Values(*sumSegments(values, missing, offsets))
+
+    return aggregates
+
+  def getLatestEnd(self):
+    """
+    :return: the latest `End` of nosepokes in microseconds since the epoch
+             (UTC) or None
+    """
+    end, timezone = self.__columns[1]
+    ends, missing = TimepointValues.fromColumn(end, len(self),
+                                               timezone).getMasked()
+    if not missing.all():
+      return int(ends[~missing].max())
+
+  def makeNosepokes(self, start, stop, sideManager):
+    """
+    :return: nosepokes from rows start:stop in the order of their attributes
+    :rtype: tuple
+    """
+    rows = izip(*[self.__values(column, timezone, start, stop)
+                  for column, timezone in self.__columns]
+                 + [self.__lines[start:stop].tolist()])
+    return tuple(self.__loader._makeNosepoke(sideManager, row)
+                 for row in sorted(rows, key=self.__sortKey))
+
+  @staticmethod
+  def __values(column, timezone, start, stop):
+    if column is None:
+      return repeat(None)
+
+    if timezone is None:
+      return columnValues(column[start:stop])
+
+    return toTimepoints(column[start:stop],
+                        timezone if isinstance(timezone, tzinfo) else timezone[start:stop])
+
+  @staticmethod
+  def __sortKey(row):
+    # timepoints are compared by their UTC values (see L{toTimepoints})
+    return tuple(x[0] if isinstance(x, tuple) else x for x in row)
+
+
+class NosepokeRows(LazyNosepokes):
+  """
+  Nosepokes of a visit in rows start:stop of a L{NosepokeTable}.
+  """
+  __slots__ = ('__table', '__start', '__stop', '__sideManager')
+
+  def __init__(self, table, start, stop, sideManager):
+    self.__table = table
+    self.__start = start
+    self.__stop = stop
+    self.__sideManager = sideManager
+
+  def __len__(self):
+    return self.__stop - self.__start
+
+  def materialize(self):
+    return self.__table.makeNosepokes(self.__start, self.__stop,
+                                      self.__sideManager)
+
+
+class VisitTable(ObjectTable):
+  """
+  Visits kept in typed columns; visit objects (L{VisitProxy}) read their
+  attributes from the columns.
+  """
+  def __init__(self, columns, nosepokes=None):
+    """
+    :param columns: a mapping from attributes of visits (`Start`, `Corner`,
+                    `Animal`, `End`, `Module`, `Cage`, `CornerCondition`,
+                    `PlaceError`, `AntennaNumber`, `AntennaDuration`,
+                    `PresenceNumber`, `PresenceDuration`, `VisitSolution`,
+                    `_source` and `_line`; optionally `LickNumber`,
+                    `LickContactTime`, `LickDuration` and `NosepokeDuration`)
+                    to their values (L{CodedValues}, L{IntValues},
+                    L{DurationValues} or L{TimepointValues})
+    :param nosepokes: a L{NosepokeTable} and offsets of nosepokes of visits
+                      (nosepokes of the i-th visit are in rows
+                      offsets[i]:offsets[i + 1] of the table) or None if
+                      nosepokes are not loaded
+    """
+    self.__columns = columns
+    self.__nosepokes = nosepokes
+    self.__len = len(columns['_line'].getValues())
+
+  def __len__(self):
+    return self.__len
+
+  def __iter__(self):
+    return iter([VisitProxy(self, row) for row in range(self.__len)])
+
+  def getValue(self, attributeName, row):
+    return self.__columns[attributeName][row]
+
+  def getTimepoint(self, attributeName, row):
+    return self.__columns[attributeName].getTimepoint(row)
+
+  def getUTCValue(self, attributeName, row):
+    return self.__columns[attributeName].getUTCValue(row)
+
+  def getColumn(self, attributeName):
+    name, _, path = attributeName.partition('.')
+    if name.startswith('_utc') and not path:
+      column = self.__columns.get(name[4:])
+      return column.getUTC() if column is not None else None
+
+    column = self.__columns.get(name)
+    if column is None:
+      return None
+
+    if path:
+      if isinstance(column, CodedValues):
+        return column.getAttribute(path)
+
+      return None
+
+    return column.getValues()
+
+  def clone(self, sourceManager, cageManager, animalManager):
+    """
+    Make a table of the same visits for another data object; only coded
+    values are resolved by the managers (see L{Visit.clone}), while other
+    columns and nosepokes are shared.
+
+    :rtype: L{VisitTable}
+    """
+    columns = dict(self.__columns)
+    for name, convert in [('_source', sourceManager.__getitem__),
+                          ('Animal', animalManager.__getitem__),
+                          ('Cage', cageManager.__getitem__),
+                          ('Corner', lambda x: cageManager[x.Cage][x])]:
+      columns[name] = columns[name].map(convert)
+
+    return self.__class__(columns, self.__nosepokes)
+
+  def getLatestNosepokeEnd(self):
+    """
+    :return: the latest `End` of nosepokes of the visits in microseconds
+             since the epoch (UTC) or None
+    """
+    if self.__nosepokes is not None:
+      return self.__nosepokes[0].getLatestEnd()
+
+  def getAggregate(self, attributeName, row):
+    """
+    :return: the precomputed sum of an attribute of nosepokes of the visit
+             or None if not available (see L{NosepokeTable.aggregate})
+    """
+    column = self.__columns.get(attributeName)
+    if column is not None:
+      return column[row]
+
+  def getNosepokeNumber(self, row):
+    if self.__nosepokes is not None:
+      _, offsets = self.__nosepokes
+      return int(offsets[row + 1] - offsets[row])
+
+  def getNosepokes(self, row, sideManager):
+    """
+    :return: nosepokes of the visit (not created yet), () if there is no
+             nosepoke or None if nosepokes are not loaded
+    :rtype: L{NosepokeRows} or tuple or None
+    """
+    if self.__nosepokes is None:
+      return None
+
+    table, offsets = self.__nosepokes
+    start, stop = int(offsets[row]), int(offsets[row + 1])
+    if start < stop:
+      return NosepokeRows(table, start, stop, sideManager)
+
+    return ()
+
+
+def tableProperty(attributeName):
+  def getValue(self):
+    return self._table.getValue(attributeName, self._row)
+
+  return property(getValue)
+
+
+def tableTimepointProperty(attributeName):
+  def getUTCValue(self):
+    return self._table.getUTCValue(attributeName, self._row)
+
+  return property(getUTCValue)
+
+
+def tableAggregateProperty(attributeName, summary):
+  def getValue(self):
+    value = self._table.getAggregate(attributeName, self._row)
+    if value is None: # nosepokes not loaded or some of their values missing
+      return summary.fget(self)
+
+    return value
+
+  return property(getValue)
+
+
+# the Python 2 and 3 compatible way of setting the metaclass
+VisitProxyBase = VisitMetaclass('VisitProxyBase', (BaseNode, DurationAware),
+                                {'__slots__': (), '__module__': __name__})
+
+
+class VisitProxy(VisitProxyBase):
+  """
+  A visit in a row of a L{VisitTable}; it provides the attributes of
+  L{Visit} (read from the table).
+  """
+  __slots__ = ('_table', '_row', 'Nosepokes', '__weakref__')
+
+  def __init__(self, table, row):
+    self.___table = table
+    self.___row = row
+
+  Start = tableProperty('Start')
+  Corner = tableProperty('Corner')
+  Animal = tableProperty('Animal')
+  End = tableProperty('End')
+  Module = tableProperty('Module')
+  Cage = tableProperty('Cage')
+  CornerCondition = tableProperty('CornerCondition')
+  PlaceError = tableProperty('PlaceError')
+  AntennaNumber = tableProperty('AntennaNumber')
+  AntennaDuration = tableProperty('AntennaDuration')
+  PresenceNumber = tableProperty('PresenceNumber')
+  PresenceDuration = tableProperty('PresenceDuration')
+  VisitSolution = tableProperty('VisitSolution')
+  _source = tableProperty('_source')
+  _line = tableProperty('_line')
+
+  _utcStart = tableTimepointProperty('Start')
+  _utcEnd = tableTimepointProperty('End')
+
+  LickNumber = tableAggregateProperty('LickNumber',
+                                      VisitProxyBase.LickNumber)
+  LickContactTime = tableAggregateProperty('LickContactTime',
+                                           VisitProxyBase.LickContactTime)
+  LickDuration = tableAggregateProperty('LickDuration',
+                                        VisitProxyBase.LickDuration)
+  NosepokeDuration = tableAggregateProperty('NosepokeDuration',
+                                            VisitProxyBase.NosepokeDuration)
+
+  @property
+  def Nosepokes(self):
+    try:
+      return self.__Nosepokes
+
+    except AttributeError:
+      nosepokes = self.___table.getNosepokes(self.___row, self.Corner)
+      if isinstance(nosepokes, LazyNosepokes):
+        nosepokes = nosepokes.materialize()
+        for nosepoke in nosepokes:
+          nosepoke._bindToVisit(self)
+
+      self.__Nosepokes = nosepokes
+      return nosepokes
+
+  @property
+  def NosepokeNumber(self):
+    return self.___table.getNosepokeNumber(self.___row)
+
+  def clone(self, sourceManager, cageManager, animalManager):
+    table, row = self.___table, self.___row
+    source = sourceManager[self._source]
+    animal = animalManager[self.Animal]
+    cage = cageManager[self.Cage]
+    corner = cage[self.Corner]
+    try:
+      nosepokes = self.__Nosepokes
+
+    except AttributeError:
+      nosepokes = table.getNosepokes(row, self.Corner)
+      if isinstance(nosepokes, LazyNosepokes):
+        nosepokes = nosepokes.clone(sourceManager, corner)
+
+    else:
+      if nosepokes is not None:
+        nosepokes = tuple(n.clone(sourceManager, corner) for n in nosepokes)
+
+    return Visit(table.getTimepoint('Start', row), corner, animal,
+                 table.getTimepoint('End', row), self.Module, cage,
+                 self.CornerCondition, self.PlaceError,
+                 self.AntennaNumber, self.AntennaDuration,
+                 self.PresenceNumber, self.PresenceDuration,
+                 self.VisitSolution, source,
+                 self._line, nosepokes)
+
+  def __reduce__(self):
+    # nosepokes are created again on demand
+    return (VisitProxy, (self.___table, self.___row))
+
+  def _del_(self):
+    try:
+      nosepokes = self.__Nosepokes
+
+    except AttributeError:
+      pass
+
+    else:
+      if nosepokes:
+        for nosepoke in nosepokes:
+          nosepoke._del_()
+
+    super(VisitProxy, self)._del_()
+
+  def __repr__(self):
+    return '< Visit of "%s" to corner #%d of cage #%d (at %s) >' % \
+           (self.Animal, self.Corner, self.Cage,
+            getTimeString(self.Start))
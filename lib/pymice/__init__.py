@@ -33,7 +33,8 @@ from ._Version import __version__, __RRID__, __ID__, __NeuroLexID__
 from .LogAnalyser import (LickometerLogAnalyzer, PresenceLogAnalyzer,
                           FailureInspector, DataValidator, TestMiceData)
 from ._GetTutorialData import getTutorialData
-from ._ICData import Loader, Merger
+from ._ICData import Loader, Merger, loadMany
+from ._Columns import accelerators
 from ._Metadata import Phase, ExperimentTimeline, Timeline
 from ._Results import ResultsCSV
 from ._Tools import hTime, convertTime, warn
@@ -41,7 +42,7 @@ from ._Tools import hTime, convertTime, warn
 from ._Bibliography import Citation
 
 from . import (_dependencies, _Version, LogAnalyser, _GetTutorialData, _ICData,
-               _Metadata, _Results, _Tools, _Bibliography)
+               _Columns, _Metadata, _Results, _Tools, _Bibliography)
 
 # dependence tracking
 import types
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# encoding: utf-8
+###############################################################################
+#                                                                             #
+#    PyMICE library                                                           #
+#                                                                             #
+#    Copyright (C) 2012-2017 Jakub M. Dzik a.k.a. Kowalski, S. Łęski          #
+#    (Laboratory of Neuroinformatics; Nencki Institute of Experimental        #
+#    Biology of Polish Academy of Sciences)                                   #
+#                                                                             #
+#    This software is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This software is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this software.  If not, see http://www.gnu.org/licenses/.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+import pymice._Version as _Version
+from pymice._Cache import TablesCache
+
+
+def _fail():
+  raise RuntimeError('bug')
+
+
+class Unpicklable(object):
+  def __reduce__(self):
+    return (_fail, ())
+
+
+class TestTablesCache(unittest.TestCase):
+  FLAGS = {'getNp': True, 'getLog': False}
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.tmpDir)
+    self.fname = os.path.join(self.tmpDir, 'data.zip')
+    self.writeDataFile(b'data')
+    self.cache = TablesCache(os.path.join(self.tmpDir, 'cache'))
+    self.tables = {'Visits': {'Start': np.arange(3, dtype=np.int64)},
+                   'Log': None}
+
+  def writeDataFile(self, content):
+    with open(self.fname, 'wb') as fh:
+      fh.write(content)
+
+  def assertCached(self, flags=FLAGS):
+    tables = self.cache.load(self.fname, flags)
+    self.assertEqual(['Log', 'Visits'], sorted(tables))
+    self.assertIs(None, tables['Log'])
+    self.assertEqual([0, 1, 2], tables['Visits']['Start'].tolist())
+
+  def testMissingCacheGivesNone(self):
+    self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+  def testStoredTablesAreLoaded(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    self.assertCached()
+
+  def testTablesAreStoredForFlags(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    self.assertIs(None, self.cache.load(self.fname, {'getNp': False,
+                                                     'getLog': False}))
+
+  def testStoringReplacesCache(self):
+    self.cache.store(self.fname, self.FLAGS, {})
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    self.assertCached()
+    self.assertEqual(1, len(os.listdir(os.path.join(self.tmpDir, 'cache'))))
+
+  def testModifiedDataFileInvalidatesCache(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    self.writeDataFile(b'modified data')
+    self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+  def testTouchedDataFileInvalidatesCache(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    stat = os.stat(self.fname)
+    os.utime(self.fname, (stat.st_atime, stat.st_mtime + 10))
+    self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+  def testOtherVersionInvalidatesCache(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    version = _Version.__version__
+    _Version.__version__ = version + '.dev'
+    try:
+      self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+    finally:
+      _Version.__version__ = version
+
+  def testOtherFormatInvalidatesCache(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+
+    class OtherFormatCache(TablesCache):
+      FORMAT = TablesCache.FORMAT + 1
+
+    cache = OtherFormatCache(os.path.join(self.tmpDir, 'cache'))
+    self.assertIs(None, cache.load(self.fname, self.FLAGS))
+
+  def testOtherPythonHasItsOwnCache(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+
+    class OtherPythonCache(TablesCache):
+      PYTHON = 5 - TablesCache.PYTHON
+
+    cache = OtherPythonCache(os.path.join(self.tmpDir, 'cache'))
+    self.assertNotEqual(self.cache.path(self.fname, self.FLAGS),
+                        cache.path(self.fname, self.FLAGS))
+    self.assertNotEqual(self.cache.key(self.fname), cache.key(self.fname))
+    self.assertIs(None, cache.load(self.fname, self.FLAGS))
+
+    # even if the cache file is shared
+    cache.path = self.cache.path
+    self.assertIs(None, cache.load(self.fname, self.FLAGS))
+
+  def testCorruptedCacheGivesNone(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    with open(self.cache.path(self.fname, self.FLAGS), 'r+b') as fh:
+      fh.truncate(10)
+
+    self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+  def testGarbageCacheGivesNone(self):
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    with open(self.cache.path(self.fname, self.FLAGS), 'wb') as fh:
+      fh.write(b'garbage')
+
+    self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+  def testUnreadableCacheIsReported(self):
+    os.makedirs(self.cache.path(self.fname, self.FLAGS))
+    with warnings.catch_warnings(record=True) as caught:
+      warnings.simplefilter('always')
+      self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+    self.assertEqual(1, len(caught))
+    self.assertTrue(str(caught[0].message).startswith('Unable to read cache file'))
+
+  def testMissingCacheIsNotReported(self):
+    with warnings.catch_warnings(record=True) as caught:
+      warnings.simplefilter('always')
+      self.cache.load(self.fname, self.FLAGS)
+
+    self.assertEqual([], caught)
+
+  def testUnpicklingErrorsAreReported(self):
+    self.cache.store(self.fname, self.FLAGS, [Unpicklable()])
+    with warnings.catch_warnings(record=True) as caught:
+      warnings.simplefilter('always')
+      self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+    self.assertEqual(1, len(caught))
+    message = str(caught[0].message)
+    self.assertTrue(message.startswith('Unable to unpickle cache file'))
+    self.assertIn('bug', message)
+
+  def testDirectoryDataFileIsCached(self):
+    self.fname = os.path.join(self.tmpDir, 'data')
+    os.mkdir(self.fname)
+    with open(os.path.join(self.fname, 'Visits.txt'), 'wb') as fh:
+      fh.write(b'data')
+
+    self.cache.store(self.fname, self.FLAGS, self.tables)
+    self.assertCached()
+
+    with open(os.path.join(self.fname, 'Log.txt'), 'wb') as fh:
+      fh.write(b'')
+
+    self.assertIs(None, self.cache.load(self.fname, self.FLAGS))
+
+
+if __name__ == '__main__':
+  unittest.main()
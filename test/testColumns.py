@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# encoding: utf-8
+###############################################################################
+#                                                                             #
+#    PyMICE library                                                           #
+#                                                                             #
+#    Copyright (C) 2012-2017 Jakub M. Dzik a.k.a. Kowalski, S. Łęski          #
+#    (Laboratory of Neuroinformatics; Nencki Institute of Experimental        #
+#    Biology of Polish Academy of Sciences)                                   #
+#                                                                             #
+#    This software is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This software is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this software.  If not, see http://www.gnu.org/licenses/.     #
+#                                                                             #
+###############################################################################
+
+import unittest
+import warnings
+
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+import pymice as pm
+from pymice._Columns import (readColumns, columnValues, toDatetimes, groupRows,
+                             toTimepoints,
+                             TEXT, INT, FLOAT, TIME, _pythonImplementations)
+
+try:
+  from StringIO import StringIO
+
+except ImportError:
+  from io import StringIO
+
+
+class TestReadColumns(unittest.TestCase):
+  TYPES = {'Int': INT,
+           'Float': FLOAT,
+           'Time': TIME,
+           }
+
+  def read(self, text, chunkSize=0x10000):
+    return readColumns(StringIO(text), self.TYPES, chunkSize=chunkSize)
+
+  def testEmptyFileReturnsNone(self):
+    self.assertIs(None, self.read(''))
+
+  def testHeaderOnlyReturnsEmptyColumns(self):
+    columns = self.read('Int\tFloat\tText\n')
+    self.assertEqual(['Float', 'Int', 'Text'], sorted(columns))
+    for label in columns:
+      self.assertEqual([], columnValues(columns[label]))
+
+    self.assertEqual(np.int64, columns['Int'].dtype)
+    self.assertEqual(np.float64, columns['Float'].dtype)
+
+  def testColumnsAreTyped(self):
+    columns = self.read('Int\tFloat\tText\n1\t1.5\ta\n-2\t3\tb\n')
+    self.assertEqual(np.int64, columns['Int'].dtype)
+    self.assertEqual([1, -2], columnValues(columns['Int']))
+    self.assertEqual(np.float64, columns['Float'].dtype)
+    self.assertEqual([1.5, 3.], columnValues(columns['Float']))
+    self.assertEqual(['a', 'b'], columnValues(columns['Text']))
+
+  def testCommaIsDecimalSeparatorInFloatColumns(self):
+    columns = self.read('Float\n0,25\n12,5\n')
+    self.assertEqual([0.25, 12.5], columnValues(columns['Float']))
+
+  def testEmptyCellsAreMissing(self):
+    columns = self.read('Int\tFloat\tText\n\t\t\n1\t2\tc\n')
+    self.assertEqual([None, 1], columnValues(columns['Int']))
+    self.assertEqual([True, False], list(np.ma.getmaskarray(columns['Int'])))
+    self.assertEqual([None, 2.], columnValues(columns['Float']))
+    self.assertEqual([None, 'c'], columnValues(columns['Text']))
+
+  def testShortRowsArePaddedWithMissingValues(self):
+    columns = self.read('Int\tText\n1\n2\tb\n')
+    self.assertEqual([1, 2], columnValues(columns['Int']))
+    self.assertEqual([None, 'b'], columnValues(columns['Text']))
+
+  def testBlankRowsAreSkipped(self):
+    columns = self.read('Int\tText\n1\ta\n\n\n\n\n2\tb\n\n3\tc\n',
+                        chunkSize=2)
+    self.assertEqual([1, 2, 3], columnValues(columns['Int']))
+    self.assertEqual(['a', 'b', 'c'], columnValues(columns['Text']))
+
+  def testExtraCellsAreReported(self):
+    with warnings.catch_warnings(record=True) as caught:
+      warnings.simplefilter('always')
+      columns = self.read('Int\tText\n1\ta\tx\n2\tb\n3\tc\ty\tz\n',
+                          chunkSize=2)
+
+    self.assertEqual([1, 2, 3], columnValues(columns['Int']))
+    self.assertEqual(['a', 'b', 'c'], columnValues(columns['Text']))
+    self.assertEqual(['Rows of more than 2 cells (extra cells ignored): 2 (line: 2, 4)'],
+                     [str(w.message) for w in caught])
+
+  def testChunksAreConcatenated(self):
+    columns = self.read('Int\tFloat\tText\n' +
+                        ''.join('%d\t%d,5\t%s\n' % (i, i, 'x' * (i % 2))
+                                for i in range(10)),
+                        chunkSize=3)
+    self.assertEqual(list(range(10)), columnValues(columns['Int']))
+    self.assertEqual([i + .5 for i in range(10)],
+                     columnValues(columns['Float']))
+    self.assertEqual([None, 'x'] * 5, columnValues(columns['Text']))
+
+  def testReadingAndParsingAreTimed(self):
+    parts = []
+    class Timer(object):
+      def __init__(self, part):
+        self.part = part
+
+      def __enter__(self):
+        parts.append(self.part)
+
+      def __exit__(self, *args):
+        pass
+
+    columns = readColumns(StringIO('Int\n1\n2\n3\n'), self.TYPES,
+                          chunkSize=2, timer=Timer)
+    self.assertEqual([1, 2, 3], columnValues(columns['Int']))
+    self.assertEqual(['read', 'read', 'parse', 'read', 'parse', 'read', 'parse'],
+                     parts)
+
+  def testTimesAreMicrosecondsSinceEpoch(self):
+    columns = self.read('Time\tInt\n1970-01-01 00:00:01.25\t1\n\t2\n1970-01-02 00:01\t3\n')
+    self.assertEqual(np.int64, columns['Time'].dtype)
+    self.assertEqual([1250000, None, 86460000000],
+                     columnValues(columns['Time']))
+
+  def testNonIsoTimesAreParsed(self):
+    columns = self.read('Time\n1970-01-01 0:00:01.5\n')
+    self.assertEqual([1500000], columnValues(columns['Time']))
+
+  def testTimesAreRoundedToMicroseconds(self):
+    columns = self.read('Time\tInt\n1970-01-01 00:00:01.2500005\t1\n\t2\n'
+                        '1970-01-01 00:00:01.2500004\t3\n'
+                        '1970-01-01 0:00:01.9999995\t4\n')
+    self.assertEqual([1250001, None, 1250000, 2000000],
+                     columnValues(columns['Time']))
+
+
+class TestToDatetimes(unittest.TestCase):
+  def setUp(self):
+    self.column = TIME.parse(('2012-08-31 11:58:23.125', '', '2012-08-31 12:00'))
+
+  def testGivenTimezoneIsAssignedToAllTimepoints(self):
+    self.assertEqual([datetime(2012, 8, 31, 11, 58, 23, 125000, pytz.utc),
+                      None,
+                      datetime(2012, 8, 31, 12, 0, tzinfo=pytz.utc)],
+                     toDatetimes(self.column, pytz.utc))
+
+  def testTimezonesMayBeGivenForEveryTimepoint(self):
+    cet = pytz.FixedOffset(60)
+    result = toDatetimes(self.column, [pytz.utc, None, cet])
+    self.assertEqual([pytz.utc, cet], [result[0].tzinfo, result[2].tzinfo])
+    self.assertIs(None, result[1])
+
+
+class TestToTimepoints(unittest.TestCase):
+  def setUp(self):
+    self.column = TIME.parse(('1970-01-01 01:00:00.5', '', '1970-01-01 00:00'))
+
+  def testTimepointsAreMicrosecondsSinceEpochInUTC(self):
+    cet = pytz.FixedOffset(60)
+    self.assertEqual([(500000, cet), None, (-3600000000, cet)],
+                     toTimepoints(self.column, cet))
+
+  def testTimezonesMayBeGivenForEveryTimepoint(self):
+    cet = pytz.FixedOffset(60)
+    self.assertEqual([(3600500000, pytz.utc), None, (-3600000000, cet)],
+                     toTimepoints(self.column, [pytz.utc, None, cet]))
+
+  def testDatetimesAreReturnedForTimezonesOfVariableOffset(self):
+    warsaw = pytz.timezone('Europe/Warsaw')
+    self.assertEqual(toDatetimes(self.column, warsaw),
+                     toTimepoints(self.column, warsaw))
+
+
+class TestPythonParsers(unittest.TestCase):
+  IMPLEMENTATIONS = _pythonImplementations
+
+  def setUp(self):
+    for name in ['parseInts', 'parseFloats', 'parseTimes', 'joinRows']:
+      setattr(self, name, self.IMPLEMENTATIONS[name])
+
+  def assertParsed(self, values, missing, result):
+    self.assertEqual(values, result[0].tolist())
+    self.assertEqual(missing, result[1].tolist())
+
+  def testParseInts(self):
+    result = self.parseInts(('12', '', '-3'))
+    self.assertEqual(np.int64, result[0].dtype)
+    self.assertParsed([12, 0, -3], [False, True, False], result)
+
+  def testParseFloats(self):
+    result = self.parseFloats(('1,5', '', '-2.25'))
+    self.assertEqual(np.float64, result[0].dtype)
+    self.assertParsed([1.5, 0., -2.25], [False, True, False], result)
+
+  def testParseTimes(self):
+    result = self.parseTimes(('2012-08-31 11:58:23.125', '',
+                              '1969-12-31 23:59:59.5', '1970-01-01 00:01'))
+    self.assertEqual(np.int64, result[0].dtype)
+    self.assertParsed([1346414303125000, 0, -500000, 60000000],
+                      [False, True, False, False],
+                      result)
+
+  def testParseNonIsoTimes(self):
+    self.assertParsed([1500000, 3600000000], [False, False],
+                      self.parseTimes(('1970-01-01 0:00:01.5',
+                                       '1970-01-01 1:00')))
+
+  def testParseTimesRoundsToMicroseconds(self):
+    self.assertParsed([951868800000000, 951868799999999, -499999],
+                      [False, False, False],
+                      self.parseTimes(('2000-02-29 23:59:59.9999996',
+                                       '2000-02-29 23:59:59.99999949',
+                                       '1969-12-31 23:59:59.50000050')))
+
+  def testParseMalformedTimesFails(self):
+    for cell in ['2001-02-29 00:00', '2000-01-01 24:00', 'x']:
+      with self.assertRaises(ValueError):
+        self.parseTimes((cell,))
+
+  def testParseMalformedIntsFails(self):
+    with self.assertRaises(ValueError):
+      self.parseInts(('1.5',))
+
+  def testJoinRows(self):
+    self.assertEqual([1, 2, -1, 3, 2],
+                     self.joinRows(np.array([4, 2, 4, 7], dtype=np.int64),
+                                   np.array([2, 4, 3, 7, 4], dtype=np.int64)).tolist())
+
+  def testJoinRowsOfNegativeKeys(self):
+    self.assertEqual([-1, 0, 1],
+                     self.joinRows(np.array([-5, 3], dtype=np.int64),
+                                   np.array([-7, -5, 3], dtype=np.int64)).tolist())
+
+  def testJoinRowsOfEmptyKeys(self):
+    self.assertEqual([-1],
+                     self.joinRows(np.array([], dtype=np.int64),
+                                   np.array([1], dtype=np.int64)).tolist())
+    self.assertEqual([],
+                     self.joinRows(np.array([1], dtype=np.int64),
+                                   np.array([], dtype=np.int64)).tolist())
+
+
+try:
+  from pymice import _cymice
+
+except ImportError:
+  pass
+
+else:
+  class TestCythonParsers(TestPythonParsers):
+    IMPLEMENTATIONS = _cymice.__dict__
+
+
+class TestGroupRows(unittest.TestCase):
+  def testRowsAreGroupedInStableOrder(self):
+    order, offsets = groupRows(np.array([2, 0, -1, 2, 0, -1]), 4)
+    self.assertEqual([2, 5, 1, 4, 0, 3], order.tolist())
+    self.assertEqual([2, 4, 4, 6, 6], offsets.tolist())
+
+  def testEmptyRows(self):
+    order, offsets = groupRows(np.array([], dtype=np.intp), 2)
+    self.assertEqual([], order.tolist())
+    self.assertEqual([0, 0, 0], offsets.tolist())
+
+
+class TestAccelerators(unittest.TestCase):
+  def testAllRoutinesAreReported(self):
+    self.assertEqual(sorted(_pythonImplementations),
+                     sorted(pm.accelerators()))
+
+  def testImplementationsAreReported(self):
+    try:
+      from pymice import _cymice
+
+    except ImportError:
+      expected = 'python'
+
+    else:
+      expected = 'cython'
+
+    for name, implementation in pm.accelerators().items():
+      self.assertEqual(expected, implementation)
+
+
+class TestColumnValues(unittest.TestCase):
+  def testListIsReturnedAsIs(self):
+    values = [1, None]
+    self.assertIs(values, columnValues(values))
+
+  def testNoneIsReturnedAsIs(self):
+    self.assertIs(None, columnValues(None))
+
+  def testArrayIsConvertedToListOfPythonObjects(self):
+    values = columnValues(INT.parse(('42', '')))
+    self.assertEqual([42, None], values)
+    self.assertIs(int, type(values[0]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -25,17 +25,30 @@
 
 import sys
 import os
+import gc
+import weakref
+import pickle
+import shutil
+import tempfile
 import unittest
+import warnings
+import zipfile
+
+import numpy as np
 
 from datetime import datetime, timedelta
+from operator import attrgetter
 from pytz import utc, timezone
 
 import pymice as pm
 from pymice._ICData import (ZipLoader_v_IntelliCage_Plus_3, ZipLoader_v_Version1,
                             Merger, LogEntry, EnvironmentalConditions,
                             AirHardwareEvent, DoorHardwareEvent, LedHardwareEvent,
-                            UnknownHardwareEvent, ICCage, ICCageManager)
+                            UnknownHardwareEvent, ICCage, ICCorner, ICSide,
+                            ICCageManager)
 from pymice.Data import Data, IntIdentityManager
+from pymice._Columns import TIME
+from pymice._Tools import DirectoryZipFile
 
 import minimock
 
@@ -326,6 +339,99 @@ class TestZipLoader_v_IntelliCage_Plus_3(BaseTest):
     self.checkNosepokeAttributeTypes(visit.Nosepokes[0], 1, 2)
     self.assertEqual(self.cageManager.items[1].items[2].sequence, [('__getitem__', '4')])
 
+  def testNosepokesAreCreatedOnAccess(self):
+    visits = self.loader.loadVisits(self.INPUT_LOAD_ONE_VISIT,
+                                    self.INPUT_LOAD_ONE_NOSEPOKE)
+    self.assertEqual(visits[0].NosepokeNumber, 1)
+    self.assertEqual(self.cageManager.items[1].items[2].sequence, [])
+    visits[0].Nosepokes
+    self.assertEqual(self.cageManager.items[1].items[2].sequence, [('__getitem__', '4')])
+
+  def testNosepokeTimesAreConvertedOnAccess(self):
+    cet = timezone('CET')
+    nosepokes = dict(self.INPUT_LOAD_ONE_NOSEPOKE,
+                     Start=TIME.parse(['2012-08-31 11:58:23.125']),
+                     End=TIME.parse(['2012-08-31 11:58:25']))
+    visits = self.loader.loadVisits(self.INPUT_LOAD_ONE_VISIT, nosepokes,
+                                    nosepokeTimezones={'Start': cet,
+                                                       'End': [utc]})
+    nosepoke = visits[0].Nosepokes[0]
+    self.assertEqual(datetime(2012, 8, 31, 11, 58, 23, 125000, tzinfo=cet),
+                     nosepoke.Start)
+    self.assertEqual(datetime(2012, 8, 31, 11, 58, 25, tzinfo=utc),
+                     nosepoke.End)
+
+
+  def testVisitTimesAreConvertedOnAccess(self):
+    cet = timezone('CET')
+    visits = self.loader.loadVisits(dict(self.INPUT_LOAD_ONE_VISIT,
+                                         Start=TIME.parse(['2012-08-31 11:58:23.125']),
+                                         End=TIME.parse(['2012-08-31 11:58:25'])),
+                                    timezones={'Start': cet,
+                                               'End': [utc]})
+    self.assertEqual(datetime(2012, 8, 31, 11, 58, 23, 125000, tzinfo=cet),
+                     visits[0].Start)
+    self.assertEqual(datetime(2012, 8, 31, 11, 58, 25, tzinfo=utc),
+                     visits[0].End)
+
+  def testVisitTableColumns(self):
+    table = self.loader.loadVisitTable(self.INPUT_LOAD_MANY_VISITS_WITH_MISSING_VALUES)
+    expected = self.OUTPUT_LOAD_MANY_VISITS_WITH_MISSING_VALUES
+    self.assertEqual(10, len(table))
+    for name in ['Cage', 'Corner', 'PlaceError', 'AntennaDuration', '_line']:
+      self.assertEqual(expected[name], list(table.getColumn(name)),
+                       'Attribute: ' + name)
+
+    self.assertEqual([10000000 * i for i in range(1, 11)],
+                     list(table.getColumn('_utcStart')))
+    self.assertEqual([None, 35000000],
+                     list(table.getColumn('_utcEnd'))[:2])
+    self.assertEqual(expected['Cage'], list(table.getColumn('Cage.real')))
+    self.assertIs(None, table.getColumn('Nosepokes'))
+    self.assertIs(None, table.getColumn('PlaceError.real'))
+
+  def testVisitAttributesAreConvertedOncePerValue(self):
+    self.loader.loadVisits(self.INPUT_LOAD_MANY_VISITS_WITH_MISSING_VALUES)
+    self.assertEqual([('__getitem__', '2'), ('__getitem__', '1')],
+                     self.animalManager.sequence)
+
+  def testNosepokeAggregatesArePrecomputed(self):
+    table = self.loader.loadVisitTable(self.INPUT_LOAD_ONE_VISIT,
+                                       self.INPUT_LOAD_ONE_NOSEPOKE)
+    visit, = table
+    self.assertEqual(0, visit.LickNumber)
+    self.assertEqual(timedelta(seconds=1.5), visit.LickDuration)
+    self.assertEqual(timedelta(seconds=12), visit.NosepokeDuration)
+    self.assertEqual([], self.cageManager.items[1].items[2].sequence)
+    for name in ['LickNumber', 'LickContactTime', 'LickDuration']:
+      self.assertEqual(self.OUTPUT_LOAD_ONE_NOSEPOKE[name],
+                       list(table.getColumn(name)),
+                       'Attribute: ' + name)
+
+  def testNosepokeAggregatesWithMissingValuesAreComputedOnAccess(self):
+    visit, = self.loader.loadVisits(self.INPUT_LOAD_ONE_VISIT,
+                                    dict(self.INPUT_LOAD_ONE_NOSEPOKE,
+                                         End=[None]))
+    self.assertRaises(visit.DurationCannotBeCalculatedError,
+                      lambda: visit.NosepokeDuration)
+    self.assertEqual(timedelta(seconds=1.5), visit.LickDuration)
+
+  def testClonedVisitNosepokesAreCreatedOnAccess(self):
+    visit, = self.loader.loadVisits(self.INPUT_LOAD_ONE_VISIT,
+                                    self.INPUT_LOAD_ONE_NOSEPOKE)
+    cageManager = MockIntDictManager()
+    clone = visit.clone(MockStrDictManager(), cageManager,
+                        MockStrDictManager())
+    self.assertIsInstance(clone, pm.ICNodes.Visit)
+    self.assertEqual(1, clone.NosepokeNumber)
+    self.assertEqual([], self.cageManager.items[1].items[2].sequence)
+    self.assertEqual([], cageManager.items[1].items[2].sequence)
+    self.assertEqual(datetime(1970, 1, 1, 0, 0, 12, tzinfo=utc),
+                     clone.Nosepokes[0].End)
+    self.assertEqual([('__getitem__', 4)],
+                     cageManager.items[1].items[2].sequence)
+    self.assertEqual(visit.Start, clone.Start)
+
 
   INPUT_LOAD_MANY_VISITS_MANY_NOSEPOKES = {
     'Visits': {'VisitID': ['1', '2', '3', '4'],
@@ -922,15 +1028,35 @@ class ICCageTest(unittest.TestCase):
 
       self.assertIs(side.Corner, corner)
 
-  def testDel(self):
-    corners = [self.cage[i] for i in range(1, 5)]
-    sides = [corner[s] for corner in corners for s in ['left', 'right']]
-    self.cage._del_()
-    for corner in corners:
-      self.assertRaises(AttributeError, lambda: corner.Cage)
+  def testCagesAreShared(self):
+    self.assertIs(self.cage, ICCage(42))
+    self.assertIs(self.cage, ICCage('42'))
 
-    for side in sides:
-      self.assertRaises(AttributeError, lambda: side.Corner)
+  def testTopologyHasNoInstanceAttributes(self):
+    corner = self.cage[1]
+    for node in [self.cage, corner, corner['left']]:
+      self.assertFalse(hasattr(node, '__dict__'))
+      self.assertEqual([type(node)], gc.get_referents(node))
+
+  def testConstructorsGiveSharedNodes(self):
+    corner = self.cage[3]
+    self.assertIs(corner, ICCorner(3, self.cage))
+    self.assertIs(corner['right'], ICSide(6, corner))
+    self.assertRaises(ICCage.NoCornerError, ICCorner, 5, self.cage)
+    self.assertRaises(ICCorner.NoSideError, ICSide, 1, corner)
+
+  def testNodesOfDifferentCagesAreNotMixed(self):
+    other = ICCage(43)
+    for i in range(1, 5):
+      self.assertIs(self.cage, self.cage[i].Cage)
+      self.assertIs(other, other[i].Cage)
+      self.assertIs(self.cage[i], self.cage[i].Left.Corner)
+      self.assertIs(other[i], other[i].Right.Corner)
+
+  def testPickledTopologyIsShared(self):
+    corner = self.cage[2]
+    for node in [self.cage, corner, corner['right']]:
+      self.assertIs(node, pickle.loads(pickle.dumps(node)))
 
   def testReadOnly(self):
     self.assertRaises(AttributeError, lambda: setattr(self.cage, 'Nonexistingattr', None))
@@ -947,103 +1073,104 @@ class ICCageTest(unittest.TestCase):
 class ICCageManagerTest(unittest.TestCase):
   def setUp(self):
     self.cageManager = ICCageManager()
-    self.ICCage = pm._ICData.ICCage
-
-  def tearDown(self):
-    pm._ICData.ICCage = self.ICCage
 
   def testGet(self):
-    cages = set()
-    def newCage(cage):
-      cages.add(cage)
-      return minimock.Mock('ICCage(%s)' % cage,
-                           returns=cage,
-                           tracker=None)
-    pm._ICData.ICCage = minimock.Mock('Data.ICCage',
-                                      returns_func=newCage,
-                                      tracker=None)
-
-    cageNumber = 1
-    cage = self.cageManager[cageNumber]
-    self.assertIs(cage(), cageNumber)
-    self.assertTrue(cageNumber in cages)
-    self.assertIs(cage, self.cageManager[cageNumber])
-    self.assertIs(cage, self.cageManager[str(cageNumber)])
-
-  def testDel(self):
-    cages = {}
-    delCalled = set()
-    def newCage(cage):
-      try:
-        return cages[cage]
-
-      except KeyError:
-        item = minimock.Mock('ICCage(%s)' % cage, tracker=None)
-        item._del_.mock_returns_func = lambda: delCalled.add(cage)
-        cages[cage] = item
-        return item
-
-    pm._ICData.ICCage = minimock.Mock('Data.ICCage', tracker=None)
-    pm._ICData.ICCage.mock_returns_func = newCage
-
-    for i in range(1, 10):
-      for j in range(1, i + 1):
-        self.cageManager[j] # FIXME: what it is doing?
-
-    self.cageManager._del_()
-    for cage in cages:
-      self.assertTrue(cage in delCalled)
+    cage = self.cageManager[1]
+    self.assertIs(ICCage(1), cage)
+    self.assertIs(cage, self.cageManager['1'])
+    self.assertIs(cage, self.cageManager[cage])
+
+  def testHasNoState(self):
+    self.cageManager[44]
+    self.assertFalse(hasattr(self.cageManager, '__dict__'))
+    self.assertEqual([ICCageManager], gc.get_referents(self.cageManager))
 
   def testReadOnly(self):
     self.assertRaises(AttributeError, lambda: setattr(self.cageManager, 'Nonexistingattr', None))
 
+  def testPickledTopologyManagerIsShared(self):
+    self.assertIs(pm._ICData.TOPOLOGY,
+                  pickle.loads(pickle.dumps(pm._ICData.TOPOLOGY)))
 
-class DataTest(unittest.TestCase):
-  def testDel(self):
-    ICCage = pm._ICData.ICCage
-
-    def getMockCage(n):
-      cage = minimock.Mock('ICCage', tracker=None)
-      cage._del_ = lambda: cagesDeleted.add(n)
-      return cage
 
-    pm._ICData.ICCage = minimock.Mock('ICCage',
-                                      returns_func=getMockCage,
-                                      tracker=None)
+class LoadedDataTest(unittest.TestCase):
+  PATH = os.path.join(os.path.dirname(__file__), 'data', 'legacy_data.zip')
 
-    deleted = set()
-    cagesDeleted = set()
-    toDelete = []
-    cagesToDelete = []
-    data = pm.Data.Data() # XXX: ugly test -> split testing of ICCageManager and Data.__del__
-    data._setCageManager(pm._ICData.ICCageManager())
-
-    def makeCloneInjector(cage, label):
-      toDelete.append(label)
-      cagesToDelete.append(cage)
-      cloneInjector = minimock.Mock('CloneInjector', tracker=None)
-      def cloneReporter(sourceManager, cageManager, *args):
-        cageManager[cage] # FIXME: what is it doing?
-        clone = minimock.Mock(label, tracker=None)
-        clone._del_.mock_returns_func = lambda: deleted.add(label)
-        return clone
-
-      cloneInjector.clone.mock_returns_func = cloneReporter
-      return cloneInjector
+  def testIsReleasedWithoutGarbageCollector(self):
+    data = pm.Loader(self.PATH, getLog=True, getEnv=True, getHw=True,
+                     verbose=False)
+    for visit in data.getVisits():
+      for nosepoke in visit.Nosepokes:
+        self.assertIs(visit, nosepoke.Visit)
+        self.assertIs(visit.Corner, nosepoke.Side.Corner)
 
-    data.insertVisits([makeCloneInjector(1, 'Visit')])
-    data.insertLog([makeCloneInjector(2, 'Log')])
-    data.insertEnv([makeCloneInjector(3, 'Env')])
-    data.insertHw([makeCloneInjector(4, 'Hw')])
-    data.__del__()
+    gc.disable()
+    try:
+      reference = weakref.ref(data)
+      del data
+      self.assertIs(None, reference())
 
-    for label in toDelete:
-      self.assertIn(label, deleted)
+    finally:
+      gc.enable()
 
-    for cage in cagesToDelete:
-      self.assertIn(cage, cagesDeleted)
+  def testNosepokesDoNotKeepDataAlive(self):
+    data = pm.Loader(self.PATH, verbose=False)
+    nosepokes = [nosepoke for visit in data.getVisits()
+                 for nosepoke in visit.Nosepokes]
+    self.assertTrue(nosepokes)
+    self.assertTrue(all(nosepoke.Visit is not None for nosepoke in nosepokes))
 
-    pm._ICData.ICCage = ICCage
+    gc.disable()
+    try:
+      reference = weakref.ref(data)
+      del data
+      self.assertIs(None, reference())
+
+    finally:
+      gc.enable()
+
+    self.assertEqual([None] * len(nosepokes),
+                     [nosepoke.Visit for nosepoke in nosepokes])
+
+  def testTopologyIsShared(self):
+    visits = [pm.Loader(self.PATH, verbose=False).getVisits(order='Start')
+              for _ in range(2)]
+    for visit, other in zip(*visits):
+      self.assertIs(visit.Cage, other.Cage)
+      self.assertIs(visit.Corner, other.Corner)
+      self.assertIs(visit.Corner, visit.Cage[visit.Corner])
+
+  def testPickle(self):
+    data = pm.Loader(self.PATH, getLog=True, getEnv=True, getHw=True,
+                     verbose=False)
+    unpickled = pickle.loads(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+    self.assertIs(data.__class__, unpickled.__class__)
+    checkSameData(self, data, unpickled)
+
+
+def checkSameData(test, data, other):
+  test.assertEqual(data.getMice(), other.getMice())
+  test.assertEqual(data.getGroup(), other.getGroup())
+  for name in data.getGroup():
+    test.assertEqual(sorted(map(str, data.getGroup(name).Animals)),
+                     sorted(map(str, other.getGroup(name).Animals)))
+
+  test.assertEqual(data.getInmates(), other.getInmates())
+  test.assertEqual((data.getStart(), data.getEnd()),
+                   (other.getStart(), other.getEnd()))
+  visits = other.getVisits(order='Start')
+  test.assertEqual(len(data.getVisits()), len(visits))
+  for visit, unpickled in zip(data.getVisits(order='Start'), visits):
+    test.assertEqual(visit.Start, unpickled.Start)
+    test.assertIs(visit.Corner, unpickled.Corner)
+    test.assertIs(other.getAnimal(visit.Animal.Name), unpickled.Animal)
+    test.assertEqual(visit.LickNumber, unpickled.LickNumber)
+    test.assertEqual([(n.Start, n.Side) for n in visit.Nosepokes],
+                     [(n.Start, n.Side) for n in unpickled.Nosepokes])
+
+  for get in ['getLog', 'getEnvironment', 'getHardwareEvents']:
+    test.assertEqual(list(map(repr, getattr(data, get)(order='DateTime'))),
+                     list(map(repr, getattr(other, get)(order='DateTime'))))
 
 
 class MockNodesProvider:
@@ -1125,6 +1252,166 @@ class MergerOnLoadedHw(MergerTest):
       mm.insertLog(self.getMockNodeList('HardwareEvent', 7))
 
 
+class MergerSharingDataTest(unittest.TestCase):
+  def setUp(self):
+    dataDir = os.path.join(os.path.dirname(__file__), 'data')
+    self.sources = Merger._sortDataSources([pm.Loader(os.path.join(dataDir, name),
+                                                      getLog=True,
+                                                      getEnv=True,
+                                                      getHw=True,
+                                                      verbose=False)
+                                            for name in ['legacy_data.zip',
+                                                         'icp3_data.zip']])
+
+  def merge(self):
+    return Merger(*self.sources, getLog=True, getEnv=True, getHw=True)
+
+  def testNodesAreShared(self):
+    mm = self.merge()
+    for get in ['getLog', 'getEnvironment', 'getHardwareEvents']:
+      merged = getattr(mm, get)()
+      shared = [node for source in self.sources
+                for node in getattr(source, get)()]
+      self.assertEqual(len(shared), len(merged))
+      for node, other in zip(shared, merged):
+        self.assertIs(node, other)
+
+  def testVisitsAreRemapped(self):
+    mm = self.merge()
+    visits = mm.getVisits()
+    self.assertEqual(sum(len(source.getVisits()) for source in self.sources),
+                     len(visits))
+    for visit in visits:
+      self.assertIs(mm.getAnimal(visit.Animal.Name), visit.Animal)
+
+    source = self.sources[0].getVisits(order='Start')
+    merged = mm.getVisits(order='Start')[:len(source)]
+    for visit, other in zip(source, merged):
+      self.assertEqual(visit.Start, other.Start)
+      self.assertIs(visit.Corner, other.Corner)
+      self.assertEqual(visit.LickNumber, other.LickNumber)
+      self.assertEqual([n.Start for n in visit.Nosepokes],
+                       [n.Start for n in other.Nosepokes])
+
+  def testVisitsAreOrderedByMergedOrder(self):
+    mm = self.merge()
+    visits = mm.getVisits()
+    key = lambda v: v._utcStart
+    self.assertEqual(sorted(visits, key=key), mm.getVisits(order='Start'))
+    start = sorted(visits, key=key)[len(visits) // 2].Start
+    self.assertEqual(sorted(mm.getVisits(start=start), key=key),
+                     mm.getVisits(start=start, order='Start'))
+    mice = sorted(mm.getAnimal())[:1]
+    self.assertEqual(sorted(mm.getVisits(mice=mice), key=key),
+                     mm.getVisits(mice=mice, order='Start'))
+
+  def testTimeRangesCombineWithOtherSelectors(self):
+    mm = self.merge()
+    visits = mm.getVisits()
+    starts = sorted(set(v.Start for v in visits))
+    bounds = [None, starts[0] - timedelta(seconds=1)] + starts \
+             + [starts[-1] + timedelta(seconds=1)]
+    mice = sorted(mm.getMice())[:1]
+    for start in bounds:
+      for end in bounds:
+        expected = [v for v in visits
+                    if (start is None or start <= v.Start)
+                    and (end is None or v.Start < end)]
+        self.assertEqual(expected, mm.getVisits(start=start, end=end))
+        self.assertEqual(sorted(expected, key=lambda v: v._utcStart),
+                         mm.getVisits(start=start, end=end, order='Start'))
+        self.assertEqual(sorted(expected, key=lambda v: v._utcEnd),
+                         mm.getVisits(start=start, end=end, order='End'))
+        self.assertEqual([v for v in expected if v.Animal.Name in mice],
+                         mm.getVisits(mice=mice, start=start, end=end))
+
+    log = mm.getLog()
+    start, end = log[1].DateTime, log[-1].DateTime
+    self.assertEqual([x for x in log if start <= x.DateTime < end],
+                     mm.getLog(start=start, end=end))
+
+  def testVisitsAreSelectedByAttributes(self):
+    mm = self.merge()
+    visits = mm.getVisits()
+    for cage in sorted(set(v.Cage for v in visits)):
+      self.assertEqual([v for v in visits if v.Cage == cage],
+                       mm.getVisits(cage=cage))
+      for corner in [1, [2, 3]]:
+        corners = corner if isinstance(corner, list) else [corner]
+        self.assertEqual([v for v in visits
+                          if v.Cage == cage and v.Corner in corners],
+                         mm.getVisits(cage=[cage], corner=corner))
+
+    for module in set(v.Module for v in visits if v.Module is not None):
+      self.assertEqual([v for v in visits if v.Module == module],
+                       mm.getVisits(module=module))
+
+    for group in mm.getGroup():
+      members = set(a.Name for a in mm.getGroup(group).Animals)
+      self.assertEqual([v for v in visits if v.Animal.Name in members],
+                       mm.getVisits(group=group))
+      mice = sorted(mm.getMice())[:2]
+      self.assertEqual([v for v in visits if v.Animal.Name in members
+                                          or v.Animal.Name in mice],
+                       mm.getVisits(mice=mice, group=[group]))
+
+    self.assertEqual([v for v in visits if v.LickNumber > 0 and v.Corner == 1],
+                     mm.getVisits(corner=1,
+                                  where={'LickNumber': lambda x: x > 0}))
+    self.assertRaises(ValueError, mm.getVisits, corner=1,
+                      where={'Corner': [1]})
+
+  def testEventsAreSelectedByAttributes(self):
+    mm = self.merge()
+    for get, attributes in [('getLog', ['Cage', 'Corner', 'Side']),
+                            ('getEnvironment', ['Cage']),
+                            ('getHardwareEvents', ['Cage', 'Corner', 'Side'])]:
+      nodes = getattr(mm, get)()
+      for attributeName in attributes:
+        values = set(getattr(n, attributeName) for n in nodes) - set([None])
+        for value in values:
+          self.assertEqual([n for n in nodes
+                            if getattr(n, attributeName) == value],
+                           getattr(mm, get)(**{attributeName.lower(): value}))
+
+      self.assertEqual([n for n in nodes if n.Cage == 1],
+                       getattr(mm, get)(where={'Cage': lambda x: x == 1}))
+
+  def testOrdersAreCachedForFrozenData(self):
+    mm = self.merge()
+    visits = mm.getVisits()
+    mice = sorted(mm.getMice())[:2]
+    for order, key in [('Corner', attrgetter('Corner')),
+                       (('Cage', 'End'), attrgetter('Cage', '_utcEnd')),
+                       ('Animal.Name', attrgetter('Animal.Name')),
+                       ('LickDuration', attrgetter('LickDuration'))]:
+      self.assertEqual(sorted(visits, key=key), mm.getVisits(order=order))
+      self.assertEqual(sorted((v for v in visits if v.Animal.Name in mice),
+                              key=key),
+                       mm.getVisits(mice=mice, order=order))
+
+    objects = mm._Data__visits
+    self.assertTrue(objects.hasOrder('Cage', '_utcEnd'))
+    self.assertTrue(objects.hasOrder('Animal.Name'))
+
+    events = mm.getHardwareEvents()
+    self.assertEqual(sorted(events, key=attrgetter('Cage', '_utcDateTime')),
+                     mm.getHardwareEvents(order=('Cage', 'DateTime')))
+
+  def testPickle(self):
+    mm = self.merge()
+    unpickled = pickle.loads(pickle.dumps(mm, pickle.HIGHEST_PROTOCOL))
+    self.assertIs(Merger, unpickled.__class__)
+    checkSameData(self, mm, unpickled)
+
+  def testNosepokesAreNotCreated(self):
+    self.merge()
+    for source in self.sources:
+      for visit in source.getVisits():
+        self.assertRaises(AttributeError,
+                          lambda: visit._VisitProxy__Nosepokes)
+
+
 class LoaderIntegrationTest(BaseTest, MockNodesProvider):
   LOADER_FLAGS = {}
 
@@ -1319,6 +1606,386 @@ class LoadUncompressedIntelliCagePlus3DataTest(LoadIntelliCagePlus3DataTest):
   DATA_FILE = 'icp3_data'
 
 
+class LoadManyIntelliCagePlus3DataTest(LoadIntelliCagePlus3DataTest):
+  def loadData(self):
+    return pm.loadMany([self.dataPath()],
+                       workers=2,
+                       **self.LOADER_FLAGS)
+
+
+class LoadCachedIntelliCagePlus3DataTest(LoadIntelliCagePlus3DataTest):
+  def loadData(self):
+    self.cacheDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.cacheDir)
+    pm.Loader(self.dataPath(), cache=self.cacheDir, **self.LOADER_FLAGS)
+    parseArchive = pm.Loader._parseArchive
+    pm.Loader._parseArchive = None # must not be called
+    try:
+      return pm.Loader(self.dataPath(), cache=self.cacheDir,
+                       **self.LOADER_FLAGS)
+
+    finally:
+      pm.Loader._parseArchive = parseArchive
+
+
+class LoadCachedUncompressedIntelliCagePlus3DataTest(LoadCachedIntelliCagePlus3DataTest):
+  DATA_FILE = 'icp3_data'
+
+
+class UnmatchedNosepokesWarningTest(unittest.TestCase):
+  def warn(self, vids, **kwargs):
+    with warnings.catch_warnings(record=True) as caught:
+      warnings.simplefilter('always')
+      pm.Loader._warnUnmatchedNosepokes(np.array(vids), **kwargs)
+
+    return [str(w.message) for w in caught]
+
+  def testSingleWarningIsIssued(self):
+    self.assertEqual(['Unmatched nosepokes: 3 (VisitID: 4, 7)'],
+                     self.warn([7, 4, 7]))
+
+  def testListOfMissingVisitsIsShortened(self):
+    self.assertEqual(['Unmatched nosepokes: 4 (VisitID: 1, 2, ...)'],
+                     self.warn([1, 2, 3, 4], shown=2))
+
+
+class UnmatchedNosepokesTest(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.tmpDir)
+    self.original = os.path.join(os.path.dirname(__file__), 'data',
+                                 'icp3_data.zip')
+    self.path = os.path.join(self.tmpDir, 'unmatched.zip')
+    with zipfile.ZipFile(self.original) as src:
+      with zipfile.ZipFile(self.path, 'w') as dst:
+        for name in src.namelist():
+          content = src.read(name)
+          if name.endswith('Nosepokes.txt'):
+            lines = content.splitlines(True)
+            # a nosepoke of a missing visit inserted between matched ones
+            lines.insert(2, b'999' + lines[1][lines[1].index(b'\t'):])
+            content = b''.join(lines)
+
+          dst.writestr(name, content)
+
+  def load(self, path, load=pm.Loader, **kwargs):
+    with warnings.catch_warnings(record=True) as caught:
+      warnings.simplefilter('always')
+      data = load(path, getNp=True, **kwargs)
+
+    return data, [str(w.message) for w in caught
+                  if 'Unmatched nosepokes' in str(w.message)]
+
+  def testUnmatchedNosepokesAreReportedAndDropped(self):
+    data, messages = self.load(self.path)
+    self.assertEqual(['Unmatched nosepokes: 1 (VisitID: 999)'], messages)
+    original, _ = self.load(self.original)
+    visits = data.getVisits(order='Start')
+    expected = original.getVisits(order='Start')
+    self.assertEqual(len(expected), len(visits))
+    for visit, other in zip(visits, expected):
+      self.assertEqual([(n.Start, n.Side, n._line) for n in other.Nosepokes],
+                       [(n.Start, n.Side, n._line - (n._line > 2))
+                        for n in visit.Nosepokes])
+
+  def testUnmatchedNosepokesAreReportedOnCachedLoad(self):
+    cache = os.path.join(self.tmpDir, 'cache')
+    for _ in range(2):
+      data, messages = self.load(self.path, cache=cache)
+      self.assertEqual(['Unmatched nosepokes: 1 (VisitID: 999)'], messages)
+
+  def testUnmatchedNosepokesAreReportedOnParallelLoad(self):
+    data, messages = self.load([self.path, self.original], load=pm.loadMany,
+                               workers=2)
+    self.assertEqual(['Unmatched nosepokes: 1 (VisitID: 999)'], messages)
+
+
+class LoaderCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.tmpDir)
+    self.dataDir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
+    self.path = os.path.join(self.tmpDir, 'data.zip')
+    self.cacheDir = os.path.join(self.tmpDir, 'cache')
+
+  def copyData(self, fname, mtime):
+    shutil.copy(os.path.join(self.dataDir, fname), self.path)
+    os.utime(self.path, (mtime, mtime))
+
+  def load(self):
+    return pm.Loader(self.path, getLog=True, cache=self.cacheDir)
+
+  def testOutdatedCacheIsReplaced(self):
+    self.copyData('icp3_data.zip', 1000000000)
+    self.assertEqual(3, len(self.load().getVisits()))
+    self.copyData('legacy_data.zip', 1000000010)
+    reference = pm.Loader(self.path, getLog=True)
+    for data in [self.load(), self.load()]:
+      self.assertEqual(LoadManyTest.describe(reference),
+                       LoadManyTest.describe(data))
+
+  def testLoadManyUsesCache(self):
+    self.copyData('icp3_data.zip', 1000000000)
+    self.load()
+    self.assertEqual(1, len(os.listdir(self.cacheDir)))
+    data = pm.loadMany([self.path], workers=1, getLog=True,
+                       cache=self.cacheDir)
+    self.assertEqual(LoadManyTest.describe(pm.Loader(self.path, getLog=True)),
+                     LoadManyTest.describe(data))
+
+
+class LoadProfiledIntelliCagePlus3DataTest(LoadIntelliCagePlus3DataTest):
+  LOADER_FLAGS = dict(LoadIntelliCagePlus3DataTest.LOADER_FLAGS,
+                      profile=True)
+
+  def testStagesAreProfiled(self):
+    stages = [stage.name for stage in self.data.getProfile().getStages()]
+    self.assertEqual(['read Animals', 'parse Animals',
+                      'read Visits', 'parse Visits',
+                      'read Nosepokes', 'parse Nosepokes', 'join nosepokes',
+                      'read Log', 'parse Log',
+                      'read Environment', 'parse Environment',
+                      'read HardwareEvents', 'parse HardwareEvents',
+                      'convert datetimes', 'load visits',
+                      'load Log', 'load Environment', 'load HardwareEvents',
+                      'build cache'],
+                     stages)
+
+  def testRowsAreCounted(self):
+    profile = self.data.getProfile()
+    for name, rows in [('read Visits', 3),
+                       ('parse Visits', 3),
+                       ('load visits', 3),
+                       ('read Log', 2),
+                       ('parse Log', 2),
+                       ('load Log', 2),
+                       ('load HardwareEvents', 6)]:
+      self.assertEqual([rows], [s.rows for s in profile.getStage(name)])
+
+  def testRowsOfBuiltCacheAreCounted(self):
+    data = self.data
+    nodes = [data.getVisits(), data.getLog(), data.getEnvironment(),
+             data.getHardwareEvents()]
+    self.assertEqual([sum(map(len, nodes))],
+                     [s.rows for s in data.getProfile().getStage('build cache')])
+
+  def testNoProfileByDefault(self):
+    self.assertIs(None, pm.Loader(self.dataPath()).getProfile())
+
+  def testNodesAreNotListedWithoutProfile(self):
+    listed = []
+    class Loader(pm.Loader):
+      def getVisits(self, *args, **kwargs):
+        listed.append('visits')
+        return pm.Loader.getVisits(self, *args, **kwargs)
+
+    data = Loader(self.dataPath(), **dict(self.LOADER_FLAGS, profile=False))
+    self.assertEqual([], listed)
+    self.assertEqual(3, len(data.getVisits()))
+
+
+class LoadManySessionsTest(unittest.TestCase):
+  SESSIONS = '''<?xml version="1.0" encoding="utf-8"?>
+<ArrayOfSession>
+  <Session Id="0">
+    <Interval>
+      <Start>2012-12-18T12:13:01.109375+01:00</Start>
+      <End>2012-12-18T12:15:00+01:00</End>
+    </Interval>
+  </Session>
+  <Session Id="1">
+    <Interval>
+      <Start>2012-12-18T12:18:00+00:00</Start>
+      <End>2012-12-18T12:20:37.71875+00:00</End>
+    </Interval>
+  </Session>
+</ArrayOfSession>
+'''
+
+  def setUp(self):
+    tmpDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, tmpDir)
+    dataDir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
+    self.path = os.path.join(tmpDir, 'icp3_data')
+    shutil.copytree(os.path.join(dataDir, 'icp3_data'), self.path)
+    with open(os.path.join(self.path, 'Sessions.xml'), 'w') as fh:
+      fh.write(self.SESSIONS)
+
+  def testAllSessionsAreExtracted(self):
+    sessions = pm.Loader._extractSessions(DirectoryZipFile(self.path))
+    self.assertEqual([timedelta(hours=1), timedelta(0)],
+                     [s.Start.utcoffset() for s in sessions])
+
+  def testTimezonesOfSessionsAreAssigned(self):
+    data = pm.Loader(self.path)
+    self.assertEqual([timedelta(hours=h) for h in [1, 0, 0]],
+                     [v.Start.utcoffset() for v in data.getVisits(order='Start')])
+    self.assertEqual([timedelta(0)] * 3,
+                     [n.Start.utcoffset() for v in data.getVisits(order='Start')
+                      for n in v.Nosepokes])
+
+
+class LoadTimeWindowTest(unittest.TestCase):
+  DATA_FILES = ['legacy_data.zip', 'icp3_data.zip']
+  FLAGS = {'getLog': True, 'getEnv': True, 'getHw': True}
+  CET = timezone('Etc/GMT-1')
+
+  def setUp(self):
+    dataDir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
+    self.paths = [os.path.join(dataDir, fn) for fn in self.DATA_FILES]
+
+  def testStartBoundSelectsLaterData(self):
+    self.checkWindow(datetime(2012, 12, 18, 12, 19, tzinfo=self.CET), None)
+
+  def testEndBoundSelectsEarlierData(self):
+    self.checkWindow(None, datetime(2012, 12, 18, 12, 19, tzinfo=self.CET))
+
+  def testBoundsSelectDataInBetween(self):
+    self.checkWindow(datetime(2012, 12, 18, 12, 15, tzinfo=self.CET),
+                     datetime(2012, 12, 18, 12, 30, 30, tzinfo=self.CET))
+
+  def testBoundsInOtherTimezone(self):
+    self.checkWindow(datetime(2012, 12, 18, 11, 15, tzinfo=utc),
+                     datetime(2012, 12, 18, 11, 30, 30, tzinfo=utc))
+
+  def testEmptyWindow(self):
+    bound = datetime(2012, 12, 18, 12, 19, tzinfo=self.CET)
+    for path in self.paths:
+      data = pm.Loader(path, start=bound, end=bound, **self.FLAGS)
+      self.assertEqual([], data.getVisits())
+      self.assertEqual([], data.getLog())
+      self.assertEqual([], data.getHardwareEvents())
+
+  def testWindowIsSelectedFromCachedTables(self):
+    cacheDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, cacheDir)
+    for path in self.paths:
+      pm.Loader(path, cache=cacheDir, **self.FLAGS)
+
+    self.checkWindow(datetime(2012, 12, 18, 12, 15, tzinfo=self.CET),
+                     datetime(2012, 12, 18, 12, 30, 30, tzinfo=self.CET),
+                     cache=cacheDir)
+
+  def checkWindow(self, start, end, **kwargs):
+    for path in self.paths:
+      reference = pm.Loader(path, **self.FLAGS)
+      data = pm.Loader(path, start=start, end=end, **dict(self.FLAGS, **kwargs))
+      self.assertEqual(self.describe(reference, start, end),
+                       self.describe(data))
+
+  @staticmethod
+  def describe(data, start=None, end=None):
+    return ([(str(v.Animal), v.Start, v.Corner, v._line,
+              [(n.Start, n.Side, n._line) for n in v.Nosepokes])
+             for v in data.getVisits(start=start, end=end, order='Start')],
+            [(l.DateTime, l._line)
+             for l in data.getLog(start=start, end=end, order='DateTime')],
+            [(e.DateTime, e.Cage, e._line)
+             for e in data.getEnvironment(start=start, end=end,
+                                          order=('DateTime', 'Cage'))],
+            [(h.DateTime, h.Type, h._line)
+             for h in data.getHardwareEvents(start=start, end=end,
+                                             order='DateTime')])
+
+
+class LoadAnimalsTest(unittest.TestCase):
+  DATA_FILES = ['legacy_data.zip', 'icp3_data.zip', 'retagged_data.zip']
+
+  def setUp(self):
+    dataDir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
+    self.paths = [os.path.join(dataDir, fn) for fn in self.DATA_FILES]
+
+  def testMiceAreSelected(self):
+    self.checkAnimals(['Jerry', 'Minnie'], mice=['Minnie', 'Jerry'])
+
+  def testGroupsAreSelected(self):
+    self.checkAnimals(['Mickey', 'Minnie'], groups=['Disney'])
+
+  def testMiceAndGroupsAreSelected(self):
+    self.checkAnimals(['Jerry', 'Mickey', 'Minnie'],
+                      mice=['Mickey'], groups=['HannaBarbera', 'Disney'])
+
+  def testUnknownMiceSelectNothing(self):
+    for path in self.paths:
+      data = pm.Loader(path, mice=['Donald'], groups=['Warner Bros.'])
+      self.assertEqual(frozenset(), data.getMice())
+      self.assertEqual(frozenset(), data.getGroup())
+      self.assertEqual([], data.getVisits())
+      self.assertEqual(frozenset(), data.getInmates())
+
+  def testGroupsOfSelectedAnimalsAreLoaded(self):
+    for path in self.paths:
+      data = pm.Loader(path, mice=['Minnie'])
+      self.assertEqual(frozenset(['Disney']), data.getGroup())
+      self.assertEqual(['Minnie'],
+                       [a.Name for a in data.getGroup('Disney').Animals])
+
+  def testAnimalsAreSelectedWithinTimeWindow(self):
+    CET = timezone('Etc/GMT-1')
+    start = datetime(2012, 12, 18, 12, 15, tzinfo=CET)
+    end = datetime(2012, 12, 18, 12, 30, 30, tzinfo=CET)
+    for path in self.paths:
+      reference = pm.Loader(path, getLog=True)
+      data = pm.Loader(path, getLog=True, mice=['Jerry', 'Minnie'],
+                       start=start, end=end)
+      self.assertEqual(self.describe(reference, ['Jerry', 'Minnie'],
+                                     start, end),
+                       self.describe(data))
+
+  def checkAnimals(self, selected, **kwargs):
+    for path in self.paths:
+      reference = pm.Loader(path, getLog=True)
+      data = pm.Loader(path, getLog=True, **kwargs)
+      self.assertEqual(frozenset(selected), data.getMice())
+      self.assertEqual(self.describe(reference, selected),
+                       self.describe(data))
+      self.assertEqual(frozenset([1]), data.getInmates())
+      self.assertEqual(sorted(selected),
+                       sorted(a.Name for a in data.getInmates(1)))
+
+  @staticmethod
+  def describe(data, mice=None, start=None, end=None):
+    return ([(str(v.Animal), v.Start, v.Corner, v._line,
+              [(n.Start, n.Side, n._line) for n in v.Nosepokes])
+             for v in data.getVisits(mice=mice, start=start, end=end,
+                                     order='Start')],
+            [(l.DateTime, l._line)
+             for l in data.getLog(start=start, end=end, order='DateTime')])
+
+
+class LoadManyTest(unittest.TestCase):
+  DATA_FILES = ['legacy_data.zip', 'icp3_data.zip', 'retagged_data.zip']
+
+  def setUp(self):
+    dataDir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
+    self.paths = [os.path.join(dataDir, fn) for fn in self.DATA_FILES]
+
+  def testInSubprocessesMergesAsMerger(self):
+    self.checkMergesAsMerger(workers=2)
+
+  def testInSingleProcessMergesAsMerger(self):
+    self.checkMergesAsMerger(workers=1)
+
+  def testEmptyPathsGiveEmptyData(self):
+    self.assertEqual([], pm.loadMany([], workers=2).getVisits())
+
+  def checkMergesAsMerger(self, workers):
+    merged = pm.loadMany(self.paths, workers=workers, getLog=True)
+    reference = pm.Merger(*[pm.Loader(path, getLog=True)
+                            for path in self.paths],
+                          getLog=True)
+    self.assertEqual(self.describe(reference), self.describe(merged))
+
+  @staticmethod
+  def describe(data):
+    return ([(str(v.Animal), v.Start, v.End, v.Cage, v.Corner,
+              [(n.Start, n.Side) for n in v.Nosepokes])
+             for v in data.getVisits(order='Start')],
+            [(l.DateTime, l.Notes) for l in data.getLog(order='DateTime')],
+            sorted(data.getMice()),
+            sorted(data.getGroup()))
+
+
 class LoadEmptyDataTest(LoaderIntegrationTest):
   DATA_FILE = 'empty_data.zip'
 
@@ -27,8 +27,12 @@ import unittest
 
 from datetime import datetime, timedelta
 import pytz
+import numpy as np
 
-from pymice._FixTimezones import inferTimezones, TimezonesInferrer, LatticeOrderer
+from pymice._FixTimezones import (inferTimezones, inferSessionsTimezones,
+                                  TimezonesInferrer,
+                                  LatticeOrderer, ArrayOrderer, Timeline)
+from pymice._Profile import Profile
 
 
 utc = pytz.utc
@@ -157,6 +161,153 @@ class TestFixTimezones(unittest.TestCase):
       inferTimezones(timepoints, sessionStart.astimezone(utcDST), sessionEnd)
 
 
+  def testTimepointsMayBeGivenAsMicroseconds(self):
+    timepointsUTC, timezonesUTC = makeTestCases(sessionStart, timeChange, minute)
+    timepointsDST, timezonesDST = makeTestCases(timeChange.astimezone(utcDST),
+                                                sessionEnd.astimezone(utcDST),
+                                                minute)
+    inferred = inferTimezones(toMicroseconds(timepointsUTC + timepointsDST),
+                              sessionStart, sessionEnd.astimezone(utcDST))
+    self.assertEqual(inferred, timezonesUTC + timezonesDST)
+
+def toMicroseconds(timepoints):
+  deltas = [datetime(*t) - datetime(1970, 1, 1) for t in timepoints]
+  return np.array([(d.days * 86400 + d.seconds) * 1000000 + d.microseconds
+                   for d in deltas], dtype=np.int64)
+
+
+class TestInferSessionsTimezones(unittest.TestCase):
+  day = timedelta(days=1)
+
+  def infer(self, parts, sessions):
+    timepoints = toMicroseconds([t for part, _ in parts for t in part])
+    codes, timezones = inferSessionsTimezones(timepoints, sessions)
+    self.assertEqual([tz for _, partTimezones in parts for tz in partTimezones],
+                     [timezones[code] for code in codes])
+
+  def testTimezoneChangesInManySessionsAreInferred(self):
+    day = self.day
+    self.infer([makeTestCases(sessionStart, timeChange, minute),
+                makeTestCases(timeChange.astimezone(utcDST),
+                              sessionEnd.astimezone(utcDST), minute),
+                makeTestCases((sessionStart + day).astimezone(utcDST),
+                              (timeChange + day).astimezone(utcDST), minute),
+                makeTestCases(timeChange + day, sessionEnd + day, minute)],
+               [(sessionStart, sessionEnd.astimezone(utcDST)),
+                ((sessionStart + day).astimezone(utcDST), sessionEnd + day)])
+
+  def testTimezonesOfSessionsAreInferred(self):
+    day = self.day
+    self.infer([makeTestCases(sessionStart, sessionEnd, minute),
+                makeTestCases((sessionStart + day).astimezone(utcDST),
+                              (sessionEnd + day).astimezone(utcDST), minute),
+                makeTestCases(sessionStart + 2 * day, sessionEnd + 2 * day,
+                              minute)],
+               [(sessionStart, sessionEnd),
+                ((sessionStart + day).astimezone(utcDST), None),
+                (sessionStart + 2 * day, sessionEnd + 2 * day)])
+
+  def testEmptySessionsAreSkipped(self):
+    day = self.day
+    for sessions in [[(sessionStart.astimezone(utcDST), sessionEnd),
+                      (sessionStart + day, None)],
+                     [(sessionStart, sessionEnd.astimezone(utcDST)),
+                      ((sessionStart + day).astimezone(utcDST), None)]]:
+      start = sessions[1][0]
+      self.infer([makeTestCases(start, start + 3 * minute, minute)], sessions)
+      self.infer([([], []),
+                  makeTestCases(start, start + 3 * minute, minute)], sessions)
+
+    self.infer([makeTestCases(sessionStart, sessionEnd, minute),
+                makeTestCases(sessionStart + 2 * day, sessionEnd + 2 * day,
+                              minute)],
+               [(sessionStart, sessionEnd),
+                ((sessionStart + day).astimezone(utcDST), sessionEnd + day),
+                (sessionStart + 2 * day, None)])
+
+  def testNoTimepoints(self):
+    codes, _ = inferSessionsTimezones(np.array([], dtype=np.int64),
+                                      [(sessionStart, sessionEnd),
+                                       (sessionStart + self.day, None)])
+    self.assertEqual([], codes.tolist())
+
+
+class TestTimeline(unittest.TestCase):
+  def setUp(self):
+    self.timeline = Timeline()
+
+  def addColumn(self, *times):
+    return self.timeline.addColumn(toMicroseconds([datetimeToList(t)
+                                                   for t in times]))
+
+  def testColumnsAreIndexedInOrderOfAddition(self):
+    self.assertEqual(0, self.addColumn(sessionStart))
+    self.assertEqual(1, self.addColumn())
+    self.assertEqual(2, len(self.timeline))
+
+  def testTimepointsArePulledChronologically(self):
+    self.addColumn(sessionStart + 2 * minute, sessionStart)
+    self.addColumn(sessionStart + minute)
+    self.timeline.addSequence(0, [1, 0])
+    self.timeline.addSequence(1)
+    timepoints, columns, rows = self.timeline.pullOrdered()
+    self.assertEqual(toMicroseconds([datetimeToList(sessionStart + i * minute)
+                                     for i in range(3)]).tolist(),
+                     timepoints.tolist())
+    self.assertEqual([0, 1, 0], columns.tolist())
+    self.assertEqual([1, 0, 0], rows.tolist())
+
+  def testSequencesTakePrecedenceOverTime(self):
+    self.addColumn(sessionStart + minute, sessionStart)
+    self.addColumn(sessionStart + 2 * minute, sessionStart + 3 * minute)
+    self.timeline.coupleColumns(0, 1)
+    self.timeline.addSequence(0)
+    _, columns, rows = self.timeline.pullOrdered()
+    self.assertEqual([0, 0, 1, 1], columns.tolist())
+    self.assertEqual([0, 1, 0, 1], rows.tolist())
+
+  def testPreservedTimezoneIsInferredForWholeColumns(self):
+    self.addColumn(sessionStart + minute)
+    self.addColumn(sessionStart + 2 * minute, sessionStart + 3 * minute)
+    self.assertEqual([utc, utc],
+                     self.timeline.inferTimezones(sessionStart, sessionEnd))
+    self.assertEqual([utc, utc],
+                     self.timeline.inferTimezones(sessionStart, None))
+
+  def testChangedTimezoneIsInferredForEveryTimepoint(self):
+    end = sessionEnd.astimezone(utcDST)
+    self.addColumn(sessionStart + 10 * minute,
+                   likeDST(sessionStart + 2 * minute * 60))
+    self.addColumn(sessionStart + 20 * minute,
+                   likeDST(sessionStart + 2 * minute * 60 + 10 * minute))
+    self.timeline.coupleColumns(0, 1)
+    self.timeline.addSequence(0)
+    timezones = self.timeline.inferTimezones(sessionStart, end)
+    self.assertEqual([[utc, end.tzinfo], [utc, end.tzinfo]],
+                     [list(tz) for tz in timezones])
+
+  def testTimezonesOfManySessionsAreInferred(self):
+    day = timedelta(days=1)
+    self.addColumn(sessionStart + 10 * minute,
+                   likeDST(sessionStart + day + 10 * minute))
+    self.timeline.addSequence(0)
+    timezones = self.timeline.inferSessionsTimezones(
+                                 [(sessionStart, sessionEnd),
+                                  ((sessionStart + day).astimezone(utcDST),
+                                   None)])
+    self.assertEqual([[utc, utcDST]], [list(tz) for tz in timezones])
+
+  def testOrderingAndInferenceAreProfiled(self):
+    end = sessionEnd.astimezone(utcDST)
+    self.addColumn(sessionStart + 10 * minute,
+                   likeDST(sessionStart + 2 * minute * 60))
+    self.timeline.addSequence(0)
+    profile = Profile()
+    self.timeline.inferTimezones(sessionStart, end, profile=profile)
+    self.assertEqual([('order timepoints', 2), ('infer timezones', 2)],
+                     [(s.name, s.rows) for s in profile.getStages()])
+
+
 class TestLatticeOrderer(unittest.TestCase):
   def setUp(self):
     self.orderer = LatticeOrderer()
@@ -235,5 +386,92 @@ class TestLatticeOrderer(unittest.TestCase):
                      reference)
 
 
+class TestArrayOrderer(unittest.TestCase):
+  def pull(self, timepoints, sequences=(), couples=()):
+    orderer = ArrayOrderer(timepoints)
+    for earlier, later in couples:
+      orderer.coupleSequences(earlier, later)
+
+    for sequence in sequences:
+      orderer.addOrderedSequence(sequence)
+
+    return orderer.pullOrdered().tolist()
+
+  def pullLattice(self, timepoints, sequences=(), couples=()):
+    nodes = []
+    for i, timepoint in enumerate(timepoints):
+      node = LatticeOrderer.Node([timepoint])
+      node._line = i
+      nodes.append(node)
+
+    orderer = LatticeOrderer()
+    for earlier, later in couples:
+      orderer.coupleTuples([nodes[i] for i in earlier],
+                           [nodes[i] for i in later])
+
+    for sequence in sequences:
+      orderer.addOrderedSequence([nodes[i] for i in sequence])
+
+    return [node._line for node in orderer.pullOrdered()]
+
+  def testEmptyStaysEmpty(self):
+    self.assertEqual([], self.pull([]))
+
+  def testSequencesAreMerged(self):
+    self.assertEqual([0, 2, 1, 3],
+                     self.pull([1, 3, 2, 4], [[0, 1], [2, 3]]))
+
+  def testSequenceOrderPrecedesTimeOrder(self):
+    self.assertEqual(list(range(10)),
+                     self.pull(list(range(10, 0, -1)), [list(range(10))]))
+
+  def testSuccessorsOfSmallerValuesFollowImmediately(self):
+    self.assertEqual([3, 0, 1, 2, 4],
+                     self.pull([10, 2, 3, 5, 11], [[0, 1, 2], [3, 4]]))
+
+  def testCoupledTimepointsAreOrdered(self):
+    self.assertEqual([0, 3, 1, 4, 2, 5],
+                     self.pull([2, 5, 8, 1, 4, 7],
+                               [[0, 1, 2]], [([0, 1, 2], [3, 4, 5])]))
+
+  def testTimepointsNotFollowingAnySequenceStartAreNotPulled(self):
+    self.assertEqual([0, 1],
+                     self.pull([1, 2, 0, 3], [[0, 1]], [([2], [3])]))
+
+  def testTiesAreBrokenByIndices(self):
+    self.assertEqual([0, 1, 2],
+                     self.pull([1, 1, 1], [[0], [1], [2]]))
+
+  def testLatticeOrdererIsUsedIfTooManyLevelsNecessary(self):
+    orderer = ArrayOrderer(list(range(20, 0, -1)))
+    orderer.MAX_LEVELS = 2
+    orderer.addOrderedSequence(list(range(20)))
+    self.assertEqual(list(range(20)), orderer.pullOrdered().tolist())
+
+  def testOrderIsEquivalentToLatticeOrderer(self):
+    random = np.random.RandomState(42)
+    for _ in range(200):
+      n = random.randint(1, 40)
+      timepoints = random.permutation(3 * n)[:n]
+      indices = random.permutation(n)
+      cuts = sorted(random.choice(np.arange(1, n + 1), random.randint(0, 4)))
+      sequences = [sequence for sequence in np.split(indices, cuts)
+                   if len(sequence) > 0]
+      for sequence in sequences: # ordered with a break (like time change)
+        values = np.sort(timepoints[sequence])
+        shift = random.randint(len(values))
+        timepoints[sequence] = np.roll(values, shift)
+
+      couples = []
+      if len(sequences) > 1:
+        earlier, later = random.choice(len(sequences), 2, replace=False)
+        couples.append((sequences[earlier], sequences[later]))
+
+      sequences = sequences[random.randint(2):]
+      timepoints = timepoints.tolist()
+      self.assertEqual(self.pullLattice(timepoints, sequences, couples),
+                       self.pull(timepoints, sequences, couples))
+
+
 if __name__ == '__main__':
   unittest.main()
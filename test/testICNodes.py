@@ -25,15 +25,18 @@
 
 import sys
 import unittest
+import weakref
+import pickle
 
 from datetime import datetime, timedelta
-from pytz import utc
+from pytz import utc, FixedOffset
 
 from pymice.ICNodes import (Animal, Visit, Nosepoke,
                             LogEntry, EnvironmentalConditions,
                             AirHardwareEvent, DoorHardwareEvent,
                             LedHardwareEvent, UnknownHardwareEvent,
                             NamedInt)
+from pymice._ICNodesBase import LazyNosepokes
 from ._TestTools import (allInstances, Mock, MockIntDictManager,
                          MockStrDictManager, MockCloneable,
                          BaseTest)
@@ -56,7 +59,7 @@ class ICNodeTest(BaseTest):
   def checkDel(self, obj, skip=()):
     slots = set('_' + cls.__name__ + s if s.startswith('__') else s \
                 for cls in obj.__class__.__mro__ if hasattr(cls, '__slots__')\
-                for s in cls.__slots__)
+                for s in cls.__slots__ if s != '__weakref__')
     for attr in slots:
       if attr in skip:
         continue
@@ -78,6 +81,15 @@ class ICNodeTest(BaseTest):
         print(attr)
         raise
 
+  def checkPickle(self, obj, skip=()):
+    unpickled = pickle.loads(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+    self.assertIs(obj.__class__, unpickled.__class__)
+    for attr in self.attributes:
+      if attr not in skip:
+        self.assertEqual(getattr(obj, attr), getattr(unpickled, attr))
+
+    return unpickled
+
   def checkSlots(self, obj):
     self.assertRaises(AttributeError,
                       lambda: setattr(obj, 'nonexistentAttribute', None))
@@ -256,6 +268,9 @@ class TestAnimal(ICNodeTest):
   def testReadOnly(self):
     self.checkReadOnly(self.mickey)
 
+  def testPickle(self):
+    self.checkPickle(self.mickey)
+
   def testSlots(self):
     self.checkSlots(self.mickey)
 
@@ -361,6 +376,22 @@ class TestVisit(ICNodeTest):
   def testReadOnly(self):
     self.checkReadOnly(self.visit)
 
+  def testPickle(self):
+    self.checkPickle(self.minimalVisit)
+
+  def testPickledNosepokesAreBound(self):
+    nosepokes = tuple(Nosepoke(self.start, self.end, 3,
+                               i, None, None, None, None, None, None,
+                               None, None, None, None, None,
+                               'source', i)
+                      for i in range(2))
+    visit = Visit(self.start, 2, 'animal', self.end, 'mod', 4,
+                  1, 0, 2, None, 7, None, 0, 'source', 1, nosepokes)
+    unpickled = self.checkPickle(visit, skip=('Nosepokes',))
+    self.assertEqual([0, 1], [n.LickNumber for n in unpickled.Nosepokes])
+    for nosepoke in unpickled.Nosepokes:
+      self.assertIs(unpickled, nosepoke.Visit)
+
   def testSlots(self):
     self.checkSlots(self.visit)
 
@@ -403,6 +434,110 @@ class TestVisit(ICNodeTest):
                      u'< Visit of "animal" to corner #2 of cage #4 (at 1970-01-01 00:00:00.000) >')
 
 
+class MockLazyNosepokes(LazyNosepokes):
+  __slots__ = ('nosepokes', 'materialized')
+
+  def __init__(self, nosepokes):
+    self.nosepokes = nosepokes
+    self.materialized = 0
+
+  def __len__(self):
+    return len(self.nosepokes)
+
+  def materialize(self):
+    self.materialized += 1
+    return self.nosepokes
+
+
+class TestVisitWithLazyNosepokes(BaseTest):
+  def setUp(self):
+    self.nosepokes = tuple(MockCloneable(LickNumber=i) for i in range(1, 4))
+    self.lazy = MockLazyNosepokes(self.nosepokes)
+    self.visit = Visit(datetime(1970, 1, 1, tzinfo=utc), 2, 'animal', None,
+                       None, 4,
+                       None, None, None, None, None, None,
+                       None,
+                       'source', 1,
+                       self.lazy)
+
+  def testNosepokesAreNotCreatedUntilAccessed(self):
+    self.assertEqual(self.visit.NosepokeNumber, 3)
+    self.assertEqual(self.lazy.materialized, 0)
+    for nosepoke in self.nosepokes:
+      self.assertEqual(nosepoke.sequence, [])
+
+  def testNosepokesAreCreatedOnceAndBound(self):
+    self.assertIs(self.visit.Nosepokes, self.nosepokes)
+    self.assertIs(self.visit.Nosepokes, self.nosepokes)
+    self.assertEqual(self.lazy.materialized, 1)
+    for nosepoke in self.nosepokes:
+      self.assertEqual(nosepoke.sequence, [('_bindToVisit', self.visit)])
+
+  def testAggregativeProperties(self):
+    self.assertEqual(self.visit.LickNumber, 6)
+
+  def testCloneIsLazy(self):
+    cageManager = MockIntDictManager()
+    sourceManager = MockStrDictManager()
+    animalManager = MockStrDictManager()
+    visit = self.visit.clone(sourceManager, cageManager, animalManager)
+    self.assertEqual(visit.NosepokeNumber, 3)
+    self.assertEqual(self.lazy.materialized, 0)
+
+    for nosepoke, clonedNosepoke in zip(self.nosepokes, visit.Nosepokes):
+      self.assertEqual(nosepoke.sequence,
+                       [('clone', sourceManager, cageManager.items[4].items[2])])
+      self.assertIs(clonedNosepoke._cloneOf, nosepoke)
+      self.assertEqual(clonedNosepoke.sequence, [('_bindToVisit', visit)])
+
+  def testDelDoesNotCreateNosepokes(self):
+    self.visit._del_()
+    self.assertEqual(self.lazy.materialized, 0)
+
+
+class TestLazyTimepoints(BaseTest):
+  def setUp(self):
+    self.cet = FixedOffset(60)
+    self.visit = Visit((1500000, self.cet), 2, 'animal', (61500000, utc),
+                       None, 4,
+                       None, None, None, None, None, None,
+                       None,
+                       'source', 1,
+                       None)
+    self.log = LogEntry((-3600000000, self.cet), u'Info', u'Session',
+                        None, None, None, None, 'source', 2)
+
+  def testTimepointsAreMicrosecondsSinceEpochInUTC(self):
+    self.assertEqual(self.visit._utcStart, 1500000)
+    self.assertEqual(self.visit._utcEnd, 61500000)
+    self.assertEqual(self.log._utcDateTime, -3600000000)
+
+  def testDatetimesAreCreatedOnAccess(self):
+    start = self.visit.Start
+    self.assertEqual(start, datetime(1970, 1, 1, 1, 0, 1, 500000, self.cet))
+    self.assertIs(start.tzinfo, self.cet)
+    self.assertIs(self.visit.Start, start)
+    self.assertEqual(self.visit._utcStart, 1500000)
+    self.assertIs(self.visit.End.tzinfo, utc)
+    self.assertEqual(self.log.DateTime, datetime(1969, 12, 31, 23, tzinfo=utc))
+
+  def testDurationDoesNotCreateDatetimes(self):
+    self.assertEqual(self.visit.Duration, timedelta(seconds=60))
+    self.assertEqual(self.visit._Visit___StartTimezone, self.cet)
+
+  def testCloneIsLazy(self):
+    visit = self.visit.clone(MockStrDictManager(), MockIntDictManager(),
+                             MockStrDictManager())
+    self.assertEqual(visit._Visit___StartTimezone, self.cet)
+    self.assertEqual(visit.Start, datetime(1970, 1, 1, 0, 0, 1, 500000, utc))
+
+  def testTimepointsOfDatetimesAreInUTC(self):
+    visit = Visit(datetime(1970, 1, 1, 1, tzinfo=self.cet), 2, 'animal', None,
+                  *[None] * 9 + ['source', 1, None])
+    self.assertEqual(visit._utcStart, 0)
+    self.assertIs(visit._utcEnd, None)
+
+
 class TestNosepoke(ICNodeTest):
   attributes = ('Start', 'End', 'Side',
                 'LickNumber', 'LickContactTime', 'LickDuration',
@@ -477,6 +612,9 @@ class TestNosepoke(ICNodeTest):
   def testReadOnly(self):
     self.checkReadOnly(self.nosepoke)
 
+  def testPickle(self):
+    self.checkPickle(self.nosepoke, skip=('Visit',))
+
   def testSlots(self):
     self.checkSlots(self.nosepoke)
 
@@ -485,12 +623,22 @@ class TestNosepoke(ICNodeTest):
 
   def testVisit(self):
     self.assertRaises(AttributeError, lambda: self.nosepoke.Visit)
-    visit = object()
+    visit = Mock()
     self.nosepoke._bindToVisit(visit)
     self.assertIs(self.nosepoke.Visit, visit)
     self.assertRaises(AttributeError,
                       lambda: setattr(self.nosepoke, 'Visit', 12))
 
+  def testVisitIsNotKeptAlive(self):
+    visit = Visit(self.start, 2, 'animal', self.end, None, 4,
+                  None, None, None, None, None, None, None,
+                  'src', 1, (self.nosepoke,))
+    self.assertIs(visit.Nosepokes[0].Visit, visit)
+    reference = weakref.ref(visit)
+    del visit
+    self.assertIs(None, reference())
+    self.assertIs(None, self.nosepoke.Visit)
+
   def testDuration(self):
     self.assertEqual(self.nosepoke.Duration, timedelta(seconds=315))
 
@@ -555,6 +703,10 @@ class TestLogEntry(ICNodeTest):
     for log in self.logs:
       self.checkReadOnly(log)
 
+  def testPickle(self):
+    for log in self.logs:
+      self.checkPickle(log)
+
   def testSlots(self):
     for log in self.logs:
       self.checkSlots(log)
@@ -598,6 +750,9 @@ class TestEnvironmentalConditions(ICNodeTest):
   def testReadOnly(self):
     self.checkReadOnly(self.env)
 
+  def testPickle(self):
+    self.checkPickle(self.env)
+
   def testSlots(self):
     self.checkSlots(self.env)
 
@@ -645,6 +800,10 @@ class HardwareEventTest(object):
     for hw in self.hws:
       self.checkReadOnly(hw)
 
+  def testPickle(self):
+    for hw in self.hws:
+      self.checkPickle(hw)
+
   def testDel(self):
     for hw in self.hws:
       self.checkDel(hw)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# encoding: utf-8
+###############################################################################
+#                                                                             #
+#    PyMICE library                                                           #
+#                                                                             #
+#    Copyright (C) 2012-2017 Jakub M. Dzik a.k.a. Kowalski, S. Łęski          #
+#    (Laboratory of Neuroinformatics; Nencki Institute of Experimental        #
+#    Biology of Polish Academy of Sciences)                                   #
+#                                                                             #
+#    This software is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This software is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this software.  If not, see http://www.gnu.org/licenses/.     #
+#                                                                             #
+###############################################################################
+
+import unittest
+
+import numpy as np
+
+import pymice._ObjectBase as _ObjectBase
+from pymice._ObjectBase import (ObjectBase, ArrayBuffer, Range, CATEGORICAL,
+                                typedArray)
+
+
+class Node(object):
+  def __init__(self, **attributes):
+    self.__dict__.update(attributes)
+
+  def __repr__(self):
+    return 'Node(%s)' % ', '.join('%s=%r' % item
+                                  for item in sorted(self.__dict__.items()))
+
+
+class RangeSelectionTest(unittest.TestCase):
+  SIZE = 1000
+
+  def setUp(self):
+    self.objects = [Node(t=i * 7 % self.SIZE, c=i % 3)
+                    for i in range(self.SIZE)]
+    self.ob = ObjectBase()
+    self.ob.put(self.objects[:self.SIZE // 2])
+    self.ob.put(self.objects[self.SIZE // 2:])
+    self.ob.freeze()
+
+  def tearDown(self):
+    _ObjectBase.np = np
+
+  def watchTableScans(self):
+    """
+    Make the module fail any NumPy call giving an array as long as the table.
+    """
+    test, size = self, self.SIZE
+    class Watch(object):
+      def __getattr__(self, name):
+        attribute = getattr(np, name)
+        if isinstance(attribute, type) or not hasattr(attribute, '__call__'):
+          return attribute
+
+        def watched(*args, **kwargs):
+          result = attribute(*args, **kwargs)
+          if isinstance(result, np.ndarray) and result.size >= size:
+            test.fail('np.%s scanned the whole table' % name)
+
+          return result
+
+        return watched
+
+    _ObjectBase.np = Watch()
+
+  def select(self, lower, upper, order=None, **selectors):
+    selectors['t'] = Range(lower, upper)
+    return self.ob.get(selectors, order=order)
+
+  def expected(self, lower, upper, key=None, c=None):
+    selected = [o for o in self.objects
+                if lower <= o.t < upper and (c is None or o.c in c)]
+    return selected if key is None else sorted(selected, key=key)
+
+  def testRangeIsSelectedInOrderOfPutting(self):
+    self.select(0, 1) # caches the order
+    self.watchTableScans()
+    self.assertEqual(self.expected(100, 200), self.select(100, 200))
+
+    _ObjectBase.np = np
+    self.assertEqual(self.ob.get({'t': lambda t: (100 <= t) * (t < 200)}),
+                     self.select(100, 200))
+
+  def testRangeIsSelectedInOrderOfItsAttribute(self):
+    self.select(0, 1)
+    self.watchTableScans()
+    for order in ['t', ('t',)]:
+      self.assertEqual(self.expected(100, 200, lambda o: o.t),
+                       self.select(100, 200, order=order))
+
+  def testRangeIsCombinedWithOtherSelectors(self):
+    self.select(0, 1, c=[0, 1, 2]) # caches the order and masks
+    self.watchTableScans()
+    self.assertEqual(self.expected(100, 300, c=[1, 2]),
+                     self.select(100, 300, c=[1, 2]))
+    self.assertEqual(self.expected(100, 300, c=[2]),
+                     self.select(100, 300, c=lambda x: x == 2))
+
+  def testRangeIsSelectedInOtherOrder(self):
+    self.select(0, 1, order='c', c=[0, 1, 2])
+    self.watchTableScans()
+    self.assertEqual(self.expected(100, 300, lambda o: o.c),
+                     self.select(100, 300, order='c'))
+    self.assertEqual(self.expected(100, 300, lambda o: o.c, c=[0, 2]),
+                     self.select(100, 300, order='c', c=[0, 2]))
+
+  def testEmptyRange(self):
+    self.select(0, 1, order='c', c=[0, 1, 2])
+    self.watchTableScans()
+    self.assertEqual([], self.select(300, 300, order='c', c=[1]))
+
+
+class ArrayBufferTest(unittest.TestCase):
+  def testAppendsAreAmortized(self):
+    buffer = ArrayBuffer([0])
+    arrays = []
+    for i in range(1, 1025):
+      buffer.extend([i])
+      array = buffer.get().base
+      if not any(array is x for x in arrays):
+        arrays.append(array)
+
+    self.assertEqual(list(range(1025)), buffer.get().tolist())
+    self.assertEqual(1025, len(buffer))
+    self.assertEqual(11, len(arrays)) # capacities 2, 4, ..., 2048
+
+  def testValuesAreCopied(self):
+    values = np.arange(3)
+    values.flags.writeable = False
+    buffer = ArrayBuffer(values)
+    buffer.extend([3])
+    self.assertEqual([0, 1, 2, 3], buffer.get().tolist())
+    self.assertEqual([0, 1, 2], values.tolist())
+
+  def testDtypeIsPromotedOnAppend(self):
+    buffer = ArrayBuffer(np.array([1, 2], dtype=np.int8))
+    buffer.extend(np.array([1000], dtype=np.int16))
+    self.assertEqual(np.int16, buffer.get().dtype)
+    buffer.extend([0.5])
+    self.assertEqual(np.float64, buffer.get().dtype)
+    self.assertEqual([1, 2, 1000, 0.5], buffer.get().tolist())
+
+  def testDtypeOfEmptyBufferIsThatOfValues(self):
+    buffer = ArrayBuffer()
+    buffer.extend(np.array([1, 2], dtype=np.int8))
+    self.assertEqual(np.int8, buffer.get().dtype)
+    self.assertEqual([1, 2], buffer.get().tolist())
+
+  def testGivenDtypeIsKept(self):
+    buffer = ArrayBuffer(dtype=object)
+    buffer.extend([1, None])
+    buffer.extend([u'a'])
+    self.assertEqual(object, buffer.get().dtype)
+    self.assertEqual([1, None, u'a'], buffer.get().tolist())
+
+
+class CachesAfterPutTest(unittest.TestCase):
+  def setUp(self):
+    self.converted = []
+    self.ob = ObjectBase({'c': self.convert})
+    self.objects = [Node(t=t, c=t % 3) for t in [5, 3, 4, 1]]
+    self.ob.put(self.objects[:2])
+
+  def convert(self, value):
+    self.converted.append(value)
+    return value
+
+  def testCachedMasksAreExtended(self):
+    self.assertEqual([self.objects[1]], self.ob.get({'c': [0]}))
+    self.assertEqual(2, len(self.converted))
+
+    self.ob.put(self.objects[2:])
+    self.assertEqual(4, len(self.converted)) # only new values are converted
+    self.assertEqual([self.objects[1]], self.ob.get({'c': [0]}))
+    self.assertEqual([self.objects[2], self.objects[3]],
+                     self.ob.get({'c': [1]}))
+    self.assertEqual([self.objects[0], self.objects[1]],
+                     self.ob.get({'c': lambda x: x != 1}))
+    self.assertEqual(4, len(self.converted))
+
+  def testCachedOrdersAreDropped(self):
+    self.ob.cacheOrder('t')
+    self.ob.cacheOrder('c')
+    self.assertEqual([self.objects[1], self.objects[0]],
+                     self.ob.get({'t': Range(2)}, order='c'))
+
+    self.ob.put(self.objects[2:])
+    self.assertFalse(self.ob.hasOrder('t'))
+    self.assertFalse(self.ob.hasOrder('c'))
+    self.assertEqual([self.objects[i] for i in [3, 1, 2, 0]],
+                     self.ob.get(order='t'))
+    self.assertEqual([self.objects[i] for i in [1, 2, 0]],
+                     self.ob.get({'t': Range(2)}, order='c'))
+    self.assertEqual([self.objects[i] for i in [1, 2]],
+                     self.ob.get({'t': Range(2, 5)}))
+
+
+class TypedArrayTest(unittest.TestCase):
+  def testSmallIntegersFitNarrowTypes(self):
+    for dtype, values in [(np.int8, [-128, 0, 127]),
+                          (np.int16, [-32768, 200, 32767])]:
+      for given in [values, np.array(values), np.array(values, dtype=object)]:
+        array = typedArray(given, dtype)
+        self.assertEqual(np.dtype(dtype), array.dtype)
+        self.assertEqual(values, array.tolist())
+
+  def testEmptyValuesFitAnyType(self):
+    self.assertEqual(np.dtype(np.int8), typedArray([], np.int8).dtype)
+
+  def testValuesNotFittingTypeGiveNone(self):
+    for dtype, values in [(np.int8, [1, 128]),
+                          (np.int8, [-129, 1]),
+                          (np.int16, [1, 32768]),
+                          (np.int8, [1, None]),
+                          (np.int8, [1, 1.5]),
+                          (np.int8, [u'1'])]:
+      self.assertIs(None, typedArray(values, dtype))
+
+
+class MaskManagerTest(unittest.TestCase):
+  def testTypedValuesAreSelected(self):
+    mm = ObjectBase.MaskManager([3, 1, 3], np.int16)
+    self.assertEqual([True, False, True], mm.getMask([3]).tolist())
+    self.assertEqual([False, True, False],
+                     mm.getMask(lambda x: x < 3).tolist())
+
+  def testMissingValuesFallBackToObjects(self):
+    mm = ObjectBase.MaskManager([3, 1], np.int8)
+    self.assertEqual([True, False], mm.getMask([3]).tolist())
+    mm.extend([None, 3])
+    self.assertEqual([True, False, False, True], mm.getMask([3]).tolist())
+    self.assertEqual([False, False, True, False], mm.getMask([None]).tolist())
+    self.assertEqual([False, True, True, False],
+                     mm.getMask([1, None]).tolist())
+
+  def testOutOfRangeValuesFallBackToObjects(self):
+    mm = ObjectBase.MaskManager([1, 2], np.int8)
+    mm.extend([300])
+    self.assertEqual([False, False, True], mm.getMask([300]).tolist())
+    self.assertEqual([False, False, False], mm.getMask([300 - 256]).tolist())
+
+    mm = ObjectBase.MaskManager([1, 300], np.int8)
+    self.assertEqual([False, True], mm.getMask([300]).tolist())
+
+  def testCategoricalValuesAreExtended(self):
+    mm = ObjectBase.MaskManager([u'a', None, u'b'], CATEGORICAL)
+    self.assertEqual([False, False, True], mm.getMask([u'b']).tolist())
+    mm.extend([u'b', u'c', u'a'])
+    self.assertEqual([False, False, True, True, False, False],
+                     mm.getMask([u'b']).tolist())
+    self.assertEqual([True, False, False, False, True, True],
+                     mm.getMask([u'a', u'c']).tolist())
+    self.assertEqual([False, True, False, False, False, False],
+                     mm.getMask([None]).tolist())
+    self.assertEqual([False] * 6, mm.getMask([u'd']).tolist())
+
+  def testCategoricalValuesAreDecodedForFunctions(self):
+    values = [u'a', None, u'b', u'a']
+    mm = ObjectBase.MaskManager(values[:2], CATEGORICAL)
+    mm.extend(values[2:])
+    called = []
+    def selector(x):
+      called.append(x.tolist())
+      return x == u'a'
+
+    self.assertEqual([True, False, False, True], mm.getMask(selector).tolist())
+    self.assertEqual([True, False], mm.getMask(selector,
+                                               np.array([3, 2])).tolist())
+    self.assertEqual([values, [u'a', u'b']], called)
+
+  def testCategoricalColumnsAreSelectedByFunctions(self):
+    objects = [Node(name=name, x=x)
+               for x, name in enumerate([u'a', u'b', None, u'a'])]
+    ob = ObjectBase(types={'name': CATEGORICAL})
+    ob.put(objects[:2])
+    ob.put(objects[2:])
+    self.assertEqual([objects[0], objects[3]],
+                     ob.get({'name': lambda x: x == u'a'}))
+    self.assertEqual([objects[2]], ob.get({'name': [None]}))
+    self.assertEqual([objects[3]], ob.get({'x': [1, 3],
+                                           'name': lambda x: x == u'a'}))
+    self.assertEqual([objects[2], objects[3]],
+                     ob.get({'name': [u'a', None], 'x': lambda x: x > 0}))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# encoding: utf-8
+###############################################################################
+#                                                                             #
+#    PyMICE library                                                           #
+#                                                                             #
+#    Copyright (C) 2012-2017 Jakub M. Dzik a.k.a. Kowalski, S. Łęski          #
+#    (Laboratory of Neuroinformatics; Nencki Institute of Experimental        #
+#    Biology of Polish Academy of Sciences)                                   #
+#                                                                             #
+#    This software is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This software is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this software.  If not, see http://www.gnu.org/licenses/.     #
+#                                                                             #
+###############################################################################
+
+import pickle
+import unittest
+
+from pymice._Profile import Profile, NO_PROFILE, tracemalloc
+
+
+class TestProfile(unittest.TestCase):
+  def setUp(self):
+    self.profile = Profile()
+
+  def testNewProfileHasNoStages(self):
+    self.assertEqual([], self.profile.getStages())
+    self.assertEqual(0, self.profile.getTime())
+
+  def testStagesAreRecordedInOrder(self):
+    with self.profile.stage('first', 3):
+      pass
+
+    with self.profile.stage('second') as stage:
+      stage.rows = 5
+
+    self.assertEqual([('first', 3), ('second', 5)],
+                     [(s.name, s.rows) for s in self.profile.getStages()])
+    for stage in self.profile.getStages():
+      self.assertTrue(stage.time >= 0)
+
+  def testStagesAreFoundByName(self):
+    for rows in [1, 2, 3]:
+      with self.profile.stage('odd' if rows % 2 else 'even', rows):
+        pass
+
+    self.assertEqual([1, 3], [s.rows for s in self.profile.getStage('odd')])
+
+  @unittest.skipIf(tracemalloc is None, 'no tracemalloc module')
+  def testPeakMemoryIsRecorded(self):
+    with self.profile.stage('allocation'):
+      buffer = bytearray(1 << 20)
+      del buffer
+
+    with self.profile.stage('none'):
+      pass
+
+    allocation, none = self.profile.getStages()
+    self.assertTrue(allocation.memory >= 1 << 20)
+    self.assertTrue(none.memory < 1 << 20)
+    self.assertFalse(tracemalloc.is_tracing())
+
+  def testInterleavedStagesAreRecordedInOrder(self):
+    with self.profile.interleavedStages('read', 'parse') as stages:
+      for _ in range(3):
+        with stages.part('read'):
+          pass
+
+        with stages.part('parse'):
+          pass
+
+      stages.rows = {'read': 3, 'parse': 2}
+
+    self.assertEqual([('read', 3), ('parse', 2)],
+                     [(s.name, s.rows) for s in self.profile.getStages()])
+
+  @unittest.skipIf(tracemalloc is None, 'no tracemalloc module')
+  def testPeakMemoryOfInterleavedStagesIsRecorded(self):
+    with self.profile.interleavedStages('allocation', 'none') as stages:
+      for _ in range(2):
+        with stages.part('allocation'):
+          buffer = bytearray(1 << 20)
+          del buffer
+
+        with stages.part('none'):
+          pass
+
+    allocation, none = self.profile.getStages()
+    self.assertTrue(1 << 20 <= allocation.memory < 2 << 20)
+    self.assertTrue(none.memory < 1 << 20)
+    self.assertFalse(tracemalloc.is_tracing())
+
+  def testFailedStageIsNotRecorded(self):
+    with self.assertRaises(ValueError):
+      with self.profile.stage('failing'):
+        raise ValueError
+
+    self.assertEqual([], self.profile.getStages())
+    if tracemalloc is not None:
+      self.assertFalse(tracemalloc.is_tracing())
+
+  def testReportListsStages(self):
+    with self.profile.stage('parse Visits', 42):
+      pass
+
+    lines = str(self.profile).split('\n')
+    self.assertEqual(2, len(lines))
+    self.assertEqual(['stage', 'time', '[s]', 'peak', 'memory', '[MiB]', 'rows'],
+                     lines[0].split())
+    self.assertEqual(['parse', 'Visits'], lines[1].split()[:2])
+    self.assertEqual('42', lines[1].split()[-1])
+
+  def testProfileIsPicklable(self):
+    with self.profile.stage('parse Visits', 42):
+      pass
+
+    self.assertEqual(self.profile.getStages(),
+                     pickle.loads(pickle.dumps(self.profile)).getStages())
+
+
+class TestNoProfile(unittest.TestCase):
+  def testStagesAreIgnored(self):
+    with NO_PROFILE.stage('ignored', 1) as stage:
+      stage.rows = 2
+
+    with NO_PROFILE.interleavedStages('ignored') as stages:
+      with stages.part('ignored'):
+        stages.rows = {'ignored': 1}
+
+
+if __name__ == '__main__':
+  unittest.main()